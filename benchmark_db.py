@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de la capa de base de datos del bot
+Uso: python benchmark_db.py [nombre ...]  (sin argumentos ejecuta todos)
+"""
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import aiosqlite
+
+import db_tool
+from database.db_manager import LOOT_COLUMNS, DatabaseManager
+from database.export import export_database
+from database.importer import level_from_xp
+from database.memory_backend import MemoryStorage
+from database.records import LootRow
+from database.storage import epoch_now
+from database.xp_buffer import PendingXP
+
+ITERATIONS = 2000
+USERS = 200
+GUILD_ID = 1
+STREAM_ROWS = 1_000_000
+
+
+def print_result(label: str, elapsed: float, operations: int):
+    """Imprime la latencia media por operación"""
+    per_call = elapsed / operations * 1_000_000
+    print(f"   {label:<32} {per_call:>9.1f} µs/op  ({operations} ops en {elapsed:.2f}s)")
+
+
+async def bench_conexion(db_path: str):
+    """Compara conexión por llamada frente a la conexión compartida"""
+    manager = DatabaseManager(db_path)
+    # Llamadas en serie: la ventana del commit agrupado solo añadiría espera
+    manager.group_window = 0
+    await manager.initialize()
+
+    # Antes: una conexión nueva por cada llamada (comportamiento original)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        user_id = random.randint(1, USERS)
+        async with aiosqlite.connect(db_path) as db:
+            await db.execute(
+                '''INSERT INTO economy (user_id, guild_id, balance) VALUES (?, ?, ?)
+                   ON CONFLICT(user_id, guild_id) DO UPDATE SET balance = balance + ?''',
+                (user_id, GUILD_ID, 20, 20)
+            )
+            await db.commit()
+        async with aiosqlite.connect(db_path) as db:
+            async with db.execute(
+                'SELECT balance FROM economy WHERE user_id = ? AND guild_id = ?', (user_id, GUILD_ID)
+            ) as cursor:
+                await cursor.fetchone()
+    print_result("conexión por llamada", time.perf_counter() - start, ITERATIONS * 2)
+
+    # Después: conexión compartida de DatabaseManager
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        user_id = random.randint(1, USERS)
+        await manager.add_money(user_id, GUILD_ID, 20)
+        await manager.get_balance(user_id, GUILD_ID)
+    print_result("conexión compartida", time.perf_counter() - start, ITERATIONS * 2)
+
+    await manager.close()
+
+
+async def bench_xp(db_path: str):
+    """Compara un commit por mensaje frente al acumulador de XP"""
+    manager = DatabaseManager(db_path)
+    manager.group_window = 0
+    await manager.initialize()
+    messages = ITERATIONS * 5
+
+    # Antes: una transacción por mensaje
+    start = time.perf_counter()
+    for _ in range(messages):
+        await manager._write_xp_batch({(random.randint(1, USERS), GUILD_ID): PendingXP(20, 1)})
+    print_result("commit por mensaje", time.perf_counter() - start, messages)
+
+    # Después: add_xp acumula y el volcado agrupa en una transacción
+    commits = 0
+    write_batch = manager._write_xp_batch
+
+    async def counting_write(entries):
+        nonlocal commits
+        commits += 1
+        await write_batch(entries)
+
+    manager._xp_buffer._flush_callback = counting_write
+    start = time.perf_counter()
+    for i in range(messages):
+        await manager.add_xp(random.randint(1, USERS), GUILD_ID, 20)
+        if i % 50 == 0:
+            await asyncio.sleep(0)  # Ráfaga de chat: otros eventos intercalados
+    await manager.flush_xp()
+    print_result("acumulador de XP", time.perf_counter() - start, messages)
+    print(f"   transacciones: {messages} -> {commits}")
+
+    await manager.close()
+
+
+async def bench_registros(db_path: str):
+    """Compara dict(aiosqlite.Row) frente a registros NamedTuple desde tuplas"""
+    manager = DatabaseManager(db_path)
+    await manager.initialize()
+    await manager.close()
+
+    rows_count = ITERATIONS * 100
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value) VALUES (?, ?, ?, ?, ?)',
+        (
+            (random.randint(1, USERS), GUILD_ID, f"Boss {i % 50}", "Gold Token, Platinum Coin", i)
+            for i in range(rows_count)
+        )
+    )
+    conn.commit()
+    query = f'SELECT {LOOT_COLUMNS} FROM tibia_loots'
+
+    def measure(label: str, convert):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = convert(conn.execute(query).fetchall())
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print_result(label, elapsed, len(result))
+        print(f"   {'':<32} pico de memoria: {peak / 1024 / 1024:.1f} MiB")
+
+    conn.row_factory = sqlite3.Row
+    measure("dict(row)", lambda rows: [dict(row) for row in rows])
+    conn.row_factory = None
+    measure("LootRow._make(tupla)", lambda rows: list(map(LootRow._make, rows)))
+    conn.close()
+
+
+async def bench_grupos(db_path: str):
+    """Compara un commit por escritura frente al commit agrupado con escritores concurrentes"""
+    writers = 50
+    for label, window in (("commit por escritura", 0.0), ("commit agrupado (2 ms)", 0.002)):
+        # Perfil safe (synchronous=FULL): cada commit es un fsync
+        manager = DatabaseManager(db_path, profile='safe')
+        manager.group_window = window
+        await manager.initialize()
+        manager.metrics.reset()
+
+        async def writer(user_id: int):
+            for _ in range(ITERATIONS // writers):
+                await manager.add_warning(user_id, GUILD_ID, 1, "benchmark")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(user_id) for user_id in range(writers)))
+        elapsed = time.perf_counter() - start
+        print_result(label, elapsed, ITERATIONS)
+        print(f"   {'':<32} {manager.metrics.commits} commits "
+              f"({manager.metrics.committed_writes / manager.metrics.commits:.1f} escrituras por commit)")
+        await manager.close()
+
+
+async def bench_motores(db_path: str):
+    """Compara SQLite con el almacenamiento en memoria en las operaciones calientes"""
+    manager = DatabaseManager(db_path)
+    # Llamadas en serie: la ventana de commit agrupado solo añadiría espera
+    manager.group_window = 0
+    for label, storage in (("sqlite", manager), ("memoria", MemoryStorage())):
+        await storage.initialize()
+        start = time.perf_counter()
+        for i in range(ITERATIONS):
+            user_id = random.randint(1, USERS)
+            await storage.add_money(user_id, GUILD_ID, 20)
+            await storage.get_balance(user_id, GUILD_ID)
+            await storage.add_tibia_loot(user_id, GUILD_ID, f"Boss {i % 50}", "Gold Token", i)
+            await storage.get_richest_users(GUILD_ID)
+            await storage.get_top_loots(GUILD_ID)
+        print_result(label, time.perf_counter() - start, ITERATIONS * 5)
+        await storage.close()
+
+
+async def bench_recorrido(db_path: str):
+    """Compara fetchall de toda la tabla frente a iter_loots por bloques"""
+    manager = DatabaseManager(db_path)
+    await manager.initialize()
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value) VALUES (?, ?, ?, ?, ?)',
+        (
+            (random.randint(1, USERS), GUILD_ID, f"Boss {i % 50}", "Gold Token, Platinum Coin", i)
+            for i in range(STREAM_ROWS)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+    async def measure(label: str, consume):
+        tracemalloc.start()
+        start = time.perf_counter()
+        total = await consume()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print_result(label, elapsed, STREAM_ROWS)
+        print(f"   {'':<32} pico de memoria: {peak / 1024 / 1024:.1f} MiB (valor total {total})")
+
+    async def with_fetchall():
+        async with manager._read() as db:
+            async with db.execute(
+                f'SELECT {LOOT_COLUMNS} FROM tibia_loots WHERE guild_id = ? ORDER BY timestamp',
+                (GUILD_ID,)
+            ) as cursor:
+                loots = list(map(LootRow._make, await cursor.fetchall()))
+        return sum(loot.value for loot in loots)
+
+    async def with_iter():
+        total = 0
+        async for loot in manager.iter_loots(GUILD_ID):
+            total += loot.value
+        return total
+
+    await measure("fetchall", with_fetchall)
+    await measure("iter_loots", with_iter)
+    await manager.close()
+
+
+async def bench_busqueda(db_path: str):
+    """Compara LIKE sobre items frente a search_loots (FTS5) con millones de loots"""
+    manager = DatabaseManager(db_path)
+    await manager.initialize()
+
+    # 300 items de dos palabras que comparten vocabulario, y uno muy raro
+    adjectives = ["Giant", "Crystal", "Golden", "Demon", "Magic", "Royal", "Dragon", "Silver",
+                  "Ancient", "Blue", "Red", "Small", "Great", "Shimmering", "Soul"]
+    nouns = ["Sword", "Coin", "Pearl", "Shield", "Helmet", "Ring", "Amulet", "Armor", "Legs", "Boots",
+             "Axe", "Wand", "Rod", "Token", "Gem", "Stone", "Scroll", "Potion", "Orb", "Horn"]
+    items = [f"{adjective} {noun}" for adjective in adjectives for noun in nouns]
+
+    def loot_items(i: int) -> str:
+        drop = random.sample(items, 3)
+        if i % 10_000 == 0:
+            drop.append("Ferumbras' Hat")
+        return ", ".join(drop)
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value) VALUES (?, ?, ?, ?, ?)',
+        (
+            (random.randint(1, USERS), GUILD_ID, f"Boss {i % 50}", loot_items(i), i)
+            for i in range(STREAM_ROWS)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+    # Pocas búsquedas: un LIKE sin coincidencias recorre la tabla entera
+    searches = ITERATIONS // 100
+    for term in ("Golden Token", "Ferumbras Hat", "Gold Nugget"):
+        start = time.perf_counter()
+        for page in range(searches):
+            async with manager._read() as db:
+                async with db.execute(
+                    f'''SELECT {LOOT_COLUMNS} FROM tibia_loots WHERE guild_id = ? AND items LIKE ?
+                       ORDER BY timestamp DESC LIMIT 10 OFFSET ?''',
+                    (GUILD_ID, f"%{term}%", page % 10 * 10)
+                ) as cursor:
+                    await cursor.fetchall()
+        print_result(f"LIKE '{term}'", time.perf_counter() - start, searches)
+
+        start = time.perf_counter()
+        for page in range(searches):
+            await manager.search_loots(GUILD_ID, term, limit=10, offset=page % 10 * 10)
+        print_result(f"search_loots '{term}'", time.perf_counter() - start, searches)
+
+    await manager.close()
+
+
+async def bench_exportacion(db_path: str):
+    """Compara el volcado JSONL con la exportación columnar (filas/s y pico de memoria)"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("   pyarrow no está instalado: pip install pyarrow")
+        return
+
+    manager = DatabaseManager(db_path)
+    await manager.initialize()
+    await manager.close()
+
+    # Un millón de loots repartidos en dos años y 4 servidores, más 100k niveles
+    start_time = epoch_now() - 2 * 365 * 86400
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+            (random.randint(1, USERS), i % 4, f"Boss {i % 50}", "Gold Token, Platinum Coin", i,
+             start_time + i * 63)
+            for i in range(STREAM_ROWS)
+        )
+    )
+    conn.executemany(
+        'INSERT INTO levels (user_id, guild_id, xp, level, total_messages) VALUES (?, ?, ?, ?, ?)',
+        ((i, i % 4, i * 10, i // 50, i) for i in range(STREAM_ROWS // 10))
+    )
+    conn.commit()
+    conn.close()
+    total_rows = STREAM_ROWS + STREAM_ROWS // 10
+
+    def measure(label: str, run):
+        # tracemalloc frena mucho la conversión: el tiempo se mide en una pasada sin él
+        start = time.perf_counter()
+        size = run()
+        elapsed = time.perf_counter() - start
+        # Los búferes de Arrow no pasan por tracemalloc: se miden con su propio pool
+        pool = pa.proxy_memory_pool(pa.default_memory_pool())
+        previous = pa.default_memory_pool()
+        pa.set_memory_pool(pool)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pa.set_memory_pool(previous)
+        print(f"   {label:<32} {total_rows / elapsed:>12,.0f} filas/s  ({elapsed:.2f}s, {size / 1024 / 1024:.1f} MiB)")
+        print(f"   {'':<32} pico de memoria: {peak / 1024 / 1024:.1f} MiB Python + "
+              f"{pool.max_memory() / 1024 / 1024:.1f} MiB Arrow")
+
+    out = Path(db_path).parent
+
+    def dump() -> int:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_tool.dump(Path(db_path), out / 'dump.jsonl.gz')
+        return (out / 'dump.jsonl.gz').stat().st_size
+
+    measure("volcado JSONL (db_tool dump)", dump)
+    for fmt in ('parquet', 'arrow'):
+        measure(f"exportación {fmt}", lambda: export_database(db_path, out / fmt, fmt).size_bytes)
+
+
+async def bench_importacion(db_path: str):
+    """Compara importar XP usuario a usuario (como /setxp) frente a import_levels por lotes"""
+    members = ITERATIONS * 10
+    rows = [(user_id, random.randint(0, 100_000), random.randint(0, 5000)) for user_id in range(1, members + 1)]
+
+    manager = DatabaseManager(db_path)
+    manager.group_window = 0
+    await manager.initialize()
+    start = time.perf_counter()
+    for user_id, xp, messages in rows:
+        await manager._write_xp_batch({(user_id, GUILD_ID): PendingXP(xp, messages)})
+        await manager.update_level(user_id, GUILD_ID, level_from_xp(xp))
+    print_result("usuario a usuario", time.perf_counter() - start, members)
+
+    start = time.perf_counter()
+    await manager.import_levels(GUILD_ID + 1, iter(rows))
+    elapsed = time.perf_counter() - start
+    print_result("import_levels", elapsed, members)
+    print(f"   {'':<32} {members / elapsed:,.0f} filas/s")
+    await manager.close()
+
+
+async def bench_unidad(db_path: str):
+    """Compara el flujo de /daily en llamadas sueltas frente a una sola unit_of_work"""
+    # Perfil safe y sin agrupar: cada commit es un fsync
+    manager = DatabaseManager(db_path, profile='safe')
+    manager.group_window = 0
+    await manager.initialize()
+
+    async def separate(user_id: int) -> bool:
+        if await manager.get_last_daily(user_id, GUILD_ID) is not None:
+            return False
+        await manager.add_money(user_id, GUILD_ID, 500)
+        await manager.update_last_daily(user_id, GUILD_ID)
+        return True
+
+    async def unit(user_id: int) -> bool:
+        async with manager.unit_of_work(GUILD_ID) as uow:
+            if await uow.get_last_daily(user_id, GUILD_ID) is not None:
+                return False
+            await uow.add_money(user_id, GUILD_ID, 500)
+            await uow.update_last_daily(user_id, GUILD_ID)
+            return True
+
+    for label, claim, offset in (("llamadas sueltas", separate, 0), ("unit_of_work", unit, ITERATIONS)):
+        start = time.perf_counter()
+        for user_id in range(offset, offset + ITERATIONS):
+            await claim(user_id)
+        print_result(label, time.perf_counter() - start, ITERATIONS)
+        # Cinco /daily simultáneos del mismo usuario: solo uno debería cobrar
+        paid = 0
+        for user_id in range(offset + ITERATIONS, offset + ITERATIONS + USERS):
+            paid += sum(await asyncio.gather(*(claim(user_id) for _ in range(5))))
+        print(f"   {'':<32} {paid - USERS} cobros duplicados en {USERS} ráfagas")
+    await manager.close()
+
+
+async def bench_replica(db_path: str):
+    """Latencia de escritura con agregaciones pesadas en la base principal frente a la réplica"""
+    manager = DatabaseManager(db_path, replica=db_path + '.replica', replica_max_lag=3600)
+    await manager.initialize()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value) VALUES (?, ?, ?, ?, ?)',
+        ((random.randint(1, USERS), GUILD_ID, f"Boss {i % 50}", "Gold Coin", i) for i in range(STREAM_ROWS))
+    )
+    conn.commit()
+    conn.close()
+    start = time.perf_counter()
+    await manager.refresh_replica()
+    print(f"   {'refresco de la réplica':<32} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+    for label, replica in (("análisis en la principal", False), ("análisis en la réplica", True)):
+        # Cada fase empieza con el WAL vacío para comparar cuánto crece
+        async with manager._exclusive() as db:
+            await db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        done = False
+
+        async def analytics():
+            while not done:
+                async with manager._read(replica) as db:
+                    async with db.execute(
+                        '''SELECT user_id, COUNT(*), SUM(value) FROM tibia_loots 
+                           WHERE guild_id = ? GROUP BY user_id ORDER BY 3 DESC''',
+                        (GUILD_ID,)
+                    ) as cursor:
+                        await cursor.fetchall()
+
+        readers = [asyncio.create_task(analytics()) for _ in range(manager.reader_count)]
+        latencies = []
+        for i in range(ITERATIONS):
+            start = time.perf_counter()
+            await manager.add_money(i % USERS, GUILD_ID, 1)
+            latencies.append(time.perf_counter() - start)
+        done = True
+        await asyncio.gather(*readers)
+        latencies.sort()
+        print_result(label, sum(latencies), ITERATIONS)
+        print(f"   {'':<32} p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms • "
+              f"WAL {os.path.getsize(db_path + '-wal') / 1024 / 1024:.1f} MiB")
+    await manager.close()
+
+
+BENCHMARKS = {
+    'conexion': bench_conexion,
+    'xp': bench_xp,
+    'registros': bench_registros,
+    'grupos': bench_grupos,
+    'motores': bench_motores,
+    'recorrido': bench_recorrido,
+    'busqueda': bench_busqueda,
+    'exportacion': bench_exportacion,
+    'importacion': bench_importacion,
+    'unidad': bench_unidad,
+    'replica': bench_replica,
+}
+
+
+async def run(names):
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\n📊 {name}")
+            await BENCHMARKS[name](os.path.join(tmp, 'bench.db'))
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ Benchmarks desconocidos: {', '.join(unknown)}")
+        print(f"   Disponibles: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("⏱️  BENCHMARKS DE BASE DE DATOS")
+    print("=" * 60)
+    asyncio.run(run(names))
+
+
+if __name__ == "__main__":
+    main()
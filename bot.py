@@ -77,7 +77,8 @@ class GamingBot(commands.Bot):
             'levels',
             'economy',
             'logging',
-            'tibia'
+            'tibia',
+            'database'
         ]
         
         for cog_file in cog_files:
@@ -87,6 +88,11 @@ class GamingBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Error al cargar el cog '{cog_file}': {e}")
     
+    async def close(self):
+        """Cierra la conexión a la base de datos al apagar el bot"""
+        await super().close()
+        await db_manager.close()
+
     async def on_ready(self):
         """Se ejecuta cuando el bot está listo"""
         logger.info(f"Bot conectado como {self.user.name} (ID: {self.user.id})")
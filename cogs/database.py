@@ -0,0 +1,269 @@
+"""
+Cog de administración y diagnóstico de la base de datos
+"""
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from config.settings import (
+    ANALYTICS_REPLICA,
+    ANALYTICS_REPLICA_REFRESH_MINUTES,
+    BACKUP_INTERVAL_HOURS,
+    EXPORT_FORMAT,
+    MAINTENANCE_WINDOWS,
+    RETENTION_INTERVAL_HOURS,
+    RETENTION_LOOT_DAYS,
+    RETENTION_WARNING_DAYS
+)
+from database.db_manager import db_manager
+from database.maintenance import current_window, parse_windows
+
+logger = logging.getLogger('discord_bot')
+
+# Métodos y consultas lentas mostrados en /dbstats
+TOP_METHODS = 10
+TOP_SLOW_QUERIES = 3
+TOP_CONTENTION = 5
+MAX_SQL_LENGTH = 200
+
+# Cada cuántos minutos se comprueba si estamos en una ventana de mantenimiento
+MAINTENANCE_CHECK_MINUTES = 10
+
+
+class DatabaseCog(commands.Cog):
+    """Administración y métricas de la base de datos"""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        if BACKUP_INTERVAL_HOURS > 0:
+            self.scheduled_backup.start()
+        if RETENTION_INTERVAL_HOURS > 0 and (RETENTION_LOOT_DAYS > 0 or RETENTION_WARNING_DAYS > 0):
+            self.retention_job.start()
+        try:
+            self.maintenance_windows = parse_windows(MAINTENANCE_WINDOWS)
+        except ValueError as e:
+            logger.error(f"MAINTENANCE_WINDOWS ignorado: {e}")
+            self.maintenance_windows = []
+        # Ventana en la que ya se completó el mantenimiento: (día, hora de inicio)
+        self.maintained_window = None
+        if self.maintenance_windows:
+            self.maintenance_job.start()
+        if ANALYTICS_REPLICA and ANALYTICS_REPLICA_REFRESH_MINUTES > 0:
+            self.replica_refresh.start()
+        self.export_running = False
+
+    def cog_unload(self):
+        """Detiene las tareas al descargar el cog"""
+        # stop() deja terminar una copia en curso en lugar de cortarla a medias
+        self.scheduled_backup.stop()
+        self.retention_job.stop()
+        self.maintenance_job.stop()
+        self.replica_refresh.stop()
+
+    @tasks.loop(hours=BACKUP_INTERVAL_HOURS or 24)
+    async def scheduled_backup(self):
+        """Copia de seguridad en caliente periódica (cada BACKUP_INTERVAL_HOURS)"""
+        try:
+            await db_manager.backup()
+        except Exception as e:
+            logger.error(f"Error en la copia de seguridad programada: {e}")
+
+    @scheduled_backup.before_loop
+    async def before_scheduled_backup(self):
+        """Espera a que el bot esté listo antes de la primera copia"""
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(hours=RETENTION_INTERVAL_HOURS or 24)
+    async def retention_job(self):
+        """Archiva loots y advertencias más antiguos que su horizonte de retención"""
+        try:
+            await db_manager.archive_old_rows()
+        except Exception as e:
+            logger.error(f"Error en el archivado de datos antiguos: {e}")
+
+    @retention_job.before_loop
+    async def before_retention_job(self):
+        """Espera a que el bot esté listo antes del primer archivado"""
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=MAINTENANCE_CHECK_MINUTES)
+    async def maintenance_job(self):
+        """ANALYZE/optimize, checkpoint y vacuum incremental dentro de las ventanas de poco tráfico"""
+        window = current_window(self.maintenance_windows, datetime.now())
+        if window is None or window == self.maintained_window:
+            return
+        try:
+            report = await db_manager.maintenance()
+        except Exception as e:
+            logger.error(f"Error en el mantenimiento de la base de datos: {e}")
+            return
+        # Si se agotó el tiempo, la siguiente comprobación dentro de la ventana continúa
+        if report.completed:
+            self.maintained_window = window
+
+    @maintenance_job.before_loop
+    async def before_maintenance_job(self):
+        """Espera a que el bot esté listo antes de la primera comprobación"""
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=ANALYTICS_REPLICA_REFRESH_MINUTES or 30)
+    async def replica_refresh(self):
+        """Copia la base principal a la réplica de análisis (cada ANALYTICS_REPLICA_REFRESH_MINUTES)"""
+        try:
+            await db_manager.refresh_replica()
+        except Exception as e:
+            logger.error(f"Error al refrescar la réplica de análisis: {e}")
+
+    @replica_refresh.before_loop
+    async def before_replica_refresh(self):
+        """Espera a que el bot esté listo antes de la primera copia"""
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="dbexport", description="[ADMIN] Exportar datos a Parquet/Arrow para análisis")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(formato="Formato de los ficheros (opcional)")
+    @app_commands.choices(formato=[
+        app_commands.Choice(name="Parquet", value="parquet"),
+        app_commands.Choice(name="Arrow IPC", value="arrow")
+    ])
+    async def dbexport(self, interaction: discord.Interaction, formato: Optional[app_commands.Choice[str]] = None):
+        """Exporta levels, economy, loots y advertencias por servidor y mes sin bloquear el bot"""
+        if self.export_running:
+            await interaction.response.send_message("⏳ Ya hay una exportación en curso.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        fmt = formato.value if formato else EXPORT_FORMAT
+        self.export_running = True
+        try:
+            result = await db_manager.export_columnar(fmt=fmt)
+        except Exception as e:
+            logger.error(f"Error en la exportación columnar: {e}")
+            await interaction.followup.send(f"❌ Error al exportar: {e}", ephemeral=True)
+            return
+        finally:
+            self.export_running = False
+
+        if result is None:
+            await interaction.followup.send("ℹ️ El almacenamiento en memoria no tiene ficheros que exportar.", ephemeral=True)
+            return
+
+        rate = result.total_rows / result.duration if result.duration else 0
+        embed = discord.Embed(
+            title="📤 Exportación completada",
+            description=(
+                f"`{result.directory}` • {result.files} ficheros {fmt} • "
+                f"{result.size_bytes / 1024 / 1024:.1f} MiB\n"
+                f"{result.total_rows:,} filas en {result.duration:.2f}s ({rate:,.0f} filas/s)"
+            ),
+            color=0x2ecc71,
+            timestamp=datetime.now(timezone.utc)
+        )
+        for dataset, rows in result.rows.items():
+            embed.add_field(name=dataset, value=f"{rows:,} filas", inline=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="dbstats", description="[ADMIN] Ver tiempos de consultas de la base de datos")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def dbstats(self, interaction: discord.Interaction):
+        """Muestra los métodos más costosos y las últimas consultas lentas"""
+        snapshot = db_manager.metrics.snapshot()
+
+        embed = discord.Embed(
+            title="🗄️ Métricas de la Base de Datos",
+            description=f"Umbral de consulta lenta: **{db_manager.metrics.slow_threshold_ms:.0f}ms**",
+            color=0x3498db,
+            timestamp=datetime.now(timezone.utc)
+        )
+
+        if not snapshot:
+            embed.add_field(name="Métodos", value="Aún no hay consultas registradas.", inline=False)
+        else:
+            # Ordenar por tiempo total consumido (llamadas × media)
+            ranked = sorted(
+                snapshot.items(),
+                key=lambda item: item[1]['count'] * item[1]['avg_ms'],
+                reverse=True
+            )
+            lines = [
+                f"`{method}` • {stats['count']} llamadas • "
+                f"p50 {stats['p50_ms']:.1f} / p95 {stats['p95_ms']:.1f} / "
+                f"p99 {stats['p99_ms']:.1f} / máx {stats['max_ms']:.1f} ms"
+                for method, stats in ranked[:TOP_METHODS]
+            ]
+            embed.add_field(name="Métodos más costosos", value="\n".join(lines), inline=False)
+
+        slow = db_manager.metrics.slow_queries()[-TOP_SLOW_QUERIES:]
+        for query in reversed(slow):
+            sql = query.sql if len(query.sql) <= MAX_SQL_LENGTH else query.sql[:MAX_SQL_LENGTH] + "..."
+            embed.add_field(
+                name=f"🐢 {query.method} • {query.elapsed_ms:.1f}ms • {query.timestamp.strftime('%H:%M:%S')}",
+                value=f"```sql\n{sql}\n```Params: `{query.params_shape}`\nPlan: {' | '.join(query.plan)}",
+                inline=False
+            )
+
+        metrics = db_manager.metrics
+        if metrics.commits:
+            embed.add_field(
+                name="📦 Commits agrupados",
+                value=(
+                    f"{metrics.committed_writes} escrituras en {metrics.commits} commits "
+                    f"({metrics.committed_writes / metrics.commits:.1f} por commit)"
+                ),
+                inline=False
+            )
+
+        contention = db_manager.metrics.contention(TOP_CONTENTION)
+        if contention:
+            lines = [
+                f"`{method}` • {stats['lock_waits']} esperas ({stats['lock_wait_ms']:.0f}ms) • "
+                f"{stats['busy_retries']} reintentos • {stats['busy_failures']} fallos"
+                for method, stats in contention
+            ]
+            embed.add_field(name="🔒 Contención de escritura", value="\n".join(lines), inline=False)
+
+        lag = db_manager.replica_lag()
+        if lag is not None or metrics.replica_fallbacks:
+            state = f"Copia de hace {lag:.0f}s" if lag is not None else "Sin copia todavía"
+            embed.add_field(
+                name="🪞 Réplica de análisis",
+                value=(
+                    f"{state} • {metrics.replica_reads} lecturas (máx. {metrics.replica_lag_max:.0f}s de retraso) • "
+                    f"{metrics.replica_fallbacks} a la base principal"
+                ),
+                inline=False
+            )
+
+        backup = db_manager.last_backup
+        if backup is not None:
+            embed.add_field(
+                name="💾 Última copia de seguridad",
+                value=(
+                    f"`{backup.path.name}` • {backup.timestamp.strftime('%d/%m %H:%M')}\n"
+                    f"{backup.size_bytes / 1024 / 1024:.1f} MiB • {backup.pages} páginas • {backup.duration:.2f}s"
+                ),
+                inline=False
+            )
+
+        cache = db_manager.cache
+        if cache is not None and cache.enabled:
+            lines = [
+                f"`{table}` • {stats['hits']} aciertos / {stats['misses']} fallos • {stats['hit_rate']:.1f}%"
+                for table, stats in cache.stats().items()
+            ]
+            embed.add_field(
+                name=f"⚡ Caché de lecturas ({len(cache)}/{cache.max_entries} entradas, TTL {cache.ttl:.0f}s)",
+                value="\n".join(lines) or "Sin lecturas todavía.",
+                inline=False
+            )
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    """Función para cargar el cog"""
+    await bot.add_cog(DatabaseCog(bot))
+    logger.info("DatabaseCog cargado")
@@ -6,8 +6,8 @@ from discord.ext import commands
 from discord import app_commands
 import logging
 import random
-from datetime import datetime, timedelta
 from database.db_manager import db_manager
+from database.storage import cooldown_remaining
 
 logger = logging.getLogger('discord_bot')
 
@@ -49,7 +49,7 @@ class EconomyCog(commands.Cog):
         # Obtener nivel si existe
         user_data = await db_manager.get_user_level_data(target.id, interaction.guild.id)
         if user_data:
-            level = user_data.get('level', 1)
+            level = user_data.level
             embed.add_field(name="Nivel", value=f"⭐ {level}", inline=True)
         
         embed.set_footer(text=f"Usa /daily y /work para ganar más Zero Coins")
@@ -62,32 +62,25 @@ class EconomyCog(commands.Cog):
         user_id = interaction.user.id
         guild_id = interaction.guild.id
         
-        # Verificar última vez que usó daily
-        last_daily = await db_manager.get_last_daily(user_id, guild_id)
-        
-        if last_daily:
-            try:
-                last_time = datetime.fromisoformat(last_daily) if isinstance(last_daily, str) else last_daily
-                time_diff = datetime.now() - last_time
-                
-                if time_diff.total_seconds() < DAILY_COOLDOWN:
-                    remaining = DAILY_COOLDOWN - time_diff.total_seconds()
-                    hours = int(remaining // 3600)
-                    minutes = int((remaining % 3600) // 60)
-                    
-                    embed = discord.Embed(
-                        title="⏰ Recompensa no disponible",
-                        description=f"Ya reclamaste tu recompensa diaria hoy.\n\n**Tiempo restante:** {hours}h {minutes}m",
-                        color=discord.Color.red()
-                    )
-                    await interaction.response.send_message(embed=embed, ephemeral=True)
-                    return
-            except:
-                pass
-        
-        # Dar recompensa
-        await db_manager.add_money(user_id, guild_id, DAILY_REWARD)
-        await db_manager.update_last_daily(user_id, guild_id)
+        # Comprobar y cobrar en la misma transacción: dos /daily seguidos no cobran dos veces
+        async with db_manager.unit_of_work(guild_id) as uow:
+            last_daily = await uow.get_last_daily(user_id, guild_id)
+            remaining = cooldown_remaining(last_daily, DAILY_COOLDOWN)
+            if not remaining:
+                await uow.add_money(user_id, guild_id, DAILY_REWARD)
+                await uow.update_last_daily(user_id, guild_id)
+        
+        if remaining:
+            hours = remaining // 3600
+            minutes = (remaining % 3600) // 60
+            
+            embed = discord.Embed(
+                title="⏰ Recompensa no disponible",
+                description=f"Ya reclamaste tu recompensa diaria hoy.\n\n**Tiempo restante:** {hours}h {minutes}m",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
         
         embed = discord.Embed(
             title="🎁 ¡Recompensa Diaria!",
@@ -105,32 +98,29 @@ class EconomyCog(commands.Cog):
         user_id = interaction.user.id
         guild_id = interaction.guild.id
         
-        # Verificar última vez que trabajó
-        last_work = await db_manager.get_last_work(user_id, guild_id)
-        
-        if last_work:
-            try:
-                last_time = datetime.fromisoformat(last_work) if isinstance(last_work, str) else last_work
-                time_diff = datetime.now() - last_time
-                
-                if time_diff.total_seconds() < WORK_COOLDOWN:
-                    remaining = WORK_COOLDOWN - time_diff.total_seconds()
-                    minutes = int(remaining // 60)
-                    seconds = int(remaining % 60)
-                    
-                    embed = discord.Embed(
-                        title="😴 Estás cansado",
-                        description=f"Necesitas descansar antes de trabajar de nuevo.\n\n**Tiempo restante:** {minutes}m {seconds}s",
-                        color=discord.Color.red()
-                    )
-                    await interaction.response.send_message(embed=embed, ephemeral=True)
-                    return
-            except:
-                pass
-        
         # Calcular ganancia aleatoria
         earnings = random.randint(WORK_REWARD_MIN, WORK_REWARD_MAX)
         
+        # Comprobar y cobrar en la misma transacción
+        async with db_manager.unit_of_work(guild_id) as uow:
+            last_work = await uow.get_last_work(user_id, guild_id)
+            remaining = cooldown_remaining(last_work, WORK_COOLDOWN)
+            if not remaining:
+                await uow.add_money(user_id, guild_id, earnings)
+                await uow.update_last_work(user_id, guild_id)
+        
+        if remaining:
+            minutes = remaining // 60
+            seconds = remaining % 60
+            
+            embed = discord.Embed(
+                title="😴 Estás cansado",
+                description=f"Necesitas descansar antes de trabajar de nuevo.\n\n**Tiempo restante:** {minutes}m {seconds}s",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
         # Trabajos aleatorios
         jobs = [
             "programaste un bot de Discord",
@@ -147,10 +137,6 @@ class EconomyCog(commands.Cog):
         
         job = random.choice(jobs)
         
-        # Dar recompensa
-        await db_manager.add_money(user_id, guild_id, earnings)
-        await db_manager.update_last_work(user_id, guild_id)
-        
         embed = discord.Embed(
             title="💼 ¡Trabajo Completado!",
             description=f"**{interaction.user.mention}** {job}\n\n**Ganaste:** {earnings} ⏰ Zero Coins",
@@ -177,25 +163,19 @@ class EconomyCog(commands.Cog):
             await interaction.response.send_message("❌ La cantidad debe ser mayor a 0.", ephemeral=True)
             return
         
-        # Verificar balance del remitente
-        sender_balance = await db_manager.get_balance(interaction.user.id, interaction.guild.id)
+        # Realizar transferencia (comprueba el saldo y mueve el dinero en una transacción)
+        new_balance = await db_manager.transfer(
+            interaction.user.id, usuario.id, interaction.guild.id, cantidad
+        )
         
-        if sender_balance is None or sender_balance < cantidad:
+        if new_balance is None:
+            sender_balance = await db_manager.get_balance(interaction.user.id, interaction.guild.id)
             await interaction.response.send_message(
                 f"❌ No tienes suficientes Zero Coins. Tu balance: {sender_balance or 0} ⏰",
                 ephemeral=True
             )
             return
         
-        # Realizar transferencia
-        success = await db_manager.remove_money(interaction.user.id, interaction.guild.id, cantidad)
-        
-        if not success:
-            await interaction.response.send_message("❌ Error al realizar la transferencia.", ephemeral=True)
-            return
-        
-        await db_manager.add_money(usuario.id, interaction.guild.id, cantidad)
-        
         embed = discord.Embed(
             title="💸 Transferencia Exitosa",
             description=f"**{interaction.user.mention}** transfirió **{cantidad}** ⏰ Zero Coins a **{usuario.mention}**",
@@ -218,23 +198,28 @@ class EconomyCog(commands.Cog):
             await interaction.response.send_message("❌ La apuesta debe ser mayor a 0.", ephemeral=True)
             return
         
-        # Verificar balance
-        balance = await db_manager.get_balance(interaction.user.id, interaction.guild.id)
+        # Lanzar moneda
+        resultado = random.choice(['cara', 'cruz'])
+        won = resultado == lado
+        
+        # Liquidar la apuesta solo si el saldo la cubre (una sola sentencia)
+        new_balance = await db_manager.adjust_balance(
+            interaction.user.id,
+            interaction.guild.id,
+            apuesta if won else -apuesta,
+            min_balance=apuesta
+        )
         
-        if balance is None or balance < apuesta:
+        if new_balance is None:
+            balance = await db_manager.get_balance(interaction.user.id, interaction.guild.id)
             await interaction.response.send_message(
                 f"❌ No tienes suficientes Zero Coins para apostar. Tu balance: {balance or 0} ⏰",
                 ephemeral=True
             )
             return
         
-        # Lanzar moneda
-        resultado = random.choice(['cara', 'cruz'])
-        
-        if resultado == lado:
+        if won:
             # Ganó
-            await db_manager.add_money(interaction.user.id, interaction.guild.id, apuesta)
-            
             embed = discord.Embed(
                 title="🪙 ¡GANASTE!",
                 description=f"La moneda cayó en **{resultado}**\n\n**Ganaste:** {apuesta} ⏰ Zero Coins",
@@ -242,8 +227,6 @@ class EconomyCog(commands.Cog):
             )
         else:
             # Perdió
-            await db_manager.remove_money(interaction.user.id, interaction.guild.id, apuesta)
-            
             embed = discord.Embed(
                 title="🪙 Perdiste",
                 description=f"La moneda cayó en **{resultado}**\n\n**Perdiste:** {apuesta} ⏰ Zero Coins",
@@ -256,7 +239,7 @@ class EconomyCog(commands.Cog):
     @app_commands.command(name="leaderboard", description="Ver el top 10 de usuarios más ricos")
     async def leaderboard(self, interaction: discord.Interaction):
         """Muestra el ranking de usuarios con más Zero Coins"""
-        richest = await db_manager.get_richest_users(interaction.guild.id, limit=10)
+        richest = await db_manager.get_richest_users(interaction.guild.id, limit=10, replica=True)
         
         if not richest:
             embed = discord.Embed(
@@ -276,8 +259,8 @@ class EconomyCog(commands.Cog):
         medals = ["🥇", "🥈", "🥉"]
         
         for i, user_data in enumerate(richest, 1):
-            user_id = user_data['user_id']
-            balance = user_data['balance']
+            user_id = user_data.user_id
+            balance = user_data.balance
             
             try:
                 user = await self.bot.fetch_user(user_id)
@@ -300,16 +283,7 @@ class EconomyCog(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def setmoney(self, interaction: discord.Interaction, usuario: discord.Member, cantidad: int):
         """Establece el dinero de un usuario (solo administradores)"""
-        # Obtener balance actual
-        current_balance = await db_manager.get_balance(usuario.id, interaction.guild.id) or 0
-        
-        # Calcular diferencia
-        difference = cantidad - current_balance
-        
-        if difference > 0:
-            await db_manager.add_money(usuario.id, interaction.guild.id, difference)
-        elif difference < 0:
-            await db_manager.remove_money(usuario.id, interaction.guild.id, abs(difference))
+        await db_manager.set_balance(usuario.id, interaction.guild.id, cantidad)
         
         embed = discord.Embed(
             title="✅ Dinero Actualizado",
@@ -10,6 +10,7 @@ import pytz
 
 from utils.embeds import create_event_embed, create_success_embed, create_error_embed, create_info_embed
 from database.db_manager import db_manager
+from database.storage import from_epoch
 
 logger = logging.getLogger('discord_bot')
 
@@ -125,19 +126,19 @@ class EventsCog(commands.Cog):
             # Mostrar hasta 10 eventos
             for i, event in enumerate(events[:10], 1):
                 # Parsear la fecha
-                event_date = datetime.fromisoformat(event['event_date'])
+                event_date = from_epoch(event.event_date)
                 
                 # Obtener creador
-                creator = interaction.guild.get_member(event['creator_id'])
-                creator_name = creator.mention if creator else f"ID: {event['creator_id']}"
+                creator = interaction.guild.get_member(event.creator_id)
+                creator_name = creator.mention if creator else f"ID: {event.creator_id}"
                 
                 # Formatear descripción
-                description = event['description'] if event['description'] else "Sin descripción"
+                description = event.description if event.description else "Sin descripción"
                 if len(description) > 100:
                     description = description[:97] + "..."
                 
                 embed.add_field(
-                    name=f"{i}. {event['title']}",
+                    name=f"{i}. {event.title}",
                     value=(
                         f"📆 {event_date.strftime('%d/%m/%Y a las %H:%M')}\n"
                         f"👤 Organizador: {creator_name}\n"
@@ -168,7 +169,7 @@ class EventsCog(commands.Cog):
             for event in events:
                 try:
                     # Obtener el servidor
-                    guild = self.bot.get_guild(event['guild_id'])
+                    guild = self.bot.get_guild(event.guild_id)
                     if not guild:
                         continue
                     
@@ -188,16 +189,16 @@ class EventsCog(commands.Cog):
                     
                     if channel:
                         # Parsear fecha
-                        event_date = datetime.fromisoformat(event['event_date'])
+                        event_date = from_epoch(event.event_date)
                         
                         # Obtener creador
-                        creator = guild.get_member(event['creator_id'])
+                        creator = guild.get_member(event.creator_id)
                         creator_mention = creator.mention if creator else "Desconocido"
                         
                         # Crear embed de recordatorio
                         embed = create_event_embed(
-                            f"🔔 Recordatorio: {event['title']}",
-                            event['description'] or "Sin descripción",
+                            f"🔔 Recordatorio: {event.title}",
+                            event.description or "Sin descripción",
                             event_date.strftime("%d/%m/%Y a las %H:%M"),
                             creator_mention
                         )
@@ -211,12 +212,12 @@ class EventsCog(commands.Cog):
                         await channel.send(content="@everyone", embed=embed)
                         
                         # Marcar como notificado
-                        await db_manager.mark_event_notified(event['id'])
+                        await db_manager.mark_event_notified(event.id, event.guild_id)
                         
-                        logger.info(f"Notificación de evento enviada: {event['title']}")
+                        logger.info(f"Notificación de evento enviada: {event.title}")
                 
                 except Exception as e:
-                    logger.error(f"Error al notificar evento {event.get('id')}: {e}")
+                    logger.error(f"Error al notificar evento {event.id}: {e}")
                     continue
         
         except Exception as e:
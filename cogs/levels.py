@@ -6,8 +6,10 @@ from discord.ext import commands
 from discord import app_commands
 import logging
 import random
-from datetime import datetime, timedelta
+import time
 from database.db_manager import db_manager
+from database.importer import ImportResult, ImportValidator, detect_format, open_text, read_records
+from database.storage import cooldown_remaining
 
 logger = logging.getLogger('discord_bot')
 
@@ -54,39 +56,36 @@ class LevelsCog(commands.Cog):
         user_data = await db_manager.get_user_level_data(user_id, guild_id)
         
         # Verificar cooldown
-        if user_data:
-            last_xp_time = user_data.get('last_xp_time')
-            if last_xp_time:
-                try:
-                    last_time = datetime.fromisoformat(last_xp_time)
-                    if datetime.now() - last_time < timedelta(seconds=XP_COOLDOWN):
-                        return  # Aún en cooldown
-                except:
-                    pass
+        if user_data and cooldown_remaining(user_data.last_xp_time, XP_COOLDOWN):
+            return  # Aún en cooldown
         
         # Calcular XP aleatorio
         xp_gained = random.randint(XP_PER_MESSAGE_MIN, XP_PER_MESSAGE_MAX)
         
-        # Añadir XP
+        # Añadir XP (se acumula en memoria y se escribe por lotes)
         await db_manager.add_xp(user_id, guild_id, xp_gained)
         
-        # Obtener datos actualizados
-        user_data = await db_manager.get_user_level_data(user_id, guild_id)
-        if not user_data:
-            return
-        
-        current_xp = user_data['xp']
-        current_level = user_data['level']
+        # Totales en memoria: los datos leídos ya incluyen el XP pendiente
+        current_xp = (user_data.xp if user_data else 0) + xp_gained
+        current_level = user_data.level if user_data else 1
         
         # Calcular nuevo nivel
         new_level = calculate_level_from_xp(current_xp)
         
         # Si subió de nivel
         if new_level > current_level:
-            await db_manager.update_level(user_id, guild_id, new_level)
+            # Nivel y bonus en una transacción; se relee el nivel por si otro mensaje ya lo subió
+            async with db_manager.unit_of_work(guild_id) as uow:
+                stored = await uow.get_user_level_data(user_id, guild_id)
+                leveled_up = stored is None or stored.level < new_level
+                if leveled_up:
+                    await uow.update_level(user_id, guild_id, new_level)
+                    
+                    # Bonus de dinero por subir de nivel
+                    await uow.add_money(user_id, guild_id, 100)
             
-            # Bonus de dinero por subir de nivel
-            await db_manager.add_money(user_id, guild_id, 100)
+            if not leveled_up:
+                return
             
             # Mensaje de nivel subido
             embed = discord.Embed(
@@ -147,9 +146,9 @@ class LevelsCog(commands.Cog):
             await interaction.response.send_message(embed=embed)
             return
         
-        current_xp = user_data['xp']
-        current_level = user_data['level']
-        total_messages = user_data['total_messages']
+        current_xp = user_data.xp
+        current_level = user_data.level
+        total_messages = user_data.total_messages
         
         # Calcular XP para siguiente nivel
         xp_needed = calculate_xp_for_level(current_level + 1)
@@ -181,7 +180,7 @@ class LevelsCog(commands.Cog):
     @app_commands.command(name="ranking", description="Ver el top 10 de usuarios con más XP")
     async def ranking(self, interaction: discord.Interaction):
         """Muestra el ranking de usuarios por XP"""
-        top_users = await db_manager.get_top_users(interaction.guild.id, limit=10)
+        top_users = await db_manager.get_top_users(interaction.guild.id, limit=10, replica=True)
         
         if not top_users:
             embed = discord.Embed(
@@ -201,9 +200,9 @@ class LevelsCog(commands.Cog):
         medals = ["🥇", "🥈", "🥉"]
         
         for i, user_data in enumerate(top_users, 1):
-            user_id = user_data['user_id']
-            xp = user_data['xp']
-            level = user_data['level']
+            user_id = user_data.user_id
+            xp = user_data.xp
+            level = user_data.level
             
             try:
                 user = await self.bot.fetch_user(user_id)
@@ -230,7 +229,7 @@ class LevelsCog(commands.Cog):
         user_data = await db_manager.get_user_level_data(usuario.id, interaction.guild.id)
         
         if user_data:
-            current_xp = user_data['xp']
+            current_xp = user_data.xp
             difference = cantidad - current_xp
             await db_manager.add_xp(usuario.id, interaction.guild.id, difference)
         else:
@@ -247,6 +246,53 @@ class LevelsCog(commands.Cog):
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
         logger.info(f"{interaction.user.name} estableció el XP de {usuario.name} a {cantidad}")
+    
+    @app_commands.command(name="importxp", description="[ADMIN] Importar XP de otro bot (CSV, JSON o JSONL)")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(
+        archivo="Fichero con columnas user_id, xp y messages",
+        sumar="Sumar al XP actual en lugar de sustituirlo"
+    )
+    async def importxp(self, interaction: discord.Interaction, archivo: discord.Attachment, sumar: bool = False):
+        """Importa en bloque el XP exportado por otro bot de niveles (solo administradores)"""
+        try:
+            fmt = detect_format(archivo.filename)
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        validator = ImportValidator()
+        start = time.perf_counter()
+        try:
+            data = await archivo.read()
+            rows = validator.rows(read_records(open_text(data), fmt))
+            imported = await db_manager.import_levels(interaction.guild.id, rows, add=sumar)
+        except Exception as e:
+            logger.error(f"Error al importar XP: {e}")
+            await interaction.followup.send(f"❌ Error al importar: {e}", ephemeral=True)
+            return
+        result = ImportResult(imported, validator.rejected, validator.errors, time.perf_counter() - start)
+        
+        embed = discord.Embed(
+            title="✅ XP Importado",
+            description=(
+                f"**{result.imported:,}** usuarios importados en {result.duration:.2f}s "
+                f"({result.rows_per_second:,.0f} filas/s)"
+            ),
+            color=discord.Color.green()
+        )
+        if result.rejected:
+            embed.add_field(
+                name=f"⚠️ {result.rejected:,} filas descartadas",
+                value="\n".join(result.errors),
+                inline=False
+            )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(
+            f"{interaction.user.name} importó XP de {result.imported} usuarios "
+            f"({'sumado' if sumar else 'sustituido'}, {result.rejected} descartadas)"
+        )
 
 
 async def setup(bot: commands.Bot):
@@ -17,6 +17,7 @@ from utils.embeds import (
 )
 from utils.helpers import has_permissions, send_log
 from database.db_manager import db_manager
+from database.storage import from_epoch
 
 logger = logging.getLogger('discord_bot')
 
@@ -338,12 +339,12 @@ class ModerationCog(commands.Cog):
             
             # Mostrar las últimas 10 advertencias
             for i, warning in enumerate(warnings[:10], 1):
-                moderator = interaction.guild.get_member(warning['moderator_id'])
-                mod_name = moderator.mention if moderator else f"ID: {warning['moderator_id']}"
+                moderator = interaction.guild.get_member(warning.moderator_id)
+                mod_name = moderator.mention if moderator else f"ID: {warning.moderator_id}"
                 
                 embed.add_field(
-                    name=f"#{i} - {warning['timestamp']}",
-                    value=f"**Moderador:** {mod_name}\n**Razón:** {warning['reason']}",
+                    name=f"#{i} - {from_epoch(warning.timestamp).strftime('%d/%m/%Y %H:%M')}",
+                    value=f"**Moderador:** {mod_name}\n**Razón:** {warning.reason}",
                     inline=False
                 )
             
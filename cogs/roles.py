@@ -66,8 +66,8 @@ class RoleButton(discord.ui.Button):
             success = await assign_role(interaction.user, role)
             if success:
                 # Actualizar perfil del usuario
-                current_profile = await db_manager.get_user_profile(interaction.user.id)
-                games_list = current_profile['games'].split(',') if current_profile and current_profile['games'] else []
+                current_profile = await db_manager.get_user_profile(interaction.user.id, interaction.guild.id)
+                games_list = current_profile.games.split(',') if current_profile and current_profile.games else []
                 if self.game not in games_list:
                     games_list.append(self.game)
                 await db_manager.update_user_games(
@@ -10,6 +10,7 @@ import aiohttp
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
 from database.db_manager import db_manager
+from database.storage import from_epoch
 import asyncio
 
 logger = logging.getLogger('discord_bot')
@@ -23,6 +24,7 @@ MAX_CACHE_ENTRIES = 100  # Límite de entradas en caché
 TOP_PLAYERS_LIMIT = 20  # Límite de jugadores top a mostrar
 MAX_DESCRIPTION_LENGTH = 200  # Longitud máxima para descripciones
 MAX_ITEMS_LENGTH = 100  # Longitud máxima para lista de items
+SEARCH_PAGE_SIZE = 10  # Resultados por página en /loot buscar
 
 # Ubicaciones de Rashid por día de la semana (0=Lunes, 6=Domingo)
 RASHID_LOCATIONS = {
@@ -242,7 +244,7 @@ class TibiaCog(commands.Cog):
         target = usuario or interaction.user
         
         try:
-            loots = await db_manager.get_user_loots(target.id, interaction.guild.id, limit=10)
+            loots = await db_manager.get_user_loots(target.id, interaction.guild.id, limit=10, include_archive=True)
             
             if not loots:
                 await interaction.response.send_message(
@@ -258,16 +260,16 @@ class TibiaCog(commands.Cog):
             embed.set_thumbnail(url=target.display_avatar.url)
             
             for loot in loots[:10]:
-                timestamp = datetime.fromisoformat(loot['timestamp'])
-                value_str = f"{self.format_number(loot['value'])} gp" if loot['value'] > 0 else "N/A"
+                timestamp = from_epoch(loot.timestamp)
+                value_str = f"{self.format_number(loot.value)} gp" if loot.value > 0 else "N/A"
                 
                 # Truncar items solo si es necesario
-                items_text = loot['items']
+                items_text = loot.items
                 if len(items_text) > MAX_ITEMS_LENGTH:
                     items_text = items_text[:MAX_ITEMS_LENGTH] + "..."
                 
                 embed.add_field(
-                    name=f"🗡️ {loot['boss_name']}",
+                    name=f"🗡️ {loot.boss_name}",
                     value=f"**Items:** {items_text}\n**Valor:** {value_str}\n**Fecha:** {timestamp.strftime('%d/%m/%Y %H:%M')}",
                     inline=False
                 )
@@ -292,7 +294,8 @@ class TibiaCog(commands.Cog):
     ):
         """Muestra estadísticas de drops por criatura"""
         try:
-            stats = await db_manager.get_boss_stats(interaction.guild.id, criatura)
+            # El resumen de todas las criaturas admite algo de retraso: va a la réplica si la hay
+            stats = await db_manager.get_boss_stats(interaction.guild.id, criatura, replica=criatura is None)
             
             if not stats:
                 msg = f"📊 No hay estadísticas para '{criatura}'." if criatura else "📊 No hay loots registrados en este servidor."
@@ -303,23 +306,23 @@ class TibiaCog(commands.Cog):
                 # Estadísticas de una criatura específica
                 stat = stats[0]
                 embed = discord.Embed(
-                    title=f"📊 Estadísticas - {stat['boss_name']}",
+                    title=f"📊 Estadísticas - {stat.boss_name}",
                     color=TIBIA_BLUE
                 )
-                embed.add_field(name="Kills", value=f"⚔️ {stat['kills']}", inline=True)
+                embed.add_field(name="Kills", value=f"⚔️ {stat.kills}", inline=True)
                 embed.add_field(
                     name="Promedio", 
-                    value=f"💰 {self.format_number(int(stat['avg_value']))} gp", 
+                    value=f"💰 {self.format_number(int(stat.avg_value))} gp", 
                     inline=True
                 )
                 embed.add_field(
                     name="Total", 
-                    value=f"💎 {self.format_number(int(stat['total_value']))} gp", 
+                    value=f"💎 {self.format_number(int(stat.total_value))} gp", 
                     inline=True
                 )
                 embed.add_field(
                     name="Mejor Loot", 
-                    value=f"🏆 {self.format_number(int(stat['best_loot']))} gp", 
+                    value=f"🏆 {self.format_number(int(stat.best_loot))} gp", 
                     inline=False
                 )
             else:
@@ -332,8 +335,8 @@ class TibiaCog(commands.Cog):
                 
                 for i, stat in enumerate(stats[:10], 1):
                     embed.add_field(
-                        name=f"{i}. {stat['boss_name']}",
-                        value=f"⚔️ {stat['kills']} kills | 💰 {self.format_number(int(stat['avg_value']))} gp promedio",
+                        name=f"{i}. {stat.boss_name}",
+                        value=f"⚔️ {stat.kills} kills | 💰 {self.format_number(int(stat.avg_value))} gp promedio",
                         inline=False
                     )
             
@@ -350,7 +353,9 @@ class TibiaCog(commands.Cog):
     async def loot_mejores(self, interaction: discord.Interaction):
         """Muestra los 10 mejores loots del servidor"""
         try:
-            top_loots = await db_manager.get_top_loots(interaction.guild.id, limit=10)
+            top_loots = await db_manager.get_top_loots(
+                interaction.guild.id, limit=10, include_archive=True, replica=True
+            )
             
             if not top_loots:
                 await interaction.response.send_message(
@@ -367,19 +372,19 @@ class TibiaCog(commands.Cog):
             
             for i, loot in enumerate(top_loots, 1):
                 # Usar get_user primero (cache) antes de fetch_user
-                user = self.bot.get_user(loot['user_id'])
+                user = self.bot.get_user(loot.user_id)
                 if not user:
                     try:
-                        user = await self.bot.fetch_user(loot['user_id'])
+                        user = await self.bot.fetch_user(loot.user_id)
                     except:
                         pass
                 username = user.name if user else "Usuario Desconocido"
-                timestamp = datetime.fromisoformat(loot['timestamp'])
+                timestamp = from_epoch(loot.timestamp)
                 
                 medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
                 
                 embed.add_field(
-                    name=f"{medal} {loot['boss_name']} - {self.format_number(loot['value'])} gp",
+                    name=f"{medal} {loot.boss_name} - {self.format_number(loot.value)} gp",
                     value=f"**Por:** {username}\n**Fecha:** {timestamp.strftime('%d/%m/%Y')}",
                     inline=False
                 )
@@ -393,6 +398,69 @@ class TibiaCog(commands.Cog):
                 ephemeral=True
             )
     
+    @loot_group.command(name="buscar", description="Buscar loots por item o criatura")
+    @app_commands.describe(
+        texto="Items o criatura a buscar, palabras completas (ej: Gold Token)",
+        pagina="Página de resultados (opcional)"
+    )
+    async def loot_buscar(
+        self,
+        interaction: discord.Interaction,
+        texto: str,
+        pagina: app_commands.Range[int, 1, 100] = 1
+    ):
+        """Busca en los items de los loots del servidor, los más relevantes primero"""
+        try:
+            # Se pide uno más para saber si hay página siguiente
+            loots = await db_manager.search_loots(
+                interaction.guild.id, texto,
+                limit=SEARCH_PAGE_SIZE + 1,
+                offset=(pagina - 1) * SEARCH_PAGE_SIZE
+            )
+            
+            if not loots:
+                msg = f"🔍 No hay loots que coincidan con '{texto}'."
+                if pagina > 1:
+                    msg = f"🔍 No hay más resultados para '{texto}' en la página {pagina}."
+                await interaction.response.send_message(msg, ephemeral=True)
+                return
+            
+            has_more = len(loots) > SEARCH_PAGE_SIZE
+            embed = discord.Embed(
+                title=f"🔍 Loots con '{texto}'",
+                color=TIBIA_BLUE
+            )
+            
+            for loot in loots[:SEARCH_PAGE_SIZE]:
+                user = self.bot.get_user(loot.user_id)
+                username = user.name if user else f"Usuario {loot.user_id}"
+                timestamp = from_epoch(loot.timestamp)
+                value_str = f"{self.format_number(loot.value)} gp" if loot.value > 0 else "N/A"
+                
+                items_text = loot.items
+                if len(items_text) > MAX_ITEMS_LENGTH:
+                    items_text = items_text[:MAX_ITEMS_LENGTH] + "..."
+                
+                embed.add_field(
+                    name=f"🗡️ {loot.boss_name} - {value_str}",
+                    value=f"**Items:** {items_text}\n**Por:** {username} • {timestamp.strftime('%d/%m/%Y')}",
+                    inline=False
+                )
+            
+            footer = f"Página {pagina}"
+            if has_more:
+                footer += f" • Usa pagina:{pagina + 1} para ver más"
+            embed.set_footer(text=footer)
+            
+            await interaction.response.send_message(embed=embed)
+            
+        except Exception as e:
+            logger.error(f"Error al buscar loots: {e}")
+            await interaction.response.send_message(
+                "❌ Error al buscar loots.",
+                ephemeral=True
+            )
+    
     @loot_group.command(name="total", description="Valor total de loots ganados")
     @app_commands.describe(usuario="Usuario del que ver el total (opcional)")
     async def loot_total(
@@ -404,7 +472,7 @@ class TibiaCog(commands.Cog):
         target = usuario or interaction.user
         
         try:
-            total = await db_manager.get_total_loot_value(target.id, interaction.guild.id)
+            total = await db_manager.get_total_loot_value(target.id, interaction.guild.id, include_archive=True)
             
             embed = discord.Embed(
                 title=f"💎 Valor Total de Loots",
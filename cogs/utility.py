@@ -61,7 +61,7 @@ class UtilityCog(commands.Cog):
         """Muestra el perfil de gaming del usuario"""
         try:
             # Obtener perfil de la base de datos
-            profile = await db_manager.get_user_profile(interaction.user.id)
+            profile = await db_manager.get_user_profile(interaction.user.id, interaction.guild.id)
             
             # Obtener advertencias
             warning_count = await db_manager.get_warning_count(
@@ -71,8 +71,8 @@ class UtilityCog(commands.Cog):
             
             # Formatear juegos
             games_str = "Ninguno"
-            if profile and profile['games']:
-                games_list = profile['games'].split(',')
+            if profile and profile.games:
+                games_list = profile.games.split(',')
                 games_str = ", ".join([f"{GAMES.get(game, {}).get('emoji', '')} {game}" for game in games_list])
             
             # Crear embed
@@ -109,7 +109,7 @@ class WelcomeCog(commands.Cog):
                 name="💎 Tibia - Loot Tracker",
                 value=(
                     "`/loot registrar` `/loot historial` `/loot stats` "
-                    "`/loot mejores` `/loot total`"
+                    "`/loot mejores` `/loot total` `/loot buscar`"
                 ),
                 inline=False
             )
@@ -79,4 +79,105 @@ GAMES = {
 }
 
 # Nombre de la base de datos
-DATABASE_NAME = 'gaming_bot.db'
\ No newline at end of file
+DATABASE_NAME = 'gaming_bot.db'
+
+# Perfiles de rendimiento de SQLite (PRAGMAs aplicados a cada conexión)
+# cache_size negativo = KiB; busy_timeout en milisegundos
+DATABASE_PROFILES = {
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 128 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -128000,
+        'mmap_size': 512 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000
+    }
+}
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'balanced')
+
+# Reintentos de escritura si otro proceso tiene el bloqueo más allá de busy_timeout:
+# número de reintentos y espera base/máxima en segundos (exponencial con jitter)
+DATABASE_BUSY_RETRIES = int(os.getenv('DATABASE_BUSY_RETRIES', '3'))
+DATABASE_BUSY_BACKOFF = float(os.getenv('DATABASE_BUSY_BACKOFF', '0.05'))
+DATABASE_BUSY_BACKOFF_MAX = float(os.getenv('DATABASE_BUSY_BACKOFF_MAX', '1.0'))
+
+# Commit agrupado: escrituras que llegan dentro de la ventana (ms) comparten un commit,
+# hasta un máximo por transacción; 0 ms confirma cada escritura por separado.
+# Una escritura sola espera la ventana entera antes de su commit (hasta 2 ms por defecto)
+DATABASE_GROUP_COMMIT_MS = float(os.getenv('DATABASE_GROUP_COMMIT_MS', '2'))
+DATABASE_GROUP_COMMIT_MAX = int(os.getenv('DATABASE_GROUP_COMMIT_MAX', '200'))
+
+# Conexiones de solo lectura del pool (el escritor es siempre único)
+DATABASE_READERS = int(os.getenv('DATABASE_READERS', '4'))
+
+# Volcado del XP acumulado: cada cuántos segundos o al llegar a cuántos usuarios
+XP_FLUSH_INTERVAL = float(os.getenv('XP_FLUSH_INTERVAL', '0.5'))
+XP_FLUSH_MAX_ENTRIES = int(os.getenv('XP_FLUSH_MAX_ENTRIES', '500'))
+
+# Umbral en milisegundos a partir del cual una consulta se registra como lenta
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+
+# Caché de lecturas por usuario: entradas máximas (0 la desactiva) y caducidad en segundos
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+CACHE_TTL = float(os.getenv('CACHE_TTL', '60'))
+
+# Motor de almacenamiento: sqlite (un fichero), sharded (un fichero por servidor)
+# o memory (solo pruebas y benchmarks)
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'sqlite').lower()
+
+# Modo sharded: carpeta de los ficheros, número de ficheros (0 = uno por servidor)
+# y máximo de shards abiertos a la vez (se cierran los menos usados)
+DATABASE_SHARD_DIR = os.getenv('DATABASE_SHARD_DIR', 'shards')
+DATABASE_SHARD_BUCKETS = int(os.getenv('DATABASE_SHARD_BUCKETS', '0'))
+DATABASE_MAX_OPEN_SHARDS = int(os.getenv('DATABASE_MAX_OPEN_SHARDS', '32'))
+
+# Copias de seguridad en caliente: carpeta, cada cuántas horas (0 = desactivadas),
+# cuántas se conservan y páginas copiadas por paso
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '6'))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+
+# Exportación columnar para análisis (/dbexport, db_tool.py export): carpeta y
+# formato, 'parquet' o 'arrow' (necesita pyarrow)
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', 'parquet').lower()
+
+# Réplica de análisis: copia de solo lectura que se refresca desde la base principal
+# para las consultas pesadas que toleran datos algo antiguos (vacío = desactivada),
+# cada cuántos minutos se refresca y antigüedad máxima (segundos) antes de volver a la principal
+ANALYTICS_REPLICA = os.getenv('ANALYTICS_REPLICA', '')
+ANALYTICS_REPLICA_REFRESH_MINUTES = float(os.getenv('ANALYTICS_REPLICA_REFRESH_MINUTES', '30'))
+ANALYTICS_REPLICA_MAX_LAG = float(os.getenv('ANALYTICS_REPLICA_MAX_LAG', '5400'))
+
+# Retención: días que loots y advertencias siguen en las tablas activas antes de
+# pasar al archivo (0 = no archivar, opt-in), cada cuántas horas se revisa y filas por lote
+RETENTION_LOOT_DAYS = int(os.getenv('RETENTION_LOOT_DAYS', '0'))
+RETENTION_WARNING_DAYS = int(os.getenv('RETENTION_WARNING_DAYS', '0'))
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', '24'))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+
+# Páginas liberadas por paso de incremental_vacuum (cada paso toma el escritor un momento)
+VACUUM_PAGES_PER_STEP = int(os.getenv('VACUUM_PAGES_PER_STEP', '256'))
+
+# Mantenimiento (ANALYZE, checkpoint del WAL, vacuum incremental): ventanas en horas
+# locales de poco tráfico, p. ej. '4-6' o '2-5,14-15' (vacío = desactivado),
+# y segundos máximos por ejecución
+MAINTENANCE_WINDOWS = os.getenv('MAINTENANCE_WINDOWS', '4-6')
+MAINTENANCE_TIME_BUDGET = float(os.getenv('MAINTENANCE_TIME_BUDGET', '30'))
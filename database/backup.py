@@ -0,0 +1,88 @@
+"""
+Copias de seguridad en caliente con la API de backup de SQLite
+
+La copia usa su propia conexión de solo lectura: el escritor del bot sigue
+libre y cada paso copia unas pocas páginas en el hilo de aiosqlite, sin
+bloquear el bucle de eventos.
+"""
+import logging
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple
+
+import aiosqlite
+
+logger = logging.getLogger('discord_bot')
+
+# Espera (segundos) antes de reintentar un paso si el fichero está ocupado
+BACKUP_STEP_SLEEP = 0.005
+
+SNAPSHOT_TIME_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class BackupResult(NamedTuple):
+    """Resultado de una copia de seguridad"""
+    path: Path
+    size_bytes: int
+    pages: int
+    duration: float
+    timestamp: datetime
+
+
+def snapshot_path(directory: Path, db_name: str, moment: datetime) -> Path:
+    """Ruta de la copia con fecha, p. ej. backups/gaming_bot-20240101-120000.db"""
+    source = Path(db_name)
+    return directory / f"{source.stem}-{moment.strftime(SNAPSHOT_TIME_FORMAT)}{source.suffix}"
+
+
+async def online_backup(db_name: str, destination: Path, pages: int) -> BackupResult:
+    """
+    Copia la base de datos en `destination` mientras el bot sigue escribiendo
+
+    La conexión de origen mantiene abierta una transacción de lectura, así
+    la copia ve una instantánea fija del WAL y las escrituras del bot no la
+    reinician. Se escribe en un .tmp y se renombra al terminar.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + '.tmp')
+    total_pages = 0
+
+    def progress(status: int, remaining: int, total: int):
+        nonlocal total_pages
+        total_pages = total
+
+    moment = datetime.now()
+    start = time.perf_counter()
+    uri = f"{Path(db_name).resolve().as_uri()}?mode=ro"
+    try:
+        async with aiosqlite.connect(uri, uri=True) as source, aiosqlite.connect(partial) as target:
+            await source.execute('BEGIN')
+            await source.execute('SELECT COUNT(*) FROM sqlite_master')
+            await source.backup(target, pages=pages, progress=progress, sleep=BACKUP_STEP_SLEEP)
+            await source.rollback()
+        partial.replace(destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    duration = time.perf_counter() - start
+
+    return BackupResult(destination, destination.stat().st_size, total_pages, duration, moment)
+
+
+def rotate_backups(directory: Path, db_name: str, keep: int) -> List[Path]:
+    """Borra las copias más antiguas de `db_name` y deja solo las `keep` más recientes"""
+    source = Path(db_name)
+    snapshots = sorted(
+        path for path in directory.glob(f"{source.stem}-*{source.suffix}")
+        if not path.name.endswith('.tmp')
+    )
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        logger.info(f"Copia de seguridad antigua eliminada: {path.name}")
+    return removed
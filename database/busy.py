@@ -0,0 +1,32 @@
+"""
+Reintentos ante SQLITE_BUSY con espera exponencial acotada y jitter
+
+Otro proceso (db_tool.py, una copia externa, un segundo bot sobre el mismo
+fichero) puede tener el bloqueo de escritura más allá del busy_timeout del
+perfil. En lugar de dejar que el error llegue al except genérico del cog, la
+transacción se reintenta unas pocas veces con esperas aleatorias para que
+los escritores no vuelvan a chocar al mismo tiempo.
+"""
+import random
+import sqlite3
+
+# Códigos primarios de SQLite (los extendidos llevan el primario en el byte bajo)
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_busy_error(error: BaseException) -> bool:
+    """Indica si el error es un bloqueo pasajero que merece reintento"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)  # Python 3.11+
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    return any(message in str(error).lower() for message in BUSY_MESSAGES)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Espera del reintento `attempt` (desde 0): jitter completo sobre base * 2^attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
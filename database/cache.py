@@ -0,0 +1,103 @@
+"""
+Caché de lecturas frecuentes delante de SQLite (LRU con caducidad)
+
+Las claves son (tabla, user_id, guild_id). Las lecturas la rellenan y las
+escrituras invalidan la clave al confirmar la transacción. Una lectura que
+empezó antes de una invalidación no puede guardar su resultado (ya viejo).
+"""
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+CacheKey = Tuple[str, int, Optional[int]]
+
+# Marca de "no está en caché" (None es un valor válido: el usuario no tiene fila)
+MISSING = object()
+
+
+class ReadCache:
+    """LRU acotado con TTL y contadores de aciertos/fallos por tabla"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, Any]]' = OrderedDict()
+        # Lecturas en curso por clave: una invalidación las descarta
+        self._reads: Dict[CacheKey, Set[object]] = {}
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: CacheKey) -> Any:
+        """Valor guardado, o MISSING si no está o caducó"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits[key[0]] += 1
+                return value
+            del self._entries[key]
+        self.misses[key[0]] += 1
+        return MISSING
+
+    def begin_read(self, key: CacheKey) -> object:
+        """Registra una lectura de la base de datos; devuelve el testigo para fill()"""
+        token = object()
+        self._reads.setdefault(key, set()).add(token)
+        return token
+
+    def fill(self, key: CacheKey, token: object, value: Any):
+        """Guarda el resultado de una lectura si nadie invalidó la clave mientras tanto"""
+        tokens = self._reads.get(key)
+        if tokens is None or token not in tokens:
+            return
+        self.end_read(key, token)
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def end_read(self, key: CacheKey, token: object):
+        """Cierra una lectura sin guardar nada (p. ej. si falló)"""
+        tokens = self._reads.get(key)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._reads[key]
+
+    def invalidate(self, key: CacheKey):
+        """Olvida la clave y descarta las lecturas en curso sobre ella"""
+        self._entries.pop(key, None)
+        self._reads.pop(key, None)
+
+    def invalidate_table(self, table: str):
+        """Olvida todas las claves de una tabla"""
+        for key in [key for key in self._entries if key[0] == table]:
+            del self._entries[key]
+        for key in [key for key in self._reads if key[0] == table]:
+            del self._reads[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._reads.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Aciertos, fallos y porcentaje de acierto por tabla"""
+        result = {}
+        for table in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[table], self.misses[table]
+            result[table] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) * 100 if hits + misses else 0.0
+            }
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -2,271 +2,865 @@
 Gestor de base de datos SQLite para el bot
 """
 import aiosqlite
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
-from config.settings import DATABASE_NAME
+from config.settings import (
+    ANALYTICS_REPLICA,
+    ANALYTICS_REPLICA_MAX_LAG,
+    BACKUP_DIR,
+    BACKUP_KEEP,
+    BACKUP_PAGES_PER_STEP,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL,
+    DATABASE_BUSY_BACKOFF,
+    DATABASE_BUSY_BACKOFF_MAX,
+    DATABASE_BUSY_RETRIES,
+    DATABASE_GROUP_COMMIT_MAX,
+    DATABASE_GROUP_COMMIT_MS,
+    DATABASE_BACKEND,
+    DATABASE_NAME,
+    DATABASE_PROFILE,
+    DATABASE_PROFILES,
+    EXPORT_DIR,
+    EXPORT_FORMAT,
+    MAINTENANCE_TIME_BUDGET,
+    DATABASE_READERS,
+    RETENTION_BATCH_SIZE,
+    RETENTION_LOOT_DAYS,
+    RETENTION_WARNING_DAYS,
+    SLOW_QUERY_MS,
+    VACUUM_PAGES_PER_STEP,
+    XP_FLUSH_INTERVAL,
+    XP_FLUSH_MAX_ENTRIES
+)
+from database.backup import BackupResult, online_backup, rotate_backups, snapshot_path
+from database.busy import backoff_delay, is_busy_error
+from database.cache import MISSING, CacheKey, ReadCache
+from database.export import ExportResult, export_database
+from database.importer import IMPORT_CHUNK_SIZE, ImportRow, chunked, level_from_xp
+from database.maintenance import ANALYSIS_LIMIT, MaintenanceReport
+from database.metrics import InstrumentedConnection, QueryMetrics, current_method, timed
+from database.migrations import run_migrations
+from database.records import (
+    BossStatsRow,
+    EconomyRow,
+    EventRow,
+    LevelRow,
+    LootRow,
+    ProfileRow,
+    WarningRow,
+    columns
+)
+from database.storage import (
+    EVENT_NOTIFY_AHEAD,
+    SEARCH_CANDIDATES,
+    STREAM_CHUNK_SIZE,
+    StorageBackend,
+    check_transfer,
+    epoch_now,
+    search_terms,
+    to_epoch
+)
+from database.xp_buffer import PendingXP, XPAccumulator
 
 logger = logging.getLogger('discord_bot')
 
+WARNING_COLUMNS = columns(WarningRow)
+PROFILE_COLUMNS = columns(ProfileRow)
+EVENT_COLUMNS = columns(EventRow)
+LEVEL_COLUMNS = columns(LevelRow)
+ECONOMY_COLUMNS = columns(EconomyRow)
+LOOT_COLUMNS = columns(LootRow)
+# Eventos sin avisar que empiezan en (ahora, ahora + EVENT_NOTIFY_AHEAD]: rango sobre el índice parcial idx_events_notify
+EVENTS_TO_NOTIFY_SQL = f'SELECT {EVENT_COLUMNS} FROM events WHERE notified = 0 AND event_date > ? AND event_date <= ?'
+BOSS_STATS_SELECT = 'boss_name, kills, CAST(total_value AS REAL) / kills, total_value, best_loot'
+
+# Valores de PRAGMA auto_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def loot_source(include_archive: bool) -> str:
+    """Tabla de loots a consultar: solo la activa, o también el archivo"""
+    if not include_archive:
+        return 'tibia_loots'
+    return f'(SELECT {LOOT_COLUMNS} FROM tibia_loots UNION ALL SELECT {LOOT_COLUMNS} FROM tibia_loots_archive)'
+
+
+def fts_query(terms: List[str]) -> str:
+    """Consulta FTS5 que exige todas las palabras (sin prefijos: obligan a recorrer más índice)"""
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def warning_source(include_archive: bool) -> str:
+    """Tabla de advertencias a consultar: solo la activa, o también el archivo"""
+    if not include_archive:
+        return 'warnings'
+    return f'(SELECT {WARNING_COLUMNS} FROM warnings UNION ALL SELECT {WARNING_COLUMNS} FROM warnings_archive)'
+
+
+class _CommitGroup:
+    """Transacción abierta que reúne las escrituras de varias llamadas hasta su commit"""
+    
+    __slots__ = ('done', 'size', 'timer')
+    
+    def __init__(self):
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Si todas las llamadas fallaron nadie espera el resultado: no avisar de excepción perdida
+        self.done.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self.size = 0
+        self.timer: Optional[asyncio.Task] = None
+    
+    def finish(self, error: Optional[BaseException] = None):
+        if self.done.done():
+            return
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+
+
+class _UnitOfWork:
+    """Transacción abierta por unit_of_work() para las llamadas de una misma tarea"""
+    
+    __slots__ = ('db', 'task', 'keys', 'tables')
+    
+    def __init__(self, db: InstrumentedConnection):
+        self.db = db
+        # Solo se une la tarea que la abrió: las tareas que cree dentro no deben
+        # escribir en una transacción que quizá se deshaga
+        self.task = asyncio.current_task()
+        # Claves de caché a invalidar tras el commit
+        self.keys: List[CacheKey] = []
+        self.tables: List[str] = []
+
+
+class _ReplicaPool:
+    """Conexiones a una copia de la réplica; se cierran cuando otra la sustituye y nadie la usa"""
+    
+    __slots__ = ('readers', 'queue', 'snapshot', 'users', 'retired')
+    
+    def __init__(self, readers: List[aiosqlite.Connection], snapshot: datetime):
+        self.readers = readers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        for conn in readers:
+            self.queue.put_nowait(conn)
+        self.snapshot = snapshot
+        # Lecturas en curso o esperando conexión
+        self.users = 0
+        self.retired = False
+    
+    async def close(self):
+        for conn in self.readers:
+            await conn.close()
+
 
 class DatabaseManager:
     """Gestor de la base de datos SQLite"""
     
-    def __init__(self):
-        self.db_name = DATABASE_NAME
+    def __init__(self, db_name: str = DATABASE_NAME, readers: int = DATABASE_READERS,
+                 profile: str = DATABASE_PROFILE, metrics: Optional[QueryMetrics] = None,
+                 cache: Optional[ReadCache] = None, cache_scope: Optional[int] = None,
+                 replica: Optional[str] = None, replica_max_lag: float = ANALYTICS_REPLICA_MAX_LAG):
+        self.db_name = db_name
+        self.reader_count = max(1, readers)
+        if profile not in DATABASE_PROFILES:
+            logger.warning(f"Perfil de base de datos desconocido '{profile}', usando 'balanced'")
+            profile = 'balanced'
+        self.profile = profile
+        # Pool: una conexión de escritura y N de solo lectura en modo WAL
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_pool: Optional[asyncio.Queue] = None
+        # Commit agrupado: transacción abierta que comparten las escrituras en curso
+        self._group: Optional[_CommitGroup] = None
+        # unit_of_work() en curso (tiene el escritor hasta terminar)
+        self._unit: Optional[_UnitOfWork] = None
+        self.group_window = DATABASE_GROUP_COMMIT_MS / 1000
+        self.group_max = max(1, DATABASE_GROUP_COMMIT_MAX)
+        # Tiempos por método y registro de consultas lentas (compartibles entre shards)
+        self.metrics = metrics or QueryMetrics(SLOW_QUERY_MS)
+        # Caché de lecturas por usuario (balance, nivel, perfil, advertencias)
+        self.cache = cache if cache is not None else ReadCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+        # Los perfiles no llevan guild_id: con una caché compartida entre shards
+        # la clave del perfil usa el shard en su lugar
+        self.cache_scope = cache_scope
+        # XP de mensajes acumulado en memoria hasta el siguiente volcado
+        self._xp_buffer = XPAccumulator(self._write_xp_batch, XP_FLUSH_INTERVAL, XP_FLUSH_MAX_ENTRIES)
+        # Última copia de seguridad (para /dbstats)
+        self.last_backup: Optional[BackupResult] = None
+        # Réplica de análisis: fichero y conexiones a la última copia
+        if replica and Path(replica).resolve() == Path(db_name).resolve():
+            logger.error("La réplica de análisis no puede ser la propia base de datos: réplica desactivada")
+            replica = None
+        self.replica_path = replica
+        self.replica_max_lag = replica_max_lag
+        self._replica: Optional[_ReplicaPool] = None
+        self._replica_lock: Optional[asyncio.Lock] = None
     
-    async def initialize(self):
-        """Inicializa la base de datos y crea las tablas necesarias"""
-        async with aiosqlite.connect(self.db_name) as db:
-            # Tabla de advertencias
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS warnings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    guild_id INTEGER NOT NULL,
-                    moderator_id INTEGER NOT NULL,
-                    reason TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Tabla de perfiles de usuarios
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS user_profiles (
-                    user_id INTEGER PRIMARY KEY,
-                    guild_id INTEGER NOT NULL,
-                    games TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Tabla de eventos
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER NOT NULL,
-                    creator_id INTEGER NOT NULL,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    event_date DATETIME NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    notified BOOLEAN DEFAULT 0
-                )
-            ''')
-            
-            # Tabla de niveles y XP
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS levels (
-                    user_id INTEGER NOT NULL,
-                    guild_id INTEGER NOT NULL,
-                    xp INTEGER DEFAULT 0,
-                    level INTEGER DEFAULT 1,
-                    total_messages INTEGER DEFAULT 0,
-                    last_xp_time DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, guild_id)
-                )
-            ''')
+    async def _connect(self, readonly: bool = False, replica: bool = False) -> aiosqlite.Connection:
+        """Abre una conexión del pool (las de lectura en modo solo lectura)"""
+        if replica:
+            # La copia nunca cambia (cada refresco la sustituye): sin bloqueos ni WAL
+            uri = f"{Path(self.replica_path).resolve().as_uri()}?mode=ro&immutable=1"
+            conn = await aiosqlite.connect(uri, uri=True)
+            readonly = True
+        elif readonly:
+            uri = f"{Path(self.db_name).resolve().as_uri()}?mode=ro"
+            conn = await aiosqlite.connect(uri, uri=True)
+        else:
+            conn = await aiosqlite.connect(self.db_name)
+            # Solo tiene efecto en una base nueva (antes de fijar el modo WAL y crear tablas)
+            await conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        # Tuplas simples: los métodos de lectura construyen los registros de database.records
+        conn.row_factory = None
+        await self._apply_profile(conn, readonly)
+        return conn
+    
+    async def _apply_profile(self, conn: aiosqlite.Connection, readonly: bool):
+        """Aplica los PRAGMAs del perfil de rendimiento configurado"""
+        for pragma, value in DATABASE_PROFILES[self.profile].items():
+            # El modo de journal es del fichero: solo lo fija el escritor
+            if pragma == 'journal_mode' and readonly:
+                continue
+            await conn.execute(f'PRAGMA {pragma} = {value}')
+    
+    @asynccontextmanager
+    async def _read(self, replica: bool = False) -> AsyncIterator[InstrumentedConnection]:
+        """
+        Presta una conexión de lectura del pool
+        
+        replica=True la pide a la réplica de análisis si hay una copia con
+        menos de replica_max_lag segundos; si no, lee de la principal.
+        """
+        if self._reader_pool is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        unit = self._joined_unit()
+        if unit is not None:
+            # Dentro de la unidad de trabajo se lee del escritor: ve sus propias escrituras
+            yield unit.db
+            return
+        if replica:
+            lag = self.replica_lag()
+            if lag is not None and lag <= self.replica_max_lag:
+                self.metrics.record_replica_read(lag)
+                async with self._read_replica() as db:
+                    yield db
+                return
+            if self.replica_path is not None:
+                self.metrics.record_replica_fallback()
+        conn = await self._reader_pool.get()
+        try:
+            yield InstrumentedConnection(conn, self.metrics)
+        finally:
+            self._reader_pool.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def _read_replica(self) -> AsyncIterator[InstrumentedConnection]:
+        """Presta una conexión de la copia actual de la réplica"""
+        replica = self._replica
+        replica.users += 1
+        try:
+            conn = await replica.queue.get()
+            try:
+                yield InstrumentedConnection(conn, self.metrics)
+            finally:
+                replica.queue.put_nowait(conn)
+        finally:
+            replica.users -= 1
+            # La última lectura de una copia ya sustituida la cierra
+            if replica.retired and not replica.users:
+                await replica.close()
+    
+    async def _cached(self, key: CacheKey, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Lectura a través de la caché: solo consulta SQLite si la clave no está"""
+        if not self.cache.enabled or self._joined_unit() is not None:
+            return await load()
+        value = self.cache.get(key)
+        if value is not MISSING:
+            return value
+        token = self.cache.begin_read(key)
+        try:
+            value = await load()
+        except BaseException:
+            self.cache.end_read(key, token)
+            raise
+        self.cache.fill(key, token, value)
+        return value
+    
+    def _joined_unit(self) -> Optional[_UnitOfWork]:
+        """La unidad de trabajo abierta por la tarea actual, si la hay"""
+        unit = self._unit
+        if unit is not None and unit.task is asyncio.current_task():
+            return unit
+        return None
+    
+    def _invalidate(self, key: CacheKey):
+        """Invalida una clave de la caché (dentro de unit_of_work, también tras el commit)"""
+        self.cache.invalidate(key)
+        unit = self._joined_unit()
+        if unit is not None:
+            unit.keys.append(key)
+    
+    def _invalidate_table(self, table: str):
+        """Invalida una tabla de la caché (dentro de unit_of_work, también tras el commit)"""
+        self.cache.invalidate_table(table)
+        unit = self._joined_unit()
+        if unit is not None:
+            unit.tables.append(table)
+    
+    async def _retry_busy(self, method: str, step: Callable[[], Awaitable[Any]]):
+        """Ejecuta `step` reintentando si SQLite devuelve SQLITE_BUSY (espera con jitter)"""
+        for attempt in range(DATABASE_BUSY_RETRIES + 1):
+            try:
+                return await step()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                if attempt == DATABASE_BUSY_RETRIES:
+                    self.metrics.record_busy_failure(method)
+                    logger.error(f"Base de datos bloqueada en {method} tras {attempt} reintentos: {e}")
+                    raise
+                self.metrics.record_busy_retry(method)
+                await asyncio.sleep(backoff_delay(attempt, DATABASE_BUSY_BACKOFF, DATABASE_BUSY_BACKOFF_MAX))
+    
+    async def _begin(self, method: str):
+        """
+        BEGIN IMMEDIATE: toma el bloqueo de escritura al empezar, así si otro
+        proceso lo tiene se reintenta aquí sin haber ejecutado nada del método
+        """
+        await self._retry_busy(method, lambda: self._writer.execute('BEGIN IMMEDIATE'))
+    
+    async def _commit_group(self, group: _CommitGroup):
+        """Confirma la transacción compartida y despierta a sus llamadas (con el lock tomado)"""
+        self._group = None
+        if group.timer is not None and group.timer is not asyncio.current_task():
+            group.timer.cancel()
+        try:
+            await self._retry_busy('group_commit', self._writer.commit)
+        except BaseException as e:
+            await self._writer.rollback()
+            group.finish(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            self.metrics.record_commit(group.size)
+            group.finish()
+    
+    async def _commit_after(self, group: _CommitGroup):
+        """Cierra el grupo cuando termina su ventana"""
+        await asyncio.sleep(self.group_window)
+        async with self._write_lock:
+            if self._group is group:
+                await self._commit_group(group)
+    
+    @asynccontextmanager
+    async def _exclusive(self) -> AsyncIterator[InstrumentedConnection]:
+        """Escritor sin transacción abierta, tras confirmar el grupo pendiente (checkpoint del WAL)"""
+        if self._writer is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        if self._joined_unit() is not None:
+            raise RuntimeError("Operación no disponible dentro de unit_of_work()")
+        method = current_method.get()
+        start = time.perf_counter()
+        contended = self._write_lock.locked()
+        async with self._write_lock:
+            if contended:
+                self.metrics.record_lock_wait(method, time.perf_counter() - start)
+            if self._group is not None:
+                await self._commit_group(self._group)
+            yield InstrumentedConnection(self._writer, self.metrics)
+    
+    @asynccontextmanager
+    async def _write(self, grouped: bool = True) -> AsyncIterator[InstrumentedConnection]:
+        """
+        Da acceso exclusivo al escritor y confirma la transacción al salir
+        
+        Las escrituras que llegan dentro de group_window comparten transacción:
+        cada una va en su SAVEPOINT (un error deshace solo la suya) y todas
+        vuelven cuando el commit común llega a disco. grouped=False abre una
+        transacción propia, para lo que no admite SAVEPOINT (executescript).
+        Dentro de unit_of_work() la escritura va en un SAVEPOINT de la
+        transacción de la unidad, que ya tiene el escritor.
+        """
+        if self._writer is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        unit = self._joined_unit()
+        if unit is not None:
+            await self._writer.execute('SAVEPOINT unit_write')
+            try:
+                yield unit.db
+            except BaseException:
+                if self._writer.in_transaction:
+                    await self._writer.execute('ROLLBACK TO unit_write')
+                    await self._writer.execute('RELEASE unit_write')
+                raise
+            await self._writer.execute('RELEASE unit_write')
+            return
+        method = current_method.get()
+        start = time.perf_counter()
+        contended = self._write_lock.locked()
+        async with self._write_lock:
+            if contended:
+                self.metrics.record_lock_wait(method, time.perf_counter() - start)
             
-            # Tabla de economía
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS economy (
-                    user_id INTEGER NOT NULL,
-                    guild_id INTEGER NOT NULL,
-                    balance INTEGER DEFAULT 0,
-                    last_daily DATETIME,
-                    last_work DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, guild_id)
-                )
-            ''')
+            if not grouped:
+                if self._group is not None:
+                    await self._commit_group(self._group)
+                await self._begin(method)
+                try:
+                    yield InstrumentedConnection(self._writer, self.metrics)
+                    await self._retry_busy(method, self._writer.commit)
+                except BaseException:
+                    await self._writer.rollback()
+                    raise
+                self.metrics.record_commit(1)
+                return
             
-            # Tabla de loots de Tibia
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS tibia_loots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    guild_id INTEGER NOT NULL,
-                    boss_name TEXT NOT NULL,
-                    items TEXT NOT NULL,
-                    value INTEGER DEFAULT 0,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            group = self._group
+            if group is None:
+                await self._begin(method)
+                group = self._group = _CommitGroup()
+                if self.group_window > 0:
+                    group.timer = asyncio.create_task(self._commit_after(group))
+            await self._writer.execute('SAVEPOINT write')
+            try:
+                yield InstrumentedConnection(self._writer, self.metrics)
+            except BaseException as e:
+                if self._writer.in_transaction:
+                    await self._writer.execute('ROLLBACK TO write')
+                    await self._writer.execute('RELEASE write')
+                else:
+                    # SQLite deshizo la transacción entera (disco lleno, E/S): falla todo el grupo
+                    self._group = None
+                    if group.timer is not None:
+                        group.timer.cancel()
+                    group.finish(e)
+                raise
+            await self._writer.execute('RELEASE write')
+            group.size += 1
+            if self.group_window <= 0 or group.size >= self.group_max:
+                await self._commit_group(group)
+        # shield: si esta llamada se cancela, el resto del grupo sigue esperando el commit
+        await asyncio.shield(group.done)
+    
+    @asynccontextmanager
+    async def unit_of_work(self, guild_id: Optional[int] = None) -> AsyncIterator['DatabaseManager']:
+        """
+        Agrupa las llamadas de un comando en una sola transacción del escritor
+        
+            async with db_manager.unit_of_work(guild_id) as uow:
+                last = await uow.get_last_daily(user_id, guild_id)
+                ...
+        
+        Las lecturas dentro de la unidad van al escritor sin pasar por la
+        caché, así la comprobación y la escritura no se cruzan con otro
+        comando del mismo usuario. Si el bloque lanza una excepción se
+        deshace todo. Tiene el escritor hasta salir: nada de esperas a
+        Discord dentro. No admite backup, vacuum ni mantenimiento.
+        
+        Args:
+            guild_id: Servidor de las llamadas (lo necesita el modo sharded)
+        """
+        if self._joined_unit() is not None:
+            # Anidada: se une a la unidad exterior
+            yield self
+            return
+        async with self._write() as db:
+            unit = self._unit = _UnitOfWork(db)
+            try:
+                yield self
+            finally:
+                self._unit = None
+        # Un lector concurrente pudo rellenar la caché antes del commit
+        for key in unit.keys:
+            self.cache.invalidate(key)
+        for table in unit.tables:
+            self.cache.invalidate_table(table)
+    
+    async def initialize(self):
+        """Abre el pool de conexiones y aplica las migraciones pendientes"""
+        if self._writer is None:
+            self._write_lock = asyncio.Lock()
+            self._replica_lock = asyncio.Lock()
+            self._writer = await self._connect()
+        
+        # Crear o actualizar el esquema según PRAGMA user_version
+        version = await run_migrations(self._writer)
+        async with self._writer.execute('PRAGMA auto_vacuum') as cursor:
+            if (await cursor.fetchone())[0] != AUTO_VACUUM_INCREMENTAL:
+                logger.warning(
+                    "La base de datos no usa auto_vacuum incremental: el archivado no reducirá el "
+                    "fichero hasta ejecutar 'python db_tool.py vacuum' con el bot detenido"
                 )
-            ''')
-            
-            await db.commit()
-            logger.info("Base de datos inicializada correctamente")
+        
+        if self._reader_pool is None:
+            self._reader_pool = asyncio.Queue()
+            for _ in range(self.reader_count):
+                conn = await self._connect(readonly=True)
+                self._readers.append(conn)
+                self._reader_pool.put_nowait(conn)
+        
+        self._xp_buffer.start()
+        logger.info(
+            f"Base de datos inicializada correctamente "
+            f"(esquema v{version}, perfil {self.profile}, {self.reader_count} lectores)"
+        )
+    
+    async def close(self):
+        """Vuelca el XP pendiente y cierra todas las conexiones del pool"""
+        if self._writer is not None:
+            await self._xp_buffer.stop()
+        for conn in self._readers:
+            await conn.close()
+        self._readers = []
+        self._reader_pool = None
+        if self._replica is not None:
+            await self._replica.close()
+            self._replica = None
+        if self._writer is not None:
+            async with self._write_lock:
+                if self._group is not None:
+                    await self._commit_group(self._group)
+                await self._writer.close()
+            self._writer = None
+        logger.info("Conexiones a la base de datos cerradas")
+    
+    @timed
+    async def backup(self, directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> Optional[BackupResult]:
+        """Crea una copia en caliente con fecha y borra las que sobran de `keep`"""
+        if self._writer is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        # El XP acumulado entra en la copia
+        await self.flush_xp()
+        directory = Path(directory)
+        result = await online_backup(
+            self.db_name, snapshot_path(directory, self.db_name, datetime.now()), BACKUP_PAGES_PER_STEP
+        )
+        rotate_backups(directory, self.db_name, keep)
+        self.last_backup = result
+        logger.info(
+            f"Copia de seguridad creada: {result.path.name} "
+            f"({result.size_bytes / 1024 / 1024:.1f} MiB, {result.pages} páginas, {result.duration:.2f}s)"
+        )
+        return result
+    
+    @timed
+    async def refresh_replica(self) -> Optional[BackupResult]:
+        """
+        Copia la base principal sobre la réplica de análisis con la API de backup
+        
+        La copia se escribe aparte y se renombra; las lecturas nuevas van a
+        ella y las conexiones a la anterior se cierran cuando terminan.
+        """
+        if self.replica_path is None:
+            return None
+        if self._writer is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        # El XP acumulado entra en la copia
+        await self.flush_xp()
+        # Dos refrescos a la vez escribirían el mismo .tmp
+        async with self._replica_lock:
+            result = await online_backup(self.db_name, Path(self.replica_path), BACKUP_PAGES_PER_STEP)
+            readers = [await self._connect(replica=True) for _ in range(self.reader_count)]
+            old, self._replica = self._replica, _ReplicaPool(readers, result.timestamp)
+            if old is not None:
+                old.retired = True
+                if not old.users:
+                    await old.close()
+        logger.info(
+            f"Réplica de análisis actualizada: {result.path.name} "
+            f"({result.size_bytes / 1024 / 1024:.1f} MiB, {result.duration:.2f}s)"
+        )
+        return result
+    
+    def replica_lag(self) -> Optional[float]:
+        """Segundos desde la instantánea que sirve la réplica (None si no hay réplica)"""
+        if self._replica is None:
+            return None
+        return (datetime.now() - self._replica.snapshot).total_seconds()
+    
+    async def export_columnar(self, directory: str = EXPORT_DIR, fmt: str = EXPORT_FORMAT) -> Optional[ExportResult]:
+        """Exporta las tablas de análisis a Parquet/Arrow en un hilo aparte (ver database.export)"""
+        if self._writer is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        await self.flush_xp()
+        # La conversión a columnas es CPU: en un hilo no frena el bucle de eventos
+        result = await asyncio.to_thread(export_database, self.db_name, Path(directory), fmt)
+        logger.info(
+            f"Exportación {fmt} completada en {directory}: {result.total_rows:,} filas, "
+            f"{result.files} ficheros, {result.size_bytes / 1024 / 1024:.1f} MiB, {result.duration:.2f}s"
+        )
+        return result
     
     # ===== MÉTODOS PARA ADVERTENCIAS =====
     
+    @timed
     async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str):
         """Añade una advertencia a un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 'INSERT INTO warnings (user_id, guild_id, moderator_id, reason) VALUES (?, ?, ?, ?)',
                 (user_id, guild_id, moderator_id, reason)
             )
-            await db.commit()
             logger.info(f"Advertencia añadida para usuario {user_id}")
+        self._invalidate(('warnings', user_id, guild_id))
     
-    async def get_warnings(self, user_id: int, guild_id: int) -> List[Dict]:
-        """Obtiene todas las advertencias de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+    @timed
+    async def get_warnings(self, user_id: int, guild_id: int,
+                           include_archive: bool = False) -> List[WarningRow]:
+        """Obtiene todas las advertencias de un usuario (include_archive añade las archivadas)"""
+        async with self._read() as db:
             async with db.execute(
-                'SELECT * FROM warnings WHERE user_id = ? AND guild_id = ? ORDER BY timestamp DESC',
+                f'''SELECT {WARNING_COLUMNS} FROM {warning_source(include_archive)} 
+                   WHERE user_id = ? AND guild_id = ? ORDER BY timestamp DESC''',
                 (user_id, guild_id)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(WarningRow._make, rows))
     
-    async def get_warning_count(self, user_id: int, guild_id: int) -> int:
-        """Obtiene el número total de advertencias de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            async with db.execute(
-                'SELECT COUNT(*) FROM warnings WHERE user_id = ? AND guild_id = ?',
-                (user_id, guild_id)
-            ) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
+    @timed
+    async def get_warning_count(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        """Obtiene el número total de advertencias de un usuario (include_archive añade las archivadas)"""
+        async def load() -> int:
+            async with self._read() as db:
+                async with db.execute(
+                    f'SELECT COUNT(*) FROM {warning_source(include_archive)} WHERE user_id = ? AND guild_id = ?',
+                    (user_id, guild_id)
+                ) as cursor:
+                    result = await cursor.fetchone()
+                    return result[0] if result else 0
+        
+        if include_archive:
+            return await load()
+        return await self._cached(('warnings', user_id, guild_id), load)
     
     # ===== MÉTODOS PARA PERFILES DE USUARIOS =====
     
+    @timed
     async def update_user_games(self, user_id: int, guild_id: int, games: str):
         """Actualiza los juegos de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO user_profiles (user_id, guild_id, games, updated_at) 
                    VALUES (?, ?, ?, ?) 
                    ON CONFLICT(user_id) DO UPDATE SET games = ?, updated_at = ?''',
-                (user_id, guild_id, games, datetime.now(), games, datetime.now())
+                (user_id, guild_id, games, epoch_now(), games, epoch_now())
             )
-            await db.commit()
+        self._invalidate(('user_profiles', user_id, self.cache_scope))
     
-    async def get_user_profile(self, user_id: int) -> Optional[Dict]:
-        """Obtiene el perfil de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                'SELECT * FROM user_profiles WHERE user_id = ?',
-                (user_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+    @timed
+    async def get_user_profile(self, user_id: int, guild_id: Optional[int] = None) -> Optional[ProfileRow]:
+        """Obtiene el perfil de un usuario (guild_id solo lo usa el modo por shards)"""
+        async def load() -> Optional[ProfileRow]:
+            async with self._read() as db:
+                async with db.execute(
+                    f'SELECT {PROFILE_COLUMNS} FROM user_profiles WHERE user_id = ?',
+                    (user_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return ProfileRow._make(row) if row else None
+        
+        return await self._cached(('user_profiles', user_id, self.cache_scope), load)
     
     # ===== MÉTODOS PARA EVENTOS =====
     
+    @timed
     async def create_event(self, guild_id: int, creator_id: int, title: str, 
                           description: str, event_date: datetime):
         """Crea un nuevo evento"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO events (guild_id, creator_id, title, description, event_date) 
                    VALUES (?, ?, ?, ?, ?)''',
-                (guild_id, creator_id, title, description, event_date)
+                (guild_id, creator_id, title, description, to_epoch(event_date))
             )
-            await db.commit()
             logger.info(f"Evento creado: {title}")
     
-    async def get_upcoming_events(self, guild_id: int) -> List[Dict]:
+    @timed
+    async def get_upcoming_events(self, guild_id: int) -> List[EventRow]:
         """Obtiene todos los eventos futuros de un servidor"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             async with db.execute(
-                '''SELECT * FROM events 
-                   WHERE guild_id = ? AND event_date > datetime('now') 
+                f'''SELECT {EVENT_COLUMNS} FROM events 
+                   WHERE guild_id = ? AND event_date > ? 
                    ORDER BY event_date ASC''',
-                (guild_id,)
+                (guild_id, epoch_now())
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(EventRow._make, rows))
     
-    async def get_events_to_notify(self) -> List[Dict]:
+    @timed
+    async def get_events_to_notify(self) -> List[EventRow]:
         """Obtiene eventos que necesitan notificación (1 hora antes)"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                '''SELECT * FROM events 
-                   WHERE notified = 0 
-                   AND datetime(event_date, '-1 hour') <= datetime('now')
-                   AND event_date > datetime('now')''' 
-            ) as cursor:
+        now = epoch_now()
+        async with self._read() as db:
+            async with db.execute(EVENTS_TO_NOTIFY_SQL, (now, now + EVENT_NOTIFY_AHEAD)) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(EventRow._make, rows))
     
-    async def mark_event_notified(self, event_id: int):
-        """Marca un evento como notificado"""
-        async with aiosqlite.connect(self.db_name) as db:
+    @timed
+    async def mark_event_notified(self, event_id: int, guild_id: Optional[int] = None):
+        """Marca un evento como notificado (guild_id solo lo usa el modo por shards)"""
+        async with self._write() as db:
             await db.execute(
                 'UPDATE events SET notified = 1 WHERE id = ?',
                 (event_id,)
             )
-            await db.commit()
     
     # ===== MÉTODOS PARA NIVELES Y XP =====
     
+    @timed
     async def add_xp(self, user_id: int, guild_id: int, xp_amount: int):
-        """Añade XP a un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            await db.execute(
+        """Añade XP a un usuario (se acumula en memoria y se escribe por lotes)"""
+        self._xp_buffer.add(user_id, guild_id, xp_amount)
+    
+    async def flush_xp(self):
+        """Fuerza la escritura inmediata del XP acumulado"""
+        await self._xp_buffer.flush()
+    
+    @timed
+    async def _write_xp_batch(self, entries: Dict[Tuple[int, int], PendingXP]):
+        """Vuelca un lote del acumulador de XP en una sola transacción"""
+        async with self._write() as db:
+            await db.executemany(
                 '''INSERT INTO levels (user_id, guild_id, xp, total_messages, last_xp_time) 
-                   VALUES (?, ?, ?, 1, ?) 
+                   VALUES (?, ?, ?, ?, ?) 
                    ON CONFLICT(user_id, guild_id) DO UPDATE SET 
-                   xp = xp + ?,
-                   total_messages = total_messages + 1,
-                   last_xp_time = ?''',
-                (user_id, guild_id, xp_amount, datetime.now(), xp_amount, datetime.now())
+                   xp = xp + excluded.xp,
+                   total_messages = total_messages + excluded.total_messages,
+                   last_xp_time = excluded.last_xp_time''',
+                [
+                    (user_id, guild_id, entry.xp, entry.messages, entry.last_xp_time)
+                    for (user_id, guild_id), entry in entries.items()
+                ]
             )
-            await db.commit()
+        for user_id, guild_id in entries:
+            self._invalidate(('levels', user_id, guild_id))
+        logger.debug(f"XP volcado para {len(entries)} usuarios")
     
-    async def get_user_level_data(self, user_id: int, guild_id: int) -> Optional[Dict]:
-        """Obtiene los datos de nivel de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                'SELECT * FROM levels WHERE user_id = ? AND guild_id = ?',
-                (user_id, guild_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+    @timed
+    async def import_levels(self, guild_id: int, rows: Iterable[ImportRow], add: bool = False,
+                            chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+        """
+        Importa (user_id, xp, mensajes) de otro bot en lotes de `chunk_size`
+        
+        Por defecto sustituye XP y mensajes; con add=True los suma a los que
+        ya hay. El nivel se recalcula con la misma fórmula que /rank.
+        
+        Returns:
+            Filas importadas
+        """
+        # El XP pendiente se escribe antes: no debe sumarse encima de lo importado
+        await self.flush_xp()
+        if add:
+            sql = '''INSERT INTO levels (user_id, guild_id, xp, level, total_messages) 
+                     VALUES (?, ?, ?, ?, ?) 
+                     ON CONFLICT(user_id, guild_id) DO UPDATE SET 
+                     xp = xp + excluded.xp,
+                     level = MAX(0, (xp + excluded.xp - 50) / 50),
+                     total_messages = total_messages + excluded.total_messages'''
+        else:
+            sql = '''INSERT INTO levels (user_id, guild_id, xp, level, total_messages) 
+                     VALUES (?, ?, ?, ?, ?) 
+                     ON CONFLICT(user_id, guild_id) DO UPDATE SET 
+                     xp = excluded.xp,
+                     level = excluded.level,
+                     total_messages = excluded.total_messages'''
+        imported = 0
+        for chunk in chunked(rows, chunk_size):
+            params = [
+                (user_id, guild_id, xp, level_from_xp(xp), messages)
+                for user_id, xp, messages in chunk
+            ]
+            # Una transacción por lote: entre lotes el escritor queda libre
+            async with self._write(grouped=False) as db:
+                await db.executemany(sql, params)
+            imported += len(chunk)
+        self._invalidate_table('levels')
+        return imported
     
+    @timed
+    async def get_user_level_data(self, user_id: int, guild_id: int) -> Optional[LevelRow]:
+        """Obtiene los datos de nivel de un usuario (incluye el XP aún no escrito)"""
+        async def load() -> Optional[LevelRow]:
+            async with self._read() as db:
+                async with db.execute(
+                    f'SELECT {LEVEL_COLUMNS} FROM levels WHERE user_id = ? AND guild_id = ?',
+                    (user_id, guild_id)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return LevelRow._make(row) if row else None
+        
+        # En caché va la fila escrita; el XP acumulado se suma en cada lectura
+        data = await self._cached(('levels', user_id, guild_id), load)
+        pending = self._xp_buffer.get(user_id, guild_id)
+        if pending is None:
+            return data
+        if data is None:
+            data = LevelRow(user_id, guild_id, 0, 1, 0, None, None)
+        return data._replace(
+            xp=data.xp + pending.xp,
+            total_messages=data.total_messages + pending.messages,
+            last_xp_time=pending.last_xp_time
+        )
+    
+    @timed
     async def update_level(self, user_id: int, guild_id: int, new_level: int):
         """Actualiza el nivel de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
+        # Upsert: el XP del usuario puede seguir en el acumulador sin fila todavía
+        async with self._write() as db:
             await db.execute(
-                'UPDATE levels SET level = ? WHERE user_id = ? AND guild_id = ?',
-                (new_level, user_id, guild_id)
+                '''INSERT INTO levels (user_id, guild_id, level) 
+                   VALUES (?, ?, ?) 
+                   ON CONFLICT(user_id, guild_id) DO UPDATE SET 
+                   level = excluded.level''',
+                (user_id, guild_id, new_level)
             )
-            await db.commit()
+        self._invalidate(('levels', user_id, guild_id))
     
-    async def get_top_users(self, guild_id: int, limit: int = 10) -> List[Dict]:
-        """Obtiene el top de usuarios por XP"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+    @timed
+    async def get_top_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[LevelRow]:
+        """Obtiene el top de usuarios por XP (el XP acumulado entra en el siguiente volcado)"""
+        async with self._read(replica) as db:
             async with db.execute(
-                'SELECT * FROM levels WHERE guild_id = ? ORDER BY xp DESC LIMIT ?',
+                f'SELECT {LEVEL_COLUMNS} FROM levels WHERE guild_id = ? ORDER BY xp DESC LIMIT ?',
                 (guild_id, limit)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(LevelRow._make, rows))
     
     # ===== MÉTODOS PARA ECONOMÍA =====
     
+    async def _economy_row(self, user_id: int, guild_id: int) -> Optional[EconomyRow]:
+        """Fila de economía del usuario (balance, /daily y /work salen de la misma lectura)"""
+        async def load() -> Optional[EconomyRow]:
+            async with self._read() as db:
+                async with db.execute(
+                    f'SELECT {ECONOMY_COLUMNS} FROM economy WHERE user_id = ? AND guild_id = ?',
+                    (user_id, guild_id)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return EconomyRow._make(row) if row else None
+        
+        return await self._cached(('economy', user_id, guild_id), load)
+    
+    @timed
     async def get_balance(self, user_id: int, guild_id: int) -> int:
         """Obtiene el balance de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            async with db.execute(
-                'SELECT balance FROM economy WHERE user_id = ? AND guild_id = ?',
-                (user_id, guild_id)
-            ) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
+        row = await self._economy_row(user_id, guild_id)
+        return row.balance if row else 0
     
+    @timed
     async def add_money(self, user_id: int, guild_id: int, amount: int):
         """Añade dinero a un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO economy (user_id, guild_id, balance) 
                    VALUES (?, ?, ?) 
@@ -274,156 +868,483 @@ class DatabaseManager:
                    balance = balance + ?''',
                 (user_id, guild_id, amount, amount)
             )
-            await db.commit()
+        self._invalidate(('economy', user_id, guild_id))
     
+    # remove_money y debit_money delegan en adjust_balance, que es el único @timed (un cargo, una muestra)
     async def remove_money(self, user_id: int, guild_id: int, amount: int) -> bool:
-        """Quita dinero a un usuario"""
-        balance = await self.get_balance(user_id, guild_id)
-        if balance < amount:
-            return False
+        """Quita dinero a un usuario si tiene saldo suficiente"""
+        return await self.debit_money(user_id, guild_id, amount) is not None
+    
+    async def debit_money(self, user_id: int, guild_id: int, amount: int) -> Optional[int]:
+        """
+        Descuenta dinero solo si el saldo alcanza, en una única sentencia
         
-        async with aiosqlite.connect(self.db_name) as db:
+        Returns:
+            El nuevo balance, o None si el saldo no era suficiente
+        """
+        return await self.adjust_balance(user_id, guild_id, -amount, min_balance=amount)
+    
+    @timed
+    async def adjust_balance(self, user_id: int, guild_id: int, delta: int,
+                             min_balance: int = 0) -> Optional[int]:
+        """
+        Suma `delta` al balance si el saldo actual es al menos `min_balance`
+        
+        La comprobación y la actualización son la misma sentencia, así dos
+        comandos concurrentes nunca gastan el mismo saldo dos veces.
+        
+        Returns:
+            El nuevo balance, o None si el saldo no era suficiente
+        """
+        async with self._write() as db:
+            async with db.execute(
+                '''UPDATE economy SET balance = balance + ? 
+                   WHERE user_id = ? AND guild_id = ? AND balance >= ? 
+                   RETURNING balance''',
+                (delta, user_id, guild_id, min_balance)
+            ) as cursor:
+                row = await cursor.fetchone()
+        if row is None:
+            return None
+        self._invalidate(('economy', user_id, guild_id))
+        return row[0]
+    
+    @timed
+    async def transfer(self, from_user_id: int, to_user_id: int, guild_id: int, amount: int) -> Optional[int]:
+        """
+        Transfiere dinero entre dos usuarios en una sola transacción
+        (ValueError si la cantidad no es positiva o es el mismo usuario)
+        
+        Returns:
+            El nuevo balance del remitente, o None si no tenía saldo suficiente
+        """
+        check_transfer(from_user_id, to_user_id, amount)
+        async with self._write() as db:
+            async with db.execute(
+                '''UPDATE economy SET balance = balance - ? 
+                   WHERE user_id = ? AND guild_id = ? AND balance >= ? 
+                   RETURNING balance''',
+                (amount, from_user_id, guild_id, amount)
+            ) as cursor:
+                row = await cursor.fetchone()
+            
+            if row is None:
+                return None
+            
+            await db.execute(
+                '''INSERT INTO economy (user_id, guild_id, balance) 
+                   VALUES (?, ?, ?) 
+                   ON CONFLICT(user_id, guild_id) DO UPDATE SET 
+                   balance = balance + excluded.balance''',
+                (to_user_id, guild_id, amount)
+            )
+        self._invalidate(('economy', from_user_id, guild_id))
+        self._invalidate(('economy', to_user_id, guild_id))
+        return row[0]
+    
+    @timed
+    async def set_balance(self, user_id: int, guild_id: int, amount: int):
+        """Establece el balance exacto de un usuario"""
+        async with self._write() as db:
             await db.execute(
-                'UPDATE economy SET balance = balance - ? WHERE user_id = ? AND guild_id = ?',
-                (amount, user_id, guild_id)
+                '''INSERT INTO economy (user_id, guild_id, balance) 
+                   VALUES (?, ?, ?) 
+                   ON CONFLICT(user_id, guild_id) DO UPDATE SET 
+                   balance = excluded.balance''',
+                (user_id, guild_id, amount)
             )
-            await db.commit()
-        return True
+        self._invalidate(('economy', user_id, guild_id))
     
-    async def get_last_daily(self, user_id: int, guild_id: int) -> Optional[str]:
+    @timed
+    async def get_last_daily(self, user_id: int, guild_id: int) -> Optional[int]:
         """Obtiene la última vez que el usuario usó /daily"""
-        async with aiosqlite.connect(self.db_name) as db:
-            async with db.execute(
-                'SELECT last_daily FROM economy WHERE user_id = ? AND guild_id = ?',
-                (user_id, guild_id)
-            ) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else None
+        row = await self._economy_row(user_id, guild_id)
+        return row.last_daily if row else None
     
+    @timed
     async def update_last_daily(self, user_id: int, guild_id: int):
         """Actualiza el timestamp de /daily"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO economy (user_id, guild_id, last_daily) 
                    VALUES (?, ?, ?) 
                    ON CONFLICT(user_id, guild_id) DO UPDATE SET 
                    last_daily = ?''',
-                (user_id, guild_id, datetime.now().isoformat(), datetime.now().isoformat())
+                (user_id, guild_id, epoch_now(), epoch_now())
             )
-            await db.commit()
+        self._invalidate(('economy', user_id, guild_id))
     
-    async def get_last_work(self, user_id: int, guild_id: int) -> Optional[str]:
+    @timed
+    async def get_last_work(self, user_id: int, guild_id: int) -> Optional[int]:
         """Obtiene la última vez que el usuario usó /work"""
-        async with aiosqlite.connect(self.db_name) as db:
-            async with db.execute(
-                'SELECT last_work FROM economy WHERE user_id = ? AND guild_id = ?',
-                (user_id, guild_id)
-            ) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else None
+        row = await self._economy_row(user_id, guild_id)
+        return row.last_work if row else None
     
+    @timed
     async def update_last_work(self, user_id: int, guild_id: int):
         """Actualiza el timestamp de /work"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO economy (user_id, guild_id, last_work) 
                    VALUES (?, ?, ?) 
                    ON CONFLICT(user_id, guild_id) DO UPDATE SET 
                    last_work = ?''',
-                (user_id, guild_id, datetime.now().isoformat(), datetime.now().isoformat())
+                (user_id, guild_id, epoch_now(), epoch_now())
             )
-            await db.commit()
+        self._invalidate(('economy', user_id, guild_id))
     
-    async def get_richest_users(self, guild_id: int, limit: int = 10) -> List[Dict]:
+    @timed
+    async def get_richest_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[EconomyRow]:
         """Obtiene el top de usuarios más ricos"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read(replica) as db:
             async with db.execute(
-                'SELECT * FROM economy WHERE guild_id = ? ORDER BY balance DESC LIMIT ?',
+                f'SELECT {ECONOMY_COLUMNS} FROM economy WHERE guild_id = ? ORDER BY balance DESC LIMIT ?',
                 (guild_id, limit)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(EconomyRow._make, rows))
     
     # ===== MÉTODOS PARA TIBIA LOOTS =====
     
+    @timed
     async def add_tibia_loot(self, user_id: int, guild_id: int, boss_name: str, 
                             items: str, value: int):
         """Añade un registro de loot de Tibia"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._write() as db:
             await db.execute(
                 '''INSERT INTO tibia_loots (user_id, guild_id, boss_name, items, value) 
                    VALUES (?, ?, ?, ?, ?)''',
                 (user_id, guild_id, boss_name, items, value)
             )
-            await db.commit()
             logger.info(f"Loot de Tibia registrado: {boss_name} - {value}gp")
     
-    async def get_user_loots(self, user_id: int, guild_id: int, limit: int = 10) -> List[Dict]:
-        """Obtiene el historial de loots de un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+    @timed
+    async def get_user_loots(self, user_id: int, guild_id: int, limit: int = 10,
+                             include_archive: bool = False) -> List[LootRow]:
+        """Obtiene el historial de loots de un usuario (include_archive añade los archivados)"""
+        async with self._read() as db:
             async with db.execute(
-                '''SELECT * FROM tibia_loots 
+                f'''SELECT {LOOT_COLUMNS} FROM {loot_source(include_archive)} 
                    WHERE user_id = ? AND guild_id = ? 
                    ORDER BY timestamp DESC LIMIT ?''',
                 (user_id, guild_id, limit)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(LootRow._make, rows))
     
-    async def get_boss_stats(self, guild_id: int, boss_name: str = None) -> List[Dict]:
-        """Obtiene estadísticas de drops por criatura"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+    @timed
+    async def get_boss_stats(self, guild_id: int, boss_name: str = None,
+                             replica: bool = False) -> List[BossStatsRow]:
+        """Obtiene estadísticas de drops por criatura (incluye los loots archivados)"""
+        async with self._read(replica) as db:
+            # tibia_boss_stats se actualiza con un trigger en cada loot nuevo
             if boss_name:
                 async with db.execute(
-                    '''SELECT boss_name, COUNT(*) as kills, AVG(value) as avg_value, 
-                       SUM(value) as total_value, MAX(value) as best_loot
-                       FROM tibia_loots 
-                       WHERE guild_id = ? AND boss_name = ?
-                       GROUP BY boss_name''',
+                    f'''SELECT {BOSS_STATS_SELECT} FROM tibia_boss_stats 
+                       WHERE guild_id = ? AND boss_name = ?''',
                     (guild_id, boss_name)
                 ) as cursor:
                     row = await cursor.fetchone()
-                    return [dict(row)] if row else []
+                    return [BossStatsRow._make(row)] if row else []
             else:
                 async with db.execute(
-                    '''SELECT boss_name, COUNT(*) as kills, AVG(value) as avg_value, 
-                       SUM(value) as total_value, MAX(value) as best_loot
-                       FROM tibia_loots 
-                       WHERE guild_id = ?
-                       GROUP BY boss_name
-                       ORDER BY kills DESC
+                    f'''SELECT {BOSS_STATS_SELECT} FROM tibia_boss_stats 
+                       WHERE guild_id = ? 
+                       ORDER BY kills DESC 
                        LIMIT 10''',
                     (guild_id,)
                 ) as cursor:
                     rows = await cursor.fetchall()
-                    return [dict(row) for row in rows]
+                    return list(map(BossStatsRow._make, rows))
     
-    async def get_top_loots(self, guild_id: int, limit: int = 10) -> List[Dict]:
-        """Obtiene los mejores loots registrados"""
-        async with aiosqlite.connect(self.db_name) as db:
-            db.row_factory = aiosqlite.Row
+    @timed
+    async def get_top_loots(self, guild_id: int, limit: int = 10,
+                            include_archive: bool = False, replica: bool = False) -> List[LootRow]:
+        """Obtiene los mejores loots registrados (include_archive añade los archivados)"""
+        async with self._read(replica) as db:
             async with db.execute(
-                '''SELECT * FROM tibia_loots 
+                f'''SELECT {LOOT_COLUMNS} FROM {loot_source(include_archive)} 
                    WHERE guild_id = ? 
                    ORDER BY value DESC LIMIT ?''',
                 (guild_id, limit)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(LootRow._make, rows))
     
-    async def get_total_loot_value(self, user_id: int, guild_id: int) -> int:
-        """Obtiene el valor total de loots ganados por un usuario"""
-        async with aiosqlite.connect(self.db_name) as db:
+    @timed
+    async def get_total_loot_value(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        """Obtiene el valor total de loots ganados por un usuario (include_archive añade los archivados)"""
+        async with self._read() as db:
             async with db.execute(
-                'SELECT SUM(value) FROM tibia_loots WHERE user_id = ? AND guild_id = ?',
+                f'SELECT SUM(value) FROM {loot_source(include_archive)} WHERE user_id = ? AND guild_id = ?',
                 (user_id, guild_id)
             ) as cursor:
                 result = await cursor.fetchone()
                 return result[0] if result and result[0] else 0
+    
+    @timed
+    async def search_loots(self, guild_id: int, text: str, limit: int = 10, offset: int = 0) -> List[LootRow]:
+        """
+        Busca loots por items o criatura, los más relevantes primero
+        
+        Primero los que contienen el texto tal cual en los items, luego los de
+        lista de items más corta y, a igualdad, los más nuevos. Solo se ordenan
+        las SEARCH_CANDIDATES coincidencias más recientes; los loots archivados
+        no están en el índice.
+        """
+        terms = search_terms(text)
+        if not terms:
+            return []
+        async with self._read() as db:
+            # El índice se recorre por rowid descendente y se corta en los
+            # candidatos. bm25 no: cuenta todos los loots con cada palabra, y
+            # con palabras comunes ('coin') eso son decenas de milisegundos.
+            async with db.execute(
+                f'''WITH matches AS (
+                       SELECT l.* FROM tibia_loots_fts f JOIN tibia_loots l ON l.id = f.rowid
+                       WHERE tibia_loots_fts MATCH ? AND l.guild_id = ?
+                       ORDER BY f.rowid DESC LIMIT ?
+                   )
+                   SELECT {LOOT_COLUMNS} FROM matches
+                   ORDER BY instr(lower(items), ?) = 0, length(items), id DESC
+                   LIMIT ? OFFSET ?''',
+                (fts_query(terms), guild_id, SEARCH_CANDIDATES, ' '.join(terms), limit, offset)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return list(map(LootRow._make, rows))
+    
+    # ===== RETENCIÓN Y ARCHIVO =====
+    
+    async def _archive_batch(self, table: str, fields: str, cutoff: int, batch_size: int) -> int:
+        """Mueve al archivo un lote de filas anteriores a `cutoff` en una transacción corta"""
+        async with self._write() as db:
+            async with db.execute(
+                f'''DELETE FROM {table} WHERE id IN (
+                       SELECT id FROM {table} WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                   ) RETURNING {fields}''',
+                (cutoff, batch_size)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            if rows:
+                placeholders = ', '.join('?' * len(rows[0]))
+                await db.executemany(
+                    f'INSERT OR REPLACE INTO {table}_archive ({fields}) VALUES ({placeholders})',
+                    rows
+                )
+        return len(rows)
+    
+    async def _archive_table(self, table: str, fields: str, days: int, batch_size: int) -> int:
+        """Archiva por lotes todo lo anterior al horizonte de `days` días"""
+        cutoff = epoch_now() - days * 86400
+        moved = 0
+        while True:
+            count = await self._archive_batch(table, fields, cutoff, batch_size)
+            moved += count
+            if count < batch_size:
+                return moved
+            # Entre lotes el escritor queda libre para el XP y los comandos
+            await asyncio.sleep(0)
+    
+    @timed
+    async def archive_old_rows(self, loot_days: int = RETENTION_LOOT_DAYS,
+                               warning_days: int = RETENTION_WARNING_DAYS,
+                               batch_size: int = RETENTION_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Mueve loots y advertencias antiguos a sus tablas de archivo
+        
+        Un horizonte de 0 días desactiva el archivado de esa tabla. Después se
+        libera el espacio con vacuum incremental.
+        
+        Returns:
+            Filas archivadas por tabla y páginas liberadas ('pages')
+        """
+        moved = {'tibia_loots': 0, 'warnings': 0}
+        if loot_days > 0:
+            moved['tibia_loots'] = await self._archive_table('tibia_loots', LOOT_COLUMNS, loot_days, batch_size)
+        if warning_days > 0:
+            moved['warnings'] = await self._archive_table('warnings', WARNING_COLUMNS, warning_days, batch_size)
+            self._invalidate_table('warnings')
+        moved['pages'] = await self.incremental_vacuum() if any(moved.values()) else 0
+        logger.info(
+            f"Archivado completado: {moved['tibia_loots']} loots, {moved['warnings']} advertencias, "
+            f"{moved['pages']} páginas liberadas"
+        )
+        return moved
+    
+    @timed
+    async def incremental_vacuum(self, pages_per_step: int = VACUUM_PAGES_PER_STEP) -> int:
+        """
+        Devuelve al sistema las páginas libres, pocas en cada transacción
+        
+        Returns:
+            Páginas liberadas (0 si la base no usa auto_vacuum incremental)
+        """
+        async with self._read() as db:
+            async with db.execute('PRAGMA auto_vacuum') as cursor:
+                if (await cursor.fetchone())[0] != AUTO_VACUUM_INCREMENTAL:
+                    return 0
+        
+        freed = 0
+        while True:
+            step = await self._vacuum_step(pages_per_step)
+            if not step:
+                return freed
+            freed += step
+            await asyncio.sleep(0)
+    
+    async def _vacuum_step(self, pages_per_step: int) -> int:
+        """Libera hasta pages_per_step páginas en una transacción corta; devuelve cuántas"""
+        # executescript confirma por su cuenta: no puede ir dentro de un SAVEPOINT
+        async with self._write(grouped=False) as db:
+            async with db.execute('PRAGMA freelist_count') as cursor:
+                free = (await cursor.fetchone())[0]
+            if not free:
+                return 0
+            step = min(free, pages_per_step)
+            # execute() liberaría una sola página: el PRAGMA devuelve una fila vacía
+            # por página y sqlite3 deja de avanzar; executescript lo lleva hasta el final
+            await db.executescript(f'PRAGMA incremental_vacuum({step})')
+        return step
+    
+    async def _page_counts(self) -> Tuple[int, int]:
+        """Páginas totales y libres del fichero"""
+        async with self._read() as db:
+            async with db.execute('PRAGMA page_count') as cursor:
+                pages = (await cursor.fetchone())[0]
+            async with db.execute('PRAGMA freelist_count') as cursor:
+                free = (await cursor.fetchone())[0]
+        return pages, free
+    
+    @timed
+    async def maintenance(self, time_budget: float = MAINTENANCE_TIME_BUDGET,
+                          pages_per_step: int = VACUUM_PAGES_PER_STEP) -> MaintenanceReport:
+        """
+        Estadísticas del planificador, checkpoint del WAL y vacuum incremental
+        
+        Cada paso es una transacción corta; al agotar time_budget segundos se
+        deja el resto para la siguiente ventana (completed=False).
+        """
+        deadline = time.perf_counter() + time_budget
+        pages_before, free_before = await self._page_counts()
+        
+        # Sin sqlite_stat1 PRAGMA optimize no analiza nada: la primera vez, ANALYZE
+        start = time.perf_counter()
+        async with self._write(grouped=False) as db:
+            async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'") as cursor:
+                analyzed = await cursor.fetchone() is not None
+            await db.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+            await db.execute('PRAGMA optimize' if analyzed else 'ANALYZE')
+        analyze_time = time.perf_counter() - start
+        
+        # PASSIVE no espera a lectores ni escritores: copia lo que puede.
+        # Dentro de una transacción SQLite lo rechaza (database table is locked)
+        start = time.perf_counter()
+        async with self._exclusive() as db:
+            async with db.execute('PRAGMA wal_checkpoint(PASSIVE)') as cursor:
+                _, wal_pages, checkpointed = await cursor.fetchone()
+        checkpoint_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        vacuumed = 0
+        completed = True
+        async with self._read() as db:
+            async with db.execute('PRAGMA auto_vacuum') as cursor:
+                incremental = (await cursor.fetchone())[0] == AUTO_VACUUM_INCREMENTAL
+        while incremental:
+            if time.perf_counter() >= deadline:
+                completed = False
+                break
+            step = await self._vacuum_step(pages_per_step)
+            if not step:
+                break
+            vacuumed += step
+            await asyncio.sleep(0)
+        vacuum_time = time.perf_counter() - start
+        
+        pages_after, free_after = await self._page_counts()
+        report = MaintenanceReport(
+            pages_before, pages_after, free_before, free_after, max(wal_pages, 0), max(checkpointed, 0),
+            vacuumed, analyze_time, checkpoint_time, vacuum_time, completed
+        )
+        logger.info(
+            f"Mantenimiento de {self.db_name}: páginas {pages_before} -> {pages_after} "
+            f"(libres {free_before} -> {free_after}); "
+            f"{'optimize' if analyzed else 'ANALYZE'} {analyze_time:.2f}s, "
+            f"checkpoint {checkpointed}/{wal_pages} páginas del WAL en {checkpoint_time:.2f}s, "
+            f"vacuum {vacuumed} páginas en {vacuum_time:.2f}s"
+            + ("" if completed else " (tiempo agotado, continúa en la siguiente ventana)")
+        )
+        return report
+    
+    # ===== RECORRIDOS POR BLOQUES =====
+    
+    async def _stream(self, record: type, sql: str, params: tuple,
+                      chunk_size: int) -> AsyncIterator[tuple]:
+        """
+        Recorre el resultado de una consulta leyendo chunk_size filas cada vez
+    
+        La conexión de lectura queda prestada hasta terminar (o abandonar) el
+        recorrido, así la memoria no depende del tamaño de la tabla.
+        """
+        async with self._read() as db:
+            # Se mide solo la ejecución: el tiempo entre bloques es del consumidor
+            cursor = await db.execute(sql, params)
+            try:
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield record._make(row)
+            finally:
+                await cursor.close()
+    
+    async def iter_levels(self, guild_id: int,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LevelRow]:
+        """Recorre los niveles de un servidor de mayor a menor XP"""
+        await self.flush_xp()
+        async for row in self._stream(
+            LevelRow,
+            f'SELECT {LEVEL_COLUMNS} FROM levels WHERE guild_id = ? ORDER BY xp DESC',
+            (guild_id,), chunk_size
+        ):
+            yield row
+    
+    async def iter_loots(self, guild_id: int, since: Optional[datetime] = None,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LootRow]:
+        """Recorre los loots de un servidor en orden cronológico, opcionalmente desde `since`"""
+        async for row in self._stream(
+            LootRow,
+            f'''SELECT {LOOT_COLUMNS} FROM tibia_loots
+               WHERE guild_id = ? AND timestamp >= ?
+               ORDER BY timestamp''',
+            (guild_id, to_epoch(since) if since else 0), chunk_size
+        ):
+            yield row
+    
+    async def iter_economy(self, guild_id: int,
+                           chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[EconomyRow]:
+        """Recorre la economía de un servidor de mayor a menor balance"""
+        async for row in self._stream(
+            EconomyRow,
+            f'SELECT {ECONOMY_COLUMNS} FROM economy WHERE guild_id = ? ORDER BY balance DESC',
+            (guild_id,), chunk_size
+        ):
+            yield row
+
+
+def create_storage(backend: str = DATABASE_BACKEND) -> StorageBackend:
+    """Crea el almacenamiento configurado en DATABASE_BACKEND"""
+    if backend == 'memory':
+        from database.memory_backend import MemoryStorage
+        return MemoryStorage()
+    if backend == 'sharded':
+        from database.sharding import ShardedStorage
+        return ShardedStorage()
+    if backend != 'sqlite':
+        logger.warning(f"Motor de almacenamiento desconocido '{backend}', usando 'sqlite'")
+    return DatabaseManager(replica=ANALYTICS_REPLICA or None)
 
 
 # Instancia global del gestor de base de datos
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager: StorageBackend = create_storage()
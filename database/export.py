@@ -0,0 +1,251 @@
+"""
+Exportación columnar (Parquet o Arrow IPC) para análisis
+
+Lee con su propia conexión de solo lectura dentro de una transacción (todas
+las tablas del mismo instante, sin tomar el escritor del bot) y escribe por
+bloques de filas: la memoria usada no depende del tamaño de las tablas.
+Los ficheros quedan particionados por servidor y mes al estilo Hive:
+
+    exports/tibia_loots/guild_id=123/month=2024-05/tibia_loots.parquet
+
+Cada exportación se escribe en una carpeta temporal oculta y sustituye a la
+anterior al terminar, así no quedan particiones de filas que ya se movieron
+al archivo o se borraron.
+
+pyarrow es opcional: solo hace falta para exportar.
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import ipc
+except ImportError:
+    pa = pq = ipc = None
+
+logger = logging.getLogger('discord_bot')
+
+EXPORT_FORMATS = ('parquet', 'arrow')
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Filas leídas y convertidas por bloque
+EXPORT_CHUNK_SIZE = 50_000
+
+# Columnas en segundos Unix que se exportan como timestamp UTC
+DATE_COLUMNS = {'timestamp', 'created_at', 'last_xp_time', 'last_daily', 'last_work'}
+
+# Tipo declarado en SQLite -> tipo de Arrow
+COLUMN_TYPES = {'INTEGER': 'int64', 'REAL': 'float64', 'TEXT': 'string'}
+
+
+class ExportSource(NamedTuple):
+    """Conjunto exportado y tablas de las que se lee"""
+    dataset: str
+    tables: Tuple[str, ...]
+    # Columna que fija el mes de cada fila; None = mes de la exportación (foto del estado)
+    time_column: Optional[str]
+
+
+EXPORTS = (
+    ExportSource('levels', ('levels',), None),
+    ExportSource('economy', ('economy',), None),
+    ExportSource('tibia_loots', ('tibia_loots', 'tibia_loots_archive'), 'timestamp'),
+    ExportSource('warnings', ('warnings', 'warnings_archive'), 'timestamp'),
+)
+
+
+class ExportResult(NamedTuple):
+    """Resultado de una exportación"""
+    directory: Path
+    rows: Dict[str, int]
+    files: int
+    size_bytes: int
+    duration: float
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+
+def merge_results(directory: Path, results: List[ExportResult], duration: float) -> ExportResult:
+    """Suma las exportaciones de varios ficheros (modo sharded)"""
+    rows: Dict[str, int] = {}
+    for result in results:
+        for dataset, count in result.rows.items():
+            rows[dataset] = rows.get(dataset, 0) + count
+    return ExportResult(
+        directory, rows,
+        sum(result.files for result in results),
+        sum(result.size_bytes for result in results),
+        duration
+    )
+
+
+def _schema(conn: sqlite3.Connection, table: str) -> Tuple[List[str], 'pa.Schema']:
+    """Columnas de la tabla (sin guild_id, que va en la ruta) y su esquema de Arrow"""
+    names, fields = [], []
+    for _, name, declared, *_ in conn.execute(f'PRAGMA table_info({table})'):
+        if name == 'guild_id':
+            continue
+        if name in DATE_COLUMNS:
+            arrow_type = pa.timestamp('s', tz='UTC')
+        else:
+            arrow_type = getattr(pa, COLUMN_TYPES.get(declared.upper(), 'string'))()
+        names.append(name)
+        fields.append(pa.field(name, arrow_type))
+    return names, pa.schema(fields)
+
+
+def _runs(guilds: tuple, months: tuple) -> Iterator[Tuple[int, int]]:
+    """Tramos [inicio, fin) de filas consecutivas del mismo servidor y mes"""
+    start = 0
+    for i in range(1, len(guilds)):
+        if guilds[i] != guilds[i - 1] or months[i] != months[i - 1]:
+            yield start, i
+            start = i
+    yield start, len(guilds)
+
+
+class _PartitionWriter:
+    """Fichero de la partición en curso, dentro de la carpeta temporal de la exportación"""
+
+    def __init__(self, path: Path, schema: 'pa.Schema', fmt: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        if fmt == 'parquet':
+            self.writer = pq.ParquetWriter(self.path, schema, compression='zstd')
+        else:
+            self.writer = ipc.new_file(str(self.path), schema)
+
+    def write(self, batch: 'pa.RecordBatch'):
+        self.writer.write_batch(batch)
+
+    def close(self) -> int:
+        self.writer.close()
+        return self.path.stat().st_size
+
+    def abort(self):
+        self.writer.close()
+
+
+def export_database(db_name: str, directory: Path, fmt: str = 'parquet',
+                    chunk_size: int = EXPORT_CHUNK_SIZE, moment: Optional[datetime] = None) -> ExportResult:
+    """
+    Exporta levels, economy, tibia_loots y warnings (con sus archivos) a `directory`
+
+    Sustituye la exportación anterior: tibia_loots y warnings se reescriben
+    enteros. levels y economy son una foto del estado: van al mes de la
+    exportación y se conservan los meses anteriores, así exportar cada mes
+    deja la evolución del XP y del balance.
+    """
+    return export_databases([db_name], directory, fmt, chunk_size, moment)
+
+
+def export_databases(db_names: List[str], directory: Path, fmt: str = 'parquet',
+                     chunk_size: int = EXPORT_CHUNK_SIZE, moment: Optional[datetime] = None) -> ExportResult:
+    """Exporta varios ficheros (los shards) a la misma carpeta y la sustituye una sola vez al final"""
+    if pa is None:
+        raise RuntimeError("La exportación columnar necesita pyarrow: pip install pyarrow")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido '{fmt}' (usa {' o '.join(EXPORT_FORMATS)})")
+
+    snapshot_month = (moment or datetime.now(timezone.utc)).strftime('%Y-%m')
+    start = time.perf_counter()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Oculta: los lectores de datasets Hive (pyarrow, DuckDB, Spark) ignoran las carpetas con punto
+    staging = Path(tempfile.mkdtemp(prefix='.export-', dir=directory))
+    try:
+        results = [_export_file(db_name, staging, fmt, chunk_size, snapshot_month) for db_name in db_names]
+        _publish(staging, directory, snapshot_month)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return merge_results(directory, results, time.perf_counter() - start)
+
+
+def _publish(staging: Path, directory: Path, snapshot_month: str):
+    """Cambia cada conjunto de `directory` por el recién escrito en `staging`"""
+    for source in EXPORTS:
+        new = staging / source.dataset
+        old = directory / source.dataset
+        new.mkdir(exist_ok=True)
+        if source.time_column is None and old.exists():
+            # Foto del estado: los meses anteriores pasan a la nueva carpeta con enlaces duros (sin copiar datos)
+            for partition in old.glob('guild_id=*/month=*'):
+                if partition.name != f'month={snapshot_month}':
+                    shutil.copytree(partition, new / partition.parent.name / partition.name, copy_function=os.link)
+        if old.exists():
+            retired = staging / f'{source.dataset}.old'
+            old.replace(retired)
+        new.replace(old)
+
+
+def _export_file(db_name: str, directory: Path, fmt: str, chunk_size: int, snapshot_month: str) -> ExportResult:
+    """Escribe las particiones de un fichero SQLite en `directory`"""
+    start = time.perf_counter()
+    rows: Dict[str, int] = {}
+    files = size = 0
+
+    conn = sqlite3.connect(f"{Path(db_name).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        # Una sola transacción de lectura: todas las tablas del mismo instante
+        conn.execute('BEGIN')
+        for source in EXPORTS:
+            rows[source.dataset] = 0
+            for table in source.tables:
+                names, schema = _schema(conn, table)
+                if source.time_column:
+                    month = f"COALESCE(strftime('%Y-%m', {source.time_column}, 'unixepoch'), 'unknown')"
+                    order = f'guild_id, {source.time_column}'
+                else:
+                    month, order = '?', 'guild_id'
+                cursor = conn.execute(
+                    f'SELECT {", ".join(names)}, guild_id, {month} FROM {table} ORDER BY {order}',
+                    () if source.time_column else (snapshot_month,)
+                )
+                writer: Optional[_PartitionWriter] = None
+                partition = None
+                try:
+                    while True:
+                        chunk = cursor.fetchmany(chunk_size)
+                        if not chunk:
+                            break
+                        columns = list(zip(*chunk))
+                        guilds, months = columns[-2], columns[-1]
+                        batch = pa.RecordBatch.from_arrays(
+                            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                            schema=schema
+                        )
+                        for first, end in _runs(guilds, months):
+                            key = (guilds[first], months[first])
+                            if key != partition:
+                                if writer is not None:
+                                    size += writer.close()
+                                    files += 1
+                                partition = key
+                                writer = _PartitionWriter(
+                                    directory / source.dataset / f'guild_id={key[0]}' / f'month={key[1]}'
+                                    / f'{table}{EXTENSIONS[fmt]}',
+                                    schema, fmt
+                                )
+                            writer.write(batch.slice(first, end - first))
+                        rows[source.dataset] += len(chunk)
+                    if writer is not None:
+                        size += writer.close()
+                        files += 1
+                        writer = None
+                finally:
+                    if writer is not None:
+                        writer.abort()
+        conn.rollback()
+    finally:
+        conn.close()
+
+    return ExportResult(directory, rows, files, size, time.perf_counter() - start)
@@ -0,0 +1,150 @@
+"""
+Importación masiva de niveles/XP desde otros bots de niveles
+
+Lee CSV, JSON o JSON Lines con (user_id, xp, messages), valida las filas
+en una sola pasada sin cargar el fichero entero (salvo JSON, que es un
+único documento) y las entrega por bloques para escribirlas con
+executemany en transacciones cortas.
+"""
+import csv
+import io
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, TextIO, Tuple
+
+# Filas por executemany/transacción
+IMPORT_CHUNK_SIZE = 5000
+
+# Errores de validación que se guardan para el informe (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 10
+
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+
+# Nombres de columna que usan otros bots para cada campo
+FIELD_ALIASES = {
+    'user_id': ('user_id', 'id', 'userid', 'member_id', 'discord_id'),
+    'xp': ('xp', 'experience', 'exp', 'total_xp'),
+    'messages': ('messages', 'message_count', 'total_messages', 'msgs'),
+}
+
+# Claves bajo las que algunos bots guardan la lista de usuarios en JSON
+JSON_LIST_KEYS = ('players', 'users', 'members', 'levels')
+
+# (user_id, xp, mensajes)
+ImportRow = Tuple[int, int, int]
+
+
+class ImportResult(NamedTuple):
+    """Resultado de una importación"""
+    imported: int
+    rejected: int
+    errors: List[str]
+    duration: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.duration if self.duration else 0.0
+
+
+def level_from_xp(xp: int) -> int:
+    """
+    Nivel para un XP total, igual que cogs.levels.calculate_level_from_xp
+
+    El nivel N se alcanza con N * 50 + 50 de XP, así que basta una división
+    en lugar de recorrer los niveles uno a uno.
+    """
+    return max(0, (xp - 50) // 50)
+
+
+def detect_format(name: str) -> str:
+    """Formato según la extensión del fichero"""
+    suffix = Path(name).suffix.lower().lstrip('.')
+    if suffix == 'ndjson':
+        return 'jsonl'
+    if suffix not in IMPORT_FORMATS:
+        raise ValueError(f"Formato no soportado '{suffix}' (usa .csv, .json o .jsonl)")
+    return suffix
+
+
+def read_records(source: TextIO, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """Recorre los registros como (línea o posición, dict) sin validarlos"""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+    else:
+        data = json.load(source)
+        if isinstance(data, dict):
+            data = next((data[key] for key in JSON_LIST_KEYS if isinstance(data.get(key), list)), None)
+        if not isinstance(data, list):
+            raise ValueError(f"El JSON debe ser una lista de usuarios o tener una de: {', '.join(JSON_LIST_KEYS)}")
+        yield from enumerate(data, 1)
+
+
+def _field(record: Dict, name: str, default=None):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    if default is None:
+        raise KeyError(f"falta '{name}'")
+    return default
+
+
+class ImportValidator:
+    """Valida registros en streaming y cuenta los descartados"""
+
+    def __init__(self):
+        self.rejected = 0
+        self.errors: List[str] = []
+
+    def _reject(self, number: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Fila {number}: {reason}")
+
+    def rows(self, records: Iterable[Tuple[int, Dict]]) -> Iterator[ImportRow]:
+        for number, record in records:
+            if not isinstance(record, dict):
+                self._reject(number, "no es un objeto JSON válido")
+                continue
+            try:
+                # JSON trae a veces los ids como texto y el XP como float
+                user_id = int(_field(record, 'user_id'))
+                xp = int(float(_field(record, 'xp')))
+                messages = int(float(_field(record, 'messages', 0)))
+            except KeyError as e:
+                self._reject(number, e.args[0])
+                continue
+            except (TypeError, ValueError):
+                self._reject(number, "valor no numérico")
+                continue
+            if user_id <= 0 or xp < 0 or messages < 0:
+                self._reject(number, "user_id, xp o messages fuera de rango")
+                continue
+            yield user_id, xp, messages
+
+
+def chunked(rows: Iterable[ImportRow], size: int) -> Iterator[List[ImportRow]]:
+    """Agrupa las filas en bloques de `size`"""
+    chunk: List[ImportRow] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_text(data: bytes) -> TextIO:
+    """Texto de un adjunto de Discord (admite BOM de Excel)"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='')
@@ -0,0 +1,436 @@
+"""
+Almacenamiento en memoria (diccionarios y listas ordenadas) sin E/S de disco
+
+Implementa la misma interfaz que DatabaseManager para pruebas de carga y
+benchmarks: mide el coste ideal de cada operación sin la capa SQL.
+Los datos se pierden al cerrar el bot.
+"""
+import asyncio
+import bisect
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import SLOW_QUERY_MS
+from database.backup import BackupResult
+from database.export import ExportResult
+from database.importer import IMPORT_CHUNK_SIZE, ImportRow, level_from_xp
+from database.maintenance import EMPTY_REPORT, MaintenanceReport
+from database.metrics import QueryMetrics, timed
+from database.records import (
+    BossStatsRow,
+    EconomyRow,
+    EventRow,
+    LevelRow,
+    LootRow,
+    ProfileRow,
+    WarningRow
+)
+from database.storage import (
+    EVENT_NOTIFY_AHEAD,
+    SEARCH_CANDIDATES,
+    STREAM_CHUNK_SIZE,
+    check_transfer,
+    epoch_now,
+    search_terms,
+    to_epoch
+)
+
+logger = logging.getLogger('discord_bot')
+
+UserKey = Tuple[int, int]
+
+
+class _SortedIndex:
+    """Índice ordenado de mayor a menor puntuación por servidor (como un índice DESC)"""
+
+    __slots__ = ('_keys', '_scores')
+
+    def __init__(self):
+        self._keys: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        self._scores: Dict[UserKey, int] = {}
+
+    def update(self, user_id: int, guild_id: int, score: int):
+        keys = self._keys[guild_id]
+        old = self._scores.get((user_id, guild_id))
+        if old is not None:
+            del keys[bisect.bisect_left(keys, (-old, user_id))]
+        bisect.insort(keys, (-score, user_id))
+        self._scores[(user_id, guild_id)] = score
+
+    def top(self, guild_id: int, limit: int) -> List[int]:
+        """IDs de usuario con mayor puntuación"""
+        return [user_id for _, user_id in self._keys.get(guild_id, [])[:limit]]
+
+
+class _BossAggregate:
+    """Estadísticas acumuladas de una criatura"""
+
+    __slots__ = ('kills', 'total_value', 'best_loot')
+
+    def __init__(self):
+        self.kills = 0
+        self.total_value = 0
+        self.best_loot = 0
+
+    def row(self, boss_name: str) -> BossStatsRow:
+        return BossStatsRow(boss_name, self.kills, self.total_value / self.kills,
+                            self.total_value, self.best_loot)
+
+
+class MemoryStorage:
+    """Implementación en memoria de la interfaz de almacenamiento"""
+
+    def __init__(self):
+        self.metrics = QueryMetrics(SLOW_QUERY_MS)
+        # Los datos ya están en memoria: no hace falta caché
+        self.cache = None
+        self._warnings: Dict[UserKey, List[WarningRow]] = defaultdict(list)
+        self._warning_seq = 0
+        self._profiles: Dict[int, ProfileRow] = {}
+        self._events: Dict[int, EventRow] = {}
+        self._event_seq = 0
+        self._levels: Dict[UserKey, LevelRow] = {}
+        self._levels_by_xp = _SortedIndex()
+        self._economy: Dict[UserKey, EconomyRow] = {}
+        self._economy_by_balance = _SortedIndex()
+        self._loots: Dict[int, LootRow] = {}
+        self._loot_seq = 0
+        self._loots_by_user: Dict[UserKey, List[int]] = defaultdict(list)
+        # Por servidor: (-valor, id) ordenado, como el índice (guild_id, value DESC)
+        self._loots_by_value: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        self._boss_stats: Dict[int, Dict[str, _BossAggregate]] = defaultdict(dict)
+        self.last_backup = None
+        # unit_of_work() en curso
+        self._unit_lock: Optional[asyncio.Lock] = None
+        self._unit_task: Optional[asyncio.Task] = None
+
+    async def initialize(self):
+        logger.info("Almacenamiento en memoria inicializado (los datos no se guardan en disco)")
+
+    async def close(self):
+        logger.info("Almacenamiento en memoria cerrado")
+
+    async def backup(self, directory: str = None, keep: int = None) -> Optional[BackupResult]:
+        """Sin fichero que copiar"""
+        logger.debug("Copia de seguridad omitida: el almacenamiento en memoria no usa disco")
+        return None
+
+    async def export_columnar(self, directory: str = None, fmt: str = None) -> Optional[ExportResult]:
+        """Sin fichero que exportar"""
+        logger.debug("Exportación omitida: el almacenamiento en memoria no usa disco")
+        return None
+
+    async def refresh_replica(self) -> Optional[BackupResult]:
+        """Sin réplica: las lecturas en memoria no compiten con las escrituras"""
+        return None
+
+    def replica_lag(self) -> Optional[float]:
+        return None
+
+    @asynccontextmanager
+    async def unit_of_work(self, guild_id: Optional[int] = None) -> AsyncIterator['MemoryStorage']:
+        """Sin transacciones ni rollback: solo serializa las unidades entre sí"""
+        if self._unit_task is asyncio.current_task():
+            yield self
+            return
+        if self._unit_lock is None:
+            self._unit_lock = asyncio.Lock()
+        async with self._unit_lock:
+            self._unit_task = asyncio.current_task()
+            try:
+                yield self
+            finally:
+                self._unit_task = None
+
+    # ===== MÉTODOS PARA ADVERTENCIAS =====
+
+    @timed
+    async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str):
+        self._warning_seq += 1
+        self._warnings[(user_id, guild_id)].append(
+            WarningRow(self._warning_seq, user_id, guild_id, moderator_id, reason, epoch_now())
+        )
+
+    @timed
+    async def get_warnings(self, user_id: int, guild_id: int,
+                           include_archive: bool = False) -> List[WarningRow]:
+        return list(reversed(self._warnings.get((user_id, guild_id), [])))
+
+    @timed
+    async def get_warning_count(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        return len(self._warnings.get((user_id, guild_id), []))
+
+    # ===== MÉTODOS PARA PERFILES DE USUARIOS =====
+
+    @timed
+    async def update_user_games(self, user_id: int, guild_id: int, games: str):
+        now = epoch_now()
+        current = self._profiles.get(user_id)
+        if current is None:
+            self._profiles[user_id] = ProfileRow(user_id, guild_id, games, now, now)
+        else:
+            self._profiles[user_id] = current._replace(games=games, updated_at=now)
+
+    @timed
+    async def get_user_profile(self, user_id: int, guild_id: Optional[int] = None) -> Optional[ProfileRow]:
+        return self._profiles.get(user_id)
+
+    # ===== MÉTODOS PARA EVENTOS =====
+
+    @timed
+    async def create_event(self, guild_id: int, creator_id: int, title: str,
+                           description: str, event_date: datetime):
+        self._event_seq += 1
+        self._events[self._event_seq] = EventRow(
+            self._event_seq, guild_id, creator_id, title, description,
+            to_epoch(event_date), epoch_now(), 0
+        )
+
+    @timed
+    async def get_upcoming_events(self, guild_id: int) -> List[EventRow]:
+        now = epoch_now()
+        events = [e for e in self._events.values() if e.guild_id == guild_id and e.event_date > now]
+        return sorted(events, key=lambda e: e.event_date)
+
+    @timed
+    async def get_events_to_notify(self) -> List[EventRow]:
+        now = epoch_now()
+        return [
+            e for e in self._events.values()
+            if not e.notified and now < e.event_date <= now + EVENT_NOTIFY_AHEAD
+        ]
+
+    @timed
+    async def mark_event_notified(self, event_id: int, guild_id: Optional[int] = None):
+        event = self._events.get(event_id)
+        if event is not None:
+            self._events[event_id] = event._replace(notified=1)
+
+    # ===== MÉTODOS PARA NIVELES Y XP =====
+
+    def _level_row(self, user_id: int, guild_id: int) -> LevelRow:
+        row = self._levels.get((user_id, guild_id))
+        if row is None:
+            row = LevelRow(user_id, guild_id, 0, 1, 0, None, epoch_now())
+        return row
+
+    @timed
+    async def add_xp(self, user_id: int, guild_id: int, xp_amount: int):
+        row = self._level_row(user_id, guild_id)
+        row = row._replace(
+            xp=row.xp + xp_amount,
+            total_messages=row.total_messages + 1,
+            last_xp_time=epoch_now()
+        )
+        self._levels[(user_id, guild_id)] = row
+        self._levels_by_xp.update(user_id, guild_id, row.xp)
+
+    async def flush_xp(self):
+        """Sin escritura diferida: no hay nada que volcar"""
+
+    @timed
+    async def get_user_level_data(self, user_id: int, guild_id: int) -> Optional[LevelRow]:
+        return self._levels.get((user_id, guild_id))
+
+    @timed
+    async def update_level(self, user_id: int, guild_id: int, new_level: int):
+        row = self._level_row(user_id, guild_id)._replace(level=new_level)
+        self._levels[(user_id, guild_id)] = row
+        self._levels_by_xp.update(user_id, guild_id, row.xp)
+
+    @timed
+    async def import_levels(self, guild_id: int, rows: Iterable[ImportRow], add: bool = False,
+                            chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+        imported = 0
+        for user_id, xp, messages in rows:
+            row = self._level_row(user_id, guild_id)
+            if add:
+                xp += row.xp
+                messages += row.total_messages
+            row = row._replace(xp=xp, level=level_from_xp(xp), total_messages=messages)
+            self._levels[(user_id, guild_id)] = row
+            self._levels_by_xp.update(user_id, guild_id, row.xp)
+            imported += 1
+        return imported
+
+    @timed
+    async def get_top_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[LevelRow]:
+        return [self._levels[(user_id, guild_id)] for user_id in self._levels_by_xp.top(guild_id, limit)]
+
+    # ===== MÉTODOS PARA ECONOMÍA =====
+
+    def _economy_row(self, user_id: int, guild_id: int) -> EconomyRow:
+        row = self._economy.get((user_id, guild_id))
+        if row is None:
+            row = EconomyRow(user_id, guild_id, 0, None, None, epoch_now())
+        return row
+
+    def _store_economy(self, row: EconomyRow):
+        self._economy[(row.user_id, row.guild_id)] = row
+        self._economy_by_balance.update(row.user_id, row.guild_id, row.balance)
+
+    @timed
+    async def get_balance(self, user_id: int, guild_id: int) -> int:
+        row = self._economy.get((user_id, guild_id))
+        return row.balance if row else 0
+
+    @timed
+    async def add_money(self, user_id: int, guild_id: int, amount: int):
+        row = self._economy_row(user_id, guild_id)
+        self._store_economy(row._replace(balance=row.balance + amount))
+
+    async def remove_money(self, user_id: int, guild_id: int, amount: int) -> bool:
+        return await self.debit_money(user_id, guild_id, amount) is not None
+
+    async def debit_money(self, user_id: int, guild_id: int, amount: int) -> Optional[int]:
+        return await self.adjust_balance(user_id, guild_id, -amount, min_balance=amount)
+
+    @timed
+    async def adjust_balance(self, user_id: int, guild_id: int, delta: int,
+                             min_balance: int = 0) -> Optional[int]:
+        row = self._economy.get((user_id, guild_id))
+        if row is None or row.balance < min_balance:
+            return None
+        row = row._replace(balance=row.balance + delta)
+        self._store_economy(row)
+        return row.balance
+
+    @timed
+    async def transfer(self, from_user_id: int, to_user_id: int, guild_id: int,
+                       amount: int) -> Optional[int]:
+        check_transfer(from_user_id, to_user_id, amount)
+        new_balance = await self.debit_money(from_user_id, guild_id, amount)
+        if new_balance is not None:
+            await self.add_money(to_user_id, guild_id, amount)
+        return new_balance
+
+    @timed
+    async def set_balance(self, user_id: int, guild_id: int, amount: int):
+        self._store_economy(self._economy_row(user_id, guild_id)._replace(balance=amount))
+
+    @timed
+    async def get_last_daily(self, user_id: int, guild_id: int) -> Optional[int]:
+        row = self._economy.get((user_id, guild_id))
+        return row.last_daily if row else None
+
+    @timed
+    async def update_last_daily(self, user_id: int, guild_id: int):
+        row = self._economy_row(user_id, guild_id)
+        self._store_economy(row._replace(last_daily=epoch_now()))
+
+    @timed
+    async def get_last_work(self, user_id: int, guild_id: int) -> Optional[int]:
+        row = self._economy.get((user_id, guild_id))
+        return row.last_work if row else None
+
+    @timed
+    async def update_last_work(self, user_id: int, guild_id: int):
+        row = self._economy_row(user_id, guild_id)
+        self._store_economy(row._replace(last_work=epoch_now()))
+
+    @timed
+    async def get_richest_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[EconomyRow]:
+        return [
+            self._economy[(user_id, guild_id)]
+            for user_id in self._economy_by_balance.top(guild_id, limit)
+        ]
+
+    # ===== MÉTODOS PARA TIBIA LOOTS =====
+
+    @timed
+    async def add_tibia_loot(self, user_id: int, guild_id: int, boss_name: str,
+                             items: str, value: int):
+        self._loot_seq += 1
+        loot = LootRow(self._loot_seq, user_id, guild_id, boss_name, items, value, epoch_now())
+        self._loots[loot.id] = loot
+        self._loots_by_user[(user_id, guild_id)].append(loot.id)
+        bisect.insort(self._loots_by_value[guild_id], (-value, loot.id))
+
+        stats = self._boss_stats[guild_id].get(boss_name)
+        if stats is None:
+            stats = self._boss_stats[guild_id][boss_name] = _BossAggregate()
+        stats.kills += 1
+        stats.total_value += value
+        stats.best_loot = max(stats.best_loot, value)
+
+    @timed
+    async def get_user_loots(self, user_id: int, guild_id: int, limit: int = 10,
+                             include_archive: bool = False) -> List[LootRow]:
+        ids = self._loots_by_user.get((user_id, guild_id), [])
+        return [self._loots[loot_id] for loot_id in reversed(ids[-limit:])]
+
+    @timed
+    async def get_boss_stats(self, guild_id: int, boss_name: str = None,
+                             replica: bool = False) -> List[BossStatsRow]:
+        bosses = self._boss_stats.get(guild_id, {})
+        if boss_name:
+            stats = bosses.get(boss_name)
+            return [stats.row(boss_name)] if stats else []
+        ranked = sorted(bosses.items(), key=lambda item: item[1].kills, reverse=True)
+        return [stats.row(name) for name, stats in ranked[:10]]
+
+    @timed
+    async def get_top_loots(self, guild_id: int, limit: int = 10,
+                            include_archive: bool = False, replica: bool = False) -> List[LootRow]:
+        return [self._loots[loot_id] for _, loot_id in self._loots_by_value.get(guild_id, [])[:limit]]
+
+    @timed
+    async def get_total_loot_value(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        return sum(self._loots[loot_id].value for loot_id in self._loots_by_user.get((user_id, guild_id), []))
+
+    @timed
+    async def search_loots(self, guild_id: int, text: str, limit: int = 10, offset: int = 0) -> List[LootRow]:
+        terms = search_terms(text)
+        if not terms:
+            return []
+        matches = []
+        for loot in reversed(self._loots.values()):
+            if loot.guild_id != guild_id:
+                continue
+            words = search_terms(f"{loot.items} {loot.boss_name}")
+            if all(term in words for term in terms):
+                matches.append(loot)
+                if len(matches) == SEARCH_CANDIDATES:
+                    break
+        # Mismo orden que DatabaseManager: texto exacto, lista corta, más nuevo
+        phrase = ' '.join(terms)
+        matches.sort(key=lambda loot: (phrase not in loot.items.lower(), len(loot.items), -loot.id))
+        return matches[offset:offset + limit]
+
+    # ===== RETENCIÓN Y ARCHIVO =====
+
+    async def archive_old_rows(self, loot_days: int = 0, warning_days: int = 0,
+                               batch_size: int = 0) -> Dict[str, int]:
+        """Sin archivo: los datos en memoria no crecen entre reinicios"""
+        return {'tibia_loots': 0, 'warnings': 0, 'pages': 0}
+
+    async def incremental_vacuum(self, pages_per_step: int = 0) -> int:
+        return 0
+
+    async def maintenance(self, time_budget: float = 0, pages_per_step: int = 0) -> MaintenanceReport:
+        """Sin fichero ni planificador de consultas: nada que mantener"""
+        return EMPTY_REPORT
+
+    # ===== RECORRIDOS POR BLOQUES =====
+
+    async def iter_levels(self, guild_id: int,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LevelRow]:
+        for row in await self.get_top_users(guild_id, len(self._levels)):
+            yield row
+
+    async def iter_loots(self, guild_id: int, since: Optional[datetime] = None,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LootRow]:
+        start = to_epoch(since) if since else 0
+        # Los IDs crecen con el tiempo: recorrerlos en orden es el orden cronológico
+        for loot_id in sorted(self._loots):
+            loot = self._loots[loot_id]
+            if loot.guild_id == guild_id and loot.timestamp >= start:
+                yield loot
+
+    async def iter_economy(self, guild_id: int,
+                           chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[EconomyRow]:
+        for row in await self.get_richest_users(guild_id, len(self._economy)):
+            yield row
@@ -0,0 +1,295 @@
+"""
+Métricas de tiempo de consultas y registro de consultas lentas
+"""
+import functools
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger('discord_bot')
+
+# Método de DatabaseManager en curso, para atribuir cada consulta lenta
+current_method: ContextVar[str] = ContextVar('current_method', default='?')
+
+# Muestras recientes por método usadas para calcular percentiles
+SAMPLE_SIZE = 1024
+
+
+class SlowQuery(NamedTuple):
+    """Consulta que superó el umbral de lentitud"""
+    method: str
+    sql: str
+    params_shape: str
+    elapsed_ms: float
+    plan: List[str]
+    timestamp: datetime
+
+
+class LatencyHistogram:
+    """Conteo, máximo y percentiles de las últimas SAMPLE_SIZE duraciones"""
+
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.samples.append(elapsed)
+
+    def summary(self) -> Dict[str, float]:
+        """Resumen en milisegundos"""
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+        return {
+            'count': self.count,
+            'avg_ms': (self.total / self.count * 1000) if self.count else 0.0,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': self.max * 1000
+        }
+
+
+class ContentionStats:
+    """Esperas por el escritor y reintentos por SQLITE_BUSY de un método"""
+
+    __slots__ = ('lock_waits', 'lock_wait_time', 'busy_retries', 'busy_failures')
+
+    def __init__(self):
+        self.lock_waits = 0
+        self.lock_wait_time = 0.0
+        self.busy_retries = 0
+        self.busy_failures = 0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'lock_waits': self.lock_waits,
+            'lock_wait_ms': self.lock_wait_time * 1000,
+            'busy_retries': self.busy_retries,
+            'busy_failures': self.busy_failures
+        }
+
+
+def params_shape(params: Any) -> str:
+    """Describe los parámetros por tipo sin exponer sus valores"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {type(value).__name__}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+class QueryMetrics:
+    """
+    Histogramas de tiempo por método y registro de consultas lentas
+
+    Es la API que puede leer un exportador de métricas: snapshot() y
+    slow_queries() devuelven estructuras simples sin referencias internas.
+    """
+
+    def __init__(self, slow_threshold_ms: float, slow_log_size: int = 50):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._methods: Dict[str, LatencyHistogram] = {}
+        self._slow: Deque[SlowQuery] = deque(maxlen=slow_log_size)
+        self._contention: Dict[str, ContentionStats] = {}
+        # Commits del escritor y escrituras que confirmó cada uno (commit agrupado)
+        self.commits = 0
+        self.committed_writes = 0
+        # Lecturas enviadas a la réplica de análisis y su mayor antigüedad (segundos)
+        self.replica_reads = 0
+        self.replica_fallbacks = 0
+        self.replica_lag_max = 0.0
+
+    def record(self, method: str, elapsed: float):
+        """Registra la duración (en segundos) de una llamada a un método"""
+        histogram = self._methods.get(method)
+        if histogram is None:
+            histogram = self._methods[method] = LatencyHistogram()
+        histogram.add(elapsed)
+
+    def record_slow(self, query: SlowQuery):
+        self._slow.append(query)
+        logger.warning(
+            f"Consulta lenta en {query.method}: {query.elapsed_ms:.1f}ms "
+            f"params={query.params_shape} plan={' | '.join(query.plan)} sql={query.sql}"
+        )
+
+    def _contention_for(self, method: str) -> ContentionStats:
+        stats = self._contention.get(method)
+        if stats is None:
+            stats = self._contention[method] = ContentionStats()
+        return stats
+
+    def record_lock_wait(self, method: str, elapsed: float):
+        """El método esperó a que otro liberase el escritor"""
+        stats = self._contention_for(method)
+        stats.lock_waits += 1
+        stats.lock_wait_time += elapsed
+
+    def record_busy_retry(self, method: str):
+        self._contention_for(method).busy_retries += 1
+
+    def record_busy_failure(self, method: str):
+        self._contention_for(method).busy_failures += 1
+
+    def record_commit(self, writes: int):
+        self.commits += 1
+        self.committed_writes += writes
+
+    def record_replica_read(self, lag: float):
+        """Lectura servida por la réplica con `lag` segundos de antigüedad"""
+        self.replica_reads += 1
+        self.replica_lag_max = max(self.replica_lag_max, lag)
+
+    def record_replica_fallback(self):
+        """Lectura pedida a la réplica que fue a la principal (sin copia o demasiado antigua)"""
+        self.replica_fallbacks += 1
+
+    def contention(self, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, float]]]:
+        """Métodos con más contención primero: reintentos y fallos por BUSY, luego tiempo de espera"""
+        ranked = sorted(
+            self._contention.items(),
+            key=lambda item: (item[1].busy_retries + item[1].busy_failures, item[1].lock_wait_time),
+            reverse=True
+        )
+        return [(method, stats.summary()) for method, stats in ranked[:limit]]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Resumen por método: count, avg, p50, p95, p99 y max en milisegundos"""
+        return {method: histogram.summary() for method, histogram in self._methods.items()}
+
+    def slow_queries(self) -> List[SlowQuery]:
+        """Consultas lentas más recientes, de la más antigua a la más nueva"""
+        return list(self._slow)
+
+    def reset(self):
+        self._methods.clear()
+        self._slow.clear()
+        self._contention.clear()
+        self.commits = 0
+        self.committed_writes = 0
+        self.replica_reads = 0
+        self.replica_fallbacks = 0
+        self.replica_lag_max = 0.0
+
+
+def timed(func):
+    """Registra la duración de un método de DatabaseManager en self.metrics"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        token = current_method.set(name)
+        start = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            self.metrics.record(name, time.perf_counter() - start)
+            current_method.reset(token)
+
+    return wrapper
+
+
+class _TimedQuery:
+    """Ejecución de una consulta usable con await o con async with, como en aiosqlite"""
+
+    __slots__ = ('_conn', '_sql', '_params', '_many', '_start', '_cursor')
+
+    def __init__(self, conn: 'InstrumentedConnection', sql: str, params: Any, many: bool):
+        self._conn = conn
+        self._sql = sql
+        self._params = params
+        self._many = many
+        self._start = 0.0
+        self._cursor: Optional[aiosqlite.Cursor] = None
+
+    async def _run(self) -> aiosqlite.Cursor:
+        raw = self._conn.raw
+        if self._many:
+            return await raw.executemany(self._sql, self._params)
+        return await raw.execute(self._sql, self._params)
+
+    async def _timed(self) -> aiosqlite.Cursor:
+        start = time.perf_counter()
+        cursor = await self._run()
+        await self._conn.observe(self._sql, self._params, self._many, time.perf_counter() - start)
+        return cursor
+
+    def __await__(self):
+        return self._timed().__await__()
+
+    async def __aenter__(self) -> aiosqlite.Cursor:
+        # Con async with se mide hasta cerrar el cursor: incluye los fetch
+        self._start = time.perf_counter()
+        self._cursor = await self._run()
+        return self._cursor
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._cursor.close()
+        if exc_type is None:
+            elapsed = time.perf_counter() - self._start
+            await self._conn.observe(self._sql, self._params, self._many, elapsed)
+
+
+class InstrumentedConnection:
+    """Envoltorio de una conexión que mide cada consulta y registra las lentas"""
+
+    __slots__ = ('raw', '_metrics')
+
+    def __init__(self, raw: aiosqlite.Connection, metrics: QueryMetrics):
+        self.raw = raw
+        self._metrics = metrics
+
+    def execute(self, sql: str, parameters: Sequence = ()) -> _TimedQuery:
+        return _TimedQuery(self, sql, parameters, many=False)
+
+    def executemany(self, sql: str, parameters) -> _TimedQuery:
+        return _TimedQuery(self, sql, parameters, many=True)
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw, name)
+
+    async def observe(self, sql: str, params: Any, many: bool, elapsed: float):
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < self._metrics.slow_threshold_ms:
+            return
+
+        if many:
+            # Un iterador ya fue consumido por executemany: solo se describe si es lista
+            rows = params if isinstance(params, list) else []
+            shape = f"{len(rows)} x {params_shape(rows[0])}" if rows else '(lote)'
+            explain_params = rows[0] if rows else ()
+        else:
+            shape = params_shape(params)
+            explain_params = params
+
+        try:
+            async with self.raw.execute(f'EXPLAIN QUERY PLAN {sql}', explain_params) as cursor:
+                plan = [row[-1] for row in await cursor.fetchall()]
+        except Exception as e:
+            plan = [f"(sin plan: {e})"]
+
+        self._metrics.record_slow(SlowQuery(
+            method=current_method.get(),
+            sql=' '.join(sql.split()),
+            params_shape=shape,
+            elapsed_ms=elapsed_ms,
+            plan=plan,
+            timestamp=datetime.now()
+        ))
@@ -0,0 +1,394 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+"""
+import logging
+from typing import List, NamedTuple
+
+import aiosqlite
+
+logger = logging.getLogger('discord_bot')
+
+
+class Migration(NamedTuple):
+    """Paso de migración: se aplica una sola vez y fija PRAGMA user_version"""
+    version: int
+    description: str
+    statements: List[str]
+
+
+# Fechas como segundos Unix (UTC): se comparan como enteros y los rangos usan los índices
+EPOCH_NOW = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+
+def _epoch(column: str, local: bool = False) -> str:
+    """
+    Expresión que convierte una fecha en texto a segundos Unix
+
+    Las columnas con CURRENT_TIMESTAMP ya están en UTC; las escritas con
+    datetime.now() (local=True) están en la hora local del servidor.
+    """
+    modifier = ", 'utc'" if local else ''
+    return f"CAST(strftime('%s', {column}{modifier}) AS INTEGER)"
+
+
+# Recalcula tibia_boss_stats desde los loots activos y archivados (db_tool.py rebuild-stats)
+BOSS_STATS_REBUILD = [
+    'DELETE FROM tibia_boss_stats',
+    '''
+    INSERT INTO tibia_boss_stats (guild_id, boss_name, kills, total_value, best_loot)
+    SELECT guild_id, boss_name, COUNT(*), COALESCE(SUM(value), 0), COALESCE(MAX(value), 0)
+    FROM (
+        SELECT guild_id, boss_name, value FROM tibia_loots
+        UNION ALL
+        SELECT guild_id, boss_name, value FROM tibia_loots_archive
+    )
+    GROUP BY guild_id, boss_name
+    ''',
+]
+
+
+# Vuelve a indexar todos los loots activos en tibia_loots_fts (db_tool.py restore)
+LOOT_SEARCH_REBUILD = "INSERT INTO tibia_loots_fts (tibia_loots_fts) VALUES ('rebuild')"
+
+
+def _rebuild(table: str, schema: str, select: str, autoincrement: bool = False) -> List[str]:
+    """Recrea una tabla con otro esquema copiando sus filas (SQLite no cambia tipos ni defaults)"""
+    statements = [
+        f'CREATE TABLE {table}_epoch ({schema})',
+        f'INSERT INTO {table}_epoch SELECT {select} FROM {table}',
+    ]
+    if autoincrement:
+        # Conservar el contador: los ids archivados no deben volver a usarse
+        statements += [
+            f"DELETE FROM sqlite_sequence WHERE name = '{table}_epoch'",
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}_epoch', seq FROM sqlite_sequence WHERE name = '{table}'",
+        ]
+    return statements + [
+        f'DROP TABLE {table}',
+        f'ALTER TABLE {table}_epoch RENAME TO {table}',
+    ]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Esquema inicial", [
+        # Tabla de advertencias
+        '''
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Tabla de perfiles de usuarios
+        '''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            games TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Tabla de eventos
+        '''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            creator_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            event_date DATETIME NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            notified BOOLEAN DEFAULT 0
+        )
+        ''',
+        # Tabla de niveles y XP
+        '''
+        CREATE TABLE IF NOT EXISTS levels (
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            total_messages INTEGER DEFAULT 0,
+            last_xp_time DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, guild_id)
+        )
+        ''',
+        # Tabla de economía
+        '''
+        CREATE TABLE IF NOT EXISTS economy (
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            balance INTEGER DEFAULT 0,
+            last_daily DATETIME,
+            last_work DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, guild_id)
+        )
+        ''',
+        # Tabla de loots de Tibia
+        '''
+        CREATE TABLE IF NOT EXISTS tibia_loots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            items TEXT NOT NULL,
+            value INTEGER DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    Migration(2, "Índices para rankings, estadísticas de loot, advertencias y eventos", [
+        # /ranking y /leaderboard: ORDER BY ... DESC LIMIT sin ordenar toda la tabla
+        'CREATE INDEX IF NOT EXISTS idx_levels_guild_xp ON levels (guild_id, xp DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_economy_guild_balance ON economy (guild_id, balance DESC)',
+        # /loot stats, /loot mejores, /loot historial y /loot total
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_boss ON tibia_loots (guild_id, boss_name)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_value ON tibia_loots (guild_id, value DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_user ON tibia_loots (user_id, guild_id, timestamp)',
+        # /warnings y el contador de advertencias
+        'CREATE INDEX IF NOT EXISTS idx_warnings_user_guild ON warnings (user_id, guild_id, timestamp)',
+        # Recordatorios pendientes (índice parcial) y /eventos
+        'CREATE INDEX IF NOT EXISTS idx_events_notify ON events (event_date) WHERE notified = 0',
+        'CREATE INDEX IF NOT EXISTS idx_events_guild_date ON events (guild_id, event_date)',
+    ]),
+    Migration(3, "Índice para recorrer los loots de un servidor por fecha", [
+        # iter_loots(guild_id, since=...): rango por fecha sin ordenar en memoria
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_time ON tibia_loots (guild_id, timestamp)',
+    ]),
+    Migration(4, "Tablas de archivo para loots y advertencias antiguos", [
+        # Mismas columnas que las tablas activas; el id se conserva al archivar
+        '''
+        CREATE TABLE IF NOT EXISTS tibia_loots_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            items TEXT NOT NULL,
+            value INTEGER DEFAULT 0,
+            timestamp DATETIME
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS warnings_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            timestamp DATETIME
+        )
+        ''',
+        # Consultas con include_archive=True
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_user ON tibia_loots_archive (user_id, guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_guild_boss ON tibia_loots_archive (guild_id, boss_name)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_guild_value ON tibia_loots_archive (guild_id, value DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_warnings_archive_user_guild ON warnings_archive (user_id, guild_id, timestamp)',
+        # Lotes de archivado: filas más antiguas que el horizonte
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_time ON tibia_loots (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_warnings_time ON warnings (timestamp)',
+    ]),
+    Migration(5, "Fechas como enteros (segundos Unix)", [
+        *_rebuild('warnings', f'''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            timestamp INTEGER DEFAULT {EPOCH_NOW}
+        ''', f"id, user_id, guild_id, moderator_id, reason, {_epoch('timestamp')}", autoincrement=True),
+        *_rebuild('warnings_archive', '''
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            timestamp INTEGER
+        ''', f"id, user_id, guild_id, moderator_id, reason, {_epoch('timestamp')}"),
+        *_rebuild('user_profiles', f'''
+            user_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            games TEXT,
+            created_at INTEGER DEFAULT {EPOCH_NOW},
+            updated_at INTEGER DEFAULT {EPOCH_NOW}
+        ''', f"user_id, guild_id, games, {_epoch('created_at')}, {_epoch('updated_at', local=True)}"),
+        *_rebuild('events', f'''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            creator_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            event_date INTEGER NOT NULL,
+            created_at INTEGER DEFAULT {EPOCH_NOW},
+            notified BOOLEAN DEFAULT 0
+        ''', f"id, guild_id, creator_id, title, description, {_epoch('event_date', local=True)}, "
+              f"{_epoch('created_at')}, notified", autoincrement=True),
+        *_rebuild('levels', f'''
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            total_messages INTEGER DEFAULT 0,
+            last_xp_time INTEGER,
+            created_at INTEGER DEFAULT {EPOCH_NOW},
+            PRIMARY KEY (user_id, guild_id)
+        ''', f"user_id, guild_id, xp, level, total_messages, {_epoch('last_xp_time', local=True)}, "
+              f"{_epoch('created_at')}"),
+        *_rebuild('economy', f'''
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            balance INTEGER DEFAULT 0,
+            last_daily INTEGER,
+            last_work INTEGER,
+            created_at INTEGER DEFAULT {EPOCH_NOW},
+            PRIMARY KEY (user_id, guild_id)
+        ''', f"user_id, guild_id, balance, {_epoch('last_daily', local=True)}, "
+              f"{_epoch('last_work', local=True)}, {_epoch('created_at')}"),
+        *_rebuild('tibia_loots', f'''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            items TEXT NOT NULL,
+            value INTEGER DEFAULT 0,
+            timestamp INTEGER DEFAULT {EPOCH_NOW}
+        ''', f"id, user_id, guild_id, boss_name, items, value, {_epoch('timestamp')}", autoincrement=True),
+        *_rebuild('tibia_loots_archive', '''
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            items TEXT NOT NULL,
+            value INTEGER DEFAULT 0,
+            timestamp INTEGER
+        ''', f"id, user_id, guild_id, boss_name, items, value, {_epoch('timestamp')}"),
+        # Los índices se van con las tablas antiguas: se crean de nuevo
+        'CREATE INDEX IF NOT EXISTS idx_warnings_user_guild ON warnings (user_id, guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_warnings_time ON warnings (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_warnings_archive_user_guild ON warnings_archive (user_id, guild_id, timestamp)',
+        # Recordatorios: event_date BETWEEN ahora y ahora + 1 hora sobre el índice parcial
+        'CREATE INDEX IF NOT EXISTS idx_events_notify ON events (event_date) WHERE notified = 0',
+        'CREATE INDEX IF NOT EXISTS idx_events_guild_date ON events (guild_id, event_date)',
+        'CREATE INDEX IF NOT EXISTS idx_levels_guild_xp ON levels (guild_id, xp DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_economy_guild_balance ON economy (guild_id, balance DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_boss ON tibia_loots (guild_id, boss_name)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_value ON tibia_loots (guild_id, value DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_user ON tibia_loots (user_id, guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_guild_time ON tibia_loots (guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_time ON tibia_loots (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_user ON tibia_loots_archive (user_id, guild_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_guild_boss ON tibia_loots_archive (guild_id, boss_name)',
+        'CREATE INDEX IF NOT EXISTS idx_tibia_loots_archive_guild_value ON tibia_loots_archive (guild_id, value DESC)',
+    ]),
+    Migration(6, "Resumen de loots por criatura mantenido con un trigger", [
+        # /loot stats lee una fila en vez de agrupar todos los loots del servidor.
+        # Cuenta también los loots archivados: archivar mueve filas, no las borra.
+        '''
+        CREATE TABLE IF NOT EXISTS tibia_boss_stats (
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            kills INTEGER NOT NULL DEFAULT 0,
+            total_value INTEGER NOT NULL DEFAULT 0,
+            best_loot INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, boss_name)
+        ) WITHOUT ROWID
+        ''',
+        # Top 10 de criaturas por kills sin ordenar en memoria
+        'CREATE INDEX IF NOT EXISTS idx_tibia_boss_stats_kills ON tibia_boss_stats (guild_id, kills DESC)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tibia_loots_boss_stats AFTER INSERT ON tibia_loots
+        BEGIN
+            INSERT INTO tibia_boss_stats (guild_id, boss_name, kills, total_value, best_loot)
+            VALUES (NEW.guild_id, NEW.boss_name, 1, COALESCE(NEW.value, 0), COALESCE(NEW.value, 0))
+            ON CONFLICT (guild_id, boss_name) DO UPDATE SET
+                kills = kills + 1,
+                total_value = total_value + excluded.total_value,
+                best_loot = MAX(best_loot, excluded.best_loot);
+        END
+        ''',
+        *BOSS_STATS_REBUILD,
+    ]),
+    Migration(7, "Índice de texto completo FTS5 sobre los items de los loots", [
+        # Tabla de contenido externo: el índice guarda solo los términos y lee
+        # el texto de tibia_loots por rowid. Los loots archivados salen del índice.
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tibia_loots_fts USING fts5(
+            items, boss_name,
+            content = 'tibia_loots', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tibia_loots_fts_insert AFTER INSERT ON tibia_loots
+        BEGIN
+            INSERT INTO tibia_loots_fts (rowid, items, boss_name)
+            VALUES (NEW.id, NEW.items, NEW.boss_name);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tibia_loots_fts_delete AFTER DELETE ON tibia_loots
+        BEGIN
+            INSERT INTO tibia_loots_fts (tibia_loots_fts, rowid, items, boss_name)
+            VALUES ('delete', OLD.id, OLD.items, OLD.boss_name);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_tibia_loots_fts_update AFTER UPDATE OF items, boss_name ON tibia_loots
+        BEGIN
+            INSERT INTO tibia_loots_fts (tibia_loots_fts, rowid, items, boss_name)
+            VALUES ('delete', OLD.id, OLD.items, OLD.boss_name);
+            INSERT INTO tibia_loots_fts (rowid, items, boss_name)
+            VALUES (NEW.id, NEW.items, NEW.boss_name);
+        END
+        ''',
+        LOOT_SEARCH_REBUILD,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    """Lee la versión del esquema guardada en PRAGMA user_version"""
+    async with db.execute('PRAGMA user_version') as cursor:
+        row = await cursor.fetchone()
+        return row[0] if row else 0
+
+
+async def run_migrations(db: aiosqlite.Connection) -> int:
+    """
+    Aplica en orden las migraciones con versión mayor a la actual
+
+    Cada migración se ejecuta en su propia transacción junto con la
+    actualización de user_version, así una base existente se actualiza en
+    sitio y un fallo deja el esquema en la última versión completa.
+
+    Returns:
+        La versión del esquema tras aplicar las migraciones
+    """
+    current = await get_schema_version(db)
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        await db.execute('BEGIN')
+        try:
+            for statement in migration.statements:
+                await db.execute(statement)
+            await db.execute(f'PRAGMA user_version = {migration.version}')
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.error(f"Error al aplicar la migración {migration.version}: {migration.description}")
+            raise
+
+        current = migration.version
+        logger.info(f"Migración {migration.version} aplicada: {migration.description}")
+
+    return current
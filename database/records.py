@@ -0,0 +1,79 @@
+"""
+Tipos de registro ligeros devueltos por el gestor de base de datos
+
+Son NamedTuple construidos directamente desde las tuplas de sqlite3: sin
+diccionario por fila y con los mismos nombres de columna que usan los cogs
+(acceso por atributo: row.xp, loot.boss_name, ...). Las fechas son segundos
+Unix (int); database.storage.from_epoch las convierte para mostrarlas.
+"""
+from typing import NamedTuple, Optional
+
+
+class WarningRow(NamedTuple):
+    id: int
+    user_id: int
+    guild_id: int
+    moderator_id: int
+    reason: str
+    timestamp: Optional[int]
+
+
+class ProfileRow(NamedTuple):
+    user_id: int
+    guild_id: int
+    games: Optional[str]
+    created_at: Optional[int]
+    updated_at: Optional[int]
+
+
+class EventRow(NamedTuple):
+    id: int
+    guild_id: int
+    creator_id: int
+    title: str
+    description: Optional[str]
+    event_date: int
+    created_at: Optional[int]
+    notified: int
+
+
+class LevelRow(NamedTuple):
+    user_id: int
+    guild_id: int
+    xp: int
+    level: int
+    total_messages: int
+    last_xp_time: Optional[int]
+    created_at: Optional[int]
+
+
+class EconomyRow(NamedTuple):
+    user_id: int
+    guild_id: int
+    balance: int
+    last_daily: Optional[int]
+    last_work: Optional[int]
+    created_at: Optional[int]
+
+
+class LootRow(NamedTuple):
+    id: int
+    user_id: int
+    guild_id: int
+    boss_name: str
+    items: str
+    value: int
+    timestamp: Optional[int]
+
+
+class BossStatsRow(NamedTuple):
+    boss_name: str
+    kills: int
+    avg_value: float
+    total_value: int
+    best_loot: int
+
+
+def columns(record: type) -> str:
+    """Lista de columnas para un SELECT en el orden de los campos del registro"""
+    return ', '.join(record._fields)
@@ -0,0 +1,516 @@
+"""
+Almacenamiento repartido en varios ficheros SQLite (shards) según el servidor
+
+Cada shard es un DatabaseManager completo (escritor, lector, acumulador de XP
+y migraciones propias), así la escritura de un servidor con mucha actividad no
+bloquea a los demás. Los shards se abren bajo demanda y solo se mantienen
+abiertos los DATABASE_MAX_OPEN_SHARDS usados más recientemente.
+"""
+import aiosqlite
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from config.settings import (
+    BACKUP_DIR,
+    BACKUP_KEEP,
+    BACKUP_PAGES_PER_STEP,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL,
+    DATABASE_MAX_OPEN_SHARDS,
+    DATABASE_PROFILE,
+    DATABASE_SHARD_BUCKETS,
+    DATABASE_SHARD_DIR,
+    EXPORT_DIR,
+    EXPORT_FORMAT,
+    MAINTENANCE_TIME_BUDGET,
+    RETENTION_BATCH_SIZE,
+    RETENTION_LOOT_DAYS,
+    RETENTION_WARNING_DAYS,
+    SLOW_QUERY_MS,
+    VACUUM_PAGES_PER_STEP
+)
+from database.backup import BackupResult, online_backup, rotate_backups, snapshot_path
+from database.cache import ReadCache
+from database.db_manager import EVENTS_TO_NOTIFY_SQL, DatabaseManager
+from database.export import ExportResult, export_databases
+from database.importer import IMPORT_CHUNK_SIZE, ImportRow
+from database.maintenance import EMPTY_REPORT, MaintenanceReport, merge_reports
+from database.metrics import QueryMetrics
+from database.migrations import SCHEMA_VERSION, get_schema_version
+from database.records import (
+    BossStatsRow,
+    EconomyRow,
+    EventRow,
+    LevelRow,
+    LootRow,
+    ProfileRow,
+    WarningRow
+)
+from database.storage import EVENT_NOTIFY_AHEAD, STREAM_CHUNK_SIZE, check_transfer, epoch_now
+
+logger = logging.getLogger('discord_bot')
+
+# Lectores por shard: con muchos shards abiertos cada conexión es un hilo más
+SHARD_READERS = 1
+
+# Bits bajos de un snowflake de Discord (worker, proceso, contador): casi
+# constantes entre servidores, así que el reparto en buckets usa la marca de tiempo
+SNOWFLAKE_TIMESTAMP_SHIFT = 22
+
+
+class ShardedStorage:
+    """Reparte los datos de cada servidor en su propio fichero o en N buckets"""
+
+    def __init__(self, directory: str = DATABASE_SHARD_DIR, buckets: int = DATABASE_SHARD_BUCKETS,
+                 max_open: int = DATABASE_MAX_OPEN_SHARDS, profile: str = DATABASE_PROFILE):
+        self.directory = Path(directory)
+        self.buckets = max(0, buckets)
+        self.max_open = max(1, max_open)
+        self.profile = profile
+        # Una sola tabla de métricas para todos los shards (/dbstats)
+        self.metrics = QueryMetrics(SLOW_QUERY_MS)
+        # Y una sola caché: las claves llevan guild_id y sobreviven al cierre de un shard
+        self.cache = ReadCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+        # LRU de shards abiertos y cuántas operaciones usan cada uno
+        self._open: 'OrderedDict[int, DatabaseManager]' = OrderedDict()
+        self._in_use: Dict[int, int] = {}
+        # Shards abiertos fuera de la LRU por un recorrido global (_borrow)
+        self._borrowed: Dict[int, DatabaseManager] = {}
+        self._open_lock: Optional[asyncio.Lock] = None
+        self.last_backup: Optional[BackupResult] = None
+
+    def shard_key(self, guild_id: int) -> int:
+        """Clave del shard de un servidor: su ID o el número de bucket"""
+        if not self.buckets:
+            return guild_id
+        return (guild_id >> SNOWFLAKE_TIMESTAMP_SHIFT) % self.buckets
+
+    def shard_path(self, key: int) -> Path:
+        """Fichero SQLite de un shard"""
+        if not self.buckets:
+            return self.directory / f"guild_{key}.db"
+        return self.directory / f"shard_{key:03d}.db"
+
+    def shard_keys(self) -> List[int]:
+        """Claves de todos los shards que existen en disco"""
+        pattern = 'shard_*.db' if self.buckets else 'guild_*.db'
+        return sorted(int(path.stem.split('_', 1)[1]) for path in self.directory.glob(pattern))
+
+    async def initialize(self):
+        """Prepara la carpeta de shards (cada shard se migra al abrirse)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open_lock = asyncio.Lock()
+        mode = f"{self.buckets} buckets" if self.buckets else "un fichero por servidor"
+        logger.info(
+            f"Base de datos por shards inicializada en '{self.directory}' "
+            f"({mode}, máximo {self.max_open} abiertos, perfil {self.profile})"
+        )
+
+    async def close(self):
+        """Vuelca el XP pendiente y cierra todos los shards abiertos"""
+        if self._open_lock is None:
+            return
+        async with self._open_lock:
+            while self._open:
+                _, shard = self._open.popitem(last=False)
+                await shard.close()
+        logger.info("Shards de la base de datos cerrados")
+
+    async def backup(self, directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> Optional[BackupResult]:
+        """Copia en caliente de todos los shards en una carpeta con fecha"""
+        await self.flush_xp()
+        directory = Path(directory)
+        moment = datetime.now()
+        target = snapshot_path(directory, str(self.directory), moment)
+        start = time.perf_counter()
+        size = pages = 0
+        for key in self.shard_keys():
+            path = self.shard_path(key)
+            result = await online_backup(str(path), target / path.name, BACKUP_PAGES_PER_STEP)
+            size += result.size_bytes
+            pages += result.pages
+        rotate_backups(directory, str(self.directory), keep)
+
+        self.last_backup = BackupResult(target, size, pages, time.perf_counter() - start, moment)
+        self.metrics.record('backup', self.last_backup.duration)
+        logger.info(
+            f"Copia de seguridad de shards creada: {target.name} "
+            f"({size / 1024 / 1024:.1f} MiB, {pages} páginas, {self.last_backup.duration:.2f}s)"
+        )
+        return self.last_backup
+
+    async def export_columnar(self, directory: str = EXPORT_DIR, fmt: str = EXPORT_FORMAT) -> Optional[ExportResult]:
+        """Exporta todos los shards a la misma carpeta (cada servidor vive en un solo shard)"""
+        await self.flush_xp()
+        directory = Path(directory)
+        result = await asyncio.to_thread(
+            export_databases, [str(self.shard_path(key)) for key in self.shard_keys()], directory, fmt
+        )
+        self.metrics.record('export_columnar', result.duration)
+        logger.info(
+            f"Exportación {fmt} de shards completada en {directory}: {result.total_rows:,} filas, "
+            f"{result.files} ficheros, {result.size_bytes / 1024 / 1024:.1f} MiB, {result.duration:.2f}s"
+        )
+        return result
+
+    async def refresh_replica(self) -> Optional[BackupResult]:
+        """Sin réplica de análisis: cada servidor ya tiene su propio fichero y escritor"""
+        return None
+
+    def replica_lag(self) -> Optional[float]:
+        return None
+
+    @asynccontextmanager
+    async def unit_of_work(self, guild_id: Optional[int] = None) -> AsyncIterator[DatabaseManager]:
+        """Unidad de trabajo en el shard del servidor (una transacción no cruza ficheros)"""
+        if guild_id is None:
+            raise ValueError("unit_of_work() necesita guild_id en el modo sharded")
+        async with self._shard(guild_id) as shard:
+            async with shard.unit_of_work(guild_id) as uow:
+                yield uow
+
+    def _new_shard(self, key: int) -> DatabaseManager:
+        return DatabaseManager(
+            str(self.shard_path(key)), readers=SHARD_READERS,
+            profile=self.profile, metrics=self.metrics, cache=self.cache, cache_scope=key
+        )
+
+    async def _acquire(self, key: int) -> DatabaseManager:
+        """Devuelve el shard abierto (abriéndolo si hace falta) y lo marca en uso"""
+        if self._open_lock is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        shard = self._open.get(key)
+        if shard is None:
+            async with self._open_lock:
+                shard = self._open.get(key)
+                if shard is None:
+                    shard = self._borrowed.pop(key, None)
+                    if shard is not None:
+                        # Un recorrido ya lo tiene abierto: pasa a la LRU sin abrir el fichero otra vez
+                        self._in_use[key] = self._in_use.get(key, 0) + 1
+                    else:
+                        shard = self._new_shard(key)
+                        await shard.initialize()
+                    self._open[key] = shard
+        self._open.move_to_end(key)
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        if len(self._open) > self.max_open:
+            async with self._open_lock:
+                await self._evict()
+        return shard
+
+    def _release(self, key: int):
+        self._in_use[key] -= 1
+        if not self._in_use[key]:
+            del self._in_use[key]
+
+    async def _evict(self):
+        """Cierra los shards inactivos menos usados hasta volver al límite"""
+        for key in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            if key in self._in_use:
+                continue  # Un shard con operaciones en curso nunca se cierra
+            shard = self._open.pop(key)
+            await shard.close()
+            logger.debug(f"Shard {key} cerrado por inactividad")
+
+    @asynccontextmanager
+    async def _shard(self, guild_id: int) -> AsyncIterator[DatabaseManager]:
+        """Presta el shard de un servidor"""
+        key = self.shard_key(guild_id)
+        shard = await self._acquire(key)
+        try:
+            yield shard
+        finally:
+            self._release(key)
+
+    @asynccontextmanager
+    async def _borrow(self, key: int) -> AsyncIterator[DatabaseManager]:
+        """Shard para un recorrido global: el abierto, o uno temporal fuera de la LRU"""
+        if self._open_lock is None:
+            raise RuntimeError("La base de datos no está inicializada, llama a initialize() primero")
+        shard = None
+        if key not in self._open and key not in self._borrowed:
+            # Abrirlo en la LRU expulsaría a los servidores activos en cada recorrido;
+            # con el lock, _acquire no puede abrir el mismo fichero a la vez
+            async with self._open_lock:
+                if key not in self._open and key not in self._borrowed:
+                    shard = self._new_shard(key)
+                    await shard.initialize()
+                    self._borrowed[key] = shard
+        if shard is None:
+            shard = await self._acquire(key)
+            try:
+                yield shard
+            finally:
+                self._release(key)
+            return
+        try:
+            yield shard
+        finally:
+            if self._borrowed.get(key) is shard:
+                del self._borrowed[key]
+                await shard.close()
+            else:
+                # _acquire lo pasó a la LRU mientras se usaba
+                self._release(key)
+
+    async def _read_closed(self, key: int, sql: str, params: tuple) -> Optional[list]:
+        """
+        Consulta un shard cerrado con una conexión de solo lectura, sin
+        escritor, migraciones ni acumulador de XP
+
+        Returns:
+            Las filas, o None si el fichero tiene un esquema anterior (hay que migrarlo)
+        """
+        start = time.perf_counter()
+        uri = f"{self.shard_path(key).resolve().as_uri()}?mode=ro"
+        async with aiosqlite.connect(uri, uri=True) as conn:
+            if await get_schema_version(conn) != SCHEMA_VERSION:
+                return None
+            async with conn.execute(sql, params) as cursor:
+                rows = await cursor.fetchall()
+        self.metrics.record('read_closed_shard', time.perf_counter() - start)
+        return rows
+
+    # ===== MÉTODOS PARA ADVERTENCIAS =====
+
+    async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str):
+        async with self._shard(guild_id) as shard:
+            await shard.add_warning(user_id, guild_id, moderator_id, reason)
+
+    async def get_warnings(self, user_id: int, guild_id: int,
+                           include_archive: bool = False) -> List[WarningRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_warnings(user_id, guild_id, include_archive)
+
+    async def get_warning_count(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_warning_count(user_id, guild_id, include_archive)
+
+    # ===== MÉTODOS PARA PERFILES DE USUARIOS =====
+
+    async def update_user_games(self, user_id: int, guild_id: int, games: str):
+        async with self._shard(guild_id) as shard:
+            await shard.update_user_games(user_id, guild_id, games)
+
+    async def get_user_profile(self, user_id: int, guild_id: Optional[int] = None) -> Optional[ProfileRow]:
+        """Perfil del usuario en ese servidor; sin guild_id, el más reciente de todos los shards"""
+        if guild_id is not None:
+            async with self._shard(guild_id) as shard:
+                return await shard.get_user_profile(user_id)
+
+        profiles = []
+        for key in self.shard_keys():
+            async with self._borrow(key) as shard:
+                profile = await shard.get_user_profile(user_id)
+            if profile is not None:
+                profiles.append(profile)
+        return max(profiles, key=lambda p: p.updated_at or 0, default=None)
+
+    # ===== MÉTODOS PARA EVENTOS =====
+
+    async def create_event(self, guild_id: int, creator_id: int, title: str,
+                           description: str, event_date: datetime):
+        async with self._shard(guild_id) as shard:
+            await shard.create_event(guild_id, creator_id, title, description, event_date)
+
+    async def get_upcoming_events(self, guild_id: int) -> List[EventRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_upcoming_events(guild_id)
+
+    async def get_events_to_notify(self) -> List[EventRow]:
+        """Eventos por notificar de todos los servidores (los shards cerrados no se abren)"""
+        now = epoch_now()
+        events = []
+        for key in self.shard_keys():
+            if key not in self._open:
+                rows = await self._read_closed(key, EVENTS_TO_NOTIFY_SQL, (now, now + EVENT_NOTIFY_AHEAD))
+                if rows is not None:
+                    events.extend(map(EventRow._make, rows))
+                    continue
+            async with self._borrow(key) as shard:
+                events.extend(await shard.get_events_to_notify())
+        return events
+
+    async def mark_event_notified(self, event_id: int, guild_id: Optional[int] = None):
+        """Marca un evento como notificado (los IDs de evento son propios de cada shard)"""
+        if guild_id is None:
+            raise ValueError("En modo sharded mark_event_notified necesita el guild_id del evento")
+        async with self._shard(guild_id) as shard:
+            await shard.mark_event_notified(event_id)
+
+    # ===== MÉTODOS PARA NIVELES Y XP =====
+
+    async def add_xp(self, user_id: int, guild_id: int, xp_amount: int):
+        async with self._shard(guild_id) as shard:
+            await shard.add_xp(user_id, guild_id, xp_amount)
+
+    async def flush_xp(self):
+        """Fuerza el volcado del XP acumulado en todos los shards abiertos"""
+        for key in list(self._open):
+            async with self._borrow(key) as shard:
+                await shard.flush_xp()
+
+    async def get_user_level_data(self, user_id: int, guild_id: int) -> Optional[LevelRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_user_level_data(user_id, guild_id)
+
+    async def update_level(self, user_id: int, guild_id: int, new_level: int):
+        async with self._shard(guild_id) as shard:
+            await shard.update_level(user_id, guild_id, new_level)
+
+    async def import_levels(self, guild_id: int, rows: Iterable[ImportRow], add: bool = False,
+                            chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+        async with self._shard(guild_id) as shard:
+            return await shard.import_levels(guild_id, rows, add, chunk_size)
+
+    async def get_top_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[LevelRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_top_users(guild_id, limit, replica)
+
+    # ===== MÉTODOS PARA ECONOMÍA =====
+
+    async def get_balance(self, user_id: int, guild_id: int) -> int:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_balance(user_id, guild_id)
+
+    async def add_money(self, user_id: int, guild_id: int, amount: int):
+        async with self._shard(guild_id) as shard:
+            await shard.add_money(user_id, guild_id, amount)
+
+    async def remove_money(self, user_id: int, guild_id: int, amount: int) -> bool:
+        async with self._shard(guild_id) as shard:
+            return await shard.remove_money(user_id, guild_id, amount)
+
+    async def debit_money(self, user_id: int, guild_id: int, amount: int) -> Optional[int]:
+        async with self._shard(guild_id) as shard:
+            return await shard.debit_money(user_id, guild_id, amount)
+
+    async def adjust_balance(self, user_id: int, guild_id: int, delta: int,
+                             min_balance: int = 0) -> Optional[int]:
+        async with self._shard(guild_id) as shard:
+            return await shard.adjust_balance(user_id, guild_id, delta, min_balance)
+
+    async def transfer(self, from_user_id: int, to_user_id: int, guild_id: int,
+                       amount: int) -> Optional[int]:
+        check_transfer(from_user_id, to_user_id, amount)
+        # Ambos usuarios son del mismo servidor: la transferencia sigue siendo una transacción
+        async with self._shard(guild_id) as shard:
+            return await shard.transfer(from_user_id, to_user_id, guild_id, amount)
+
+    async def set_balance(self, user_id: int, guild_id: int, amount: int):
+        async with self._shard(guild_id) as shard:
+            await shard.set_balance(user_id, guild_id, amount)
+
+    async def get_last_daily(self, user_id: int, guild_id: int) -> Optional[int]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_last_daily(user_id, guild_id)
+
+    async def update_last_daily(self, user_id: int, guild_id: int):
+        async with self._shard(guild_id) as shard:
+            await shard.update_last_daily(user_id, guild_id)
+
+    async def get_last_work(self, user_id: int, guild_id: int) -> Optional[int]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_last_work(user_id, guild_id)
+
+    async def update_last_work(self, user_id: int, guild_id: int):
+        async with self._shard(guild_id) as shard:
+            await shard.update_last_work(user_id, guild_id)
+
+    async def get_richest_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[EconomyRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_richest_users(guild_id, limit, replica)
+
+    # ===== MÉTODOS PARA TIBIA LOOTS =====
+
+    async def add_tibia_loot(self, user_id: int, guild_id: int, boss_name: str,
+                             items: str, value: int):
+        async with self._shard(guild_id) as shard:
+            await shard.add_tibia_loot(user_id, guild_id, boss_name, items, value)
+
+    async def get_user_loots(self, user_id: int, guild_id: int, limit: int = 10,
+                             include_archive: bool = False) -> List[LootRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_user_loots(user_id, guild_id, limit, include_archive)
+
+    async def get_boss_stats(self, guild_id: int, boss_name: str = None,
+                             replica: bool = False) -> List[BossStatsRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_boss_stats(guild_id, boss_name, replica)
+
+    async def get_top_loots(self, guild_id: int, limit: int = 10,
+                            include_archive: bool = False, replica: bool = False) -> List[LootRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_top_loots(guild_id, limit, include_archive, replica)
+
+    async def get_total_loot_value(self, user_id: int, guild_id: int, include_archive: bool = False) -> int:
+        async with self._shard(guild_id) as shard:
+            return await shard.get_total_loot_value(user_id, guild_id, include_archive)
+
+    async def search_loots(self, guild_id: int, text: str, limit: int = 10, offset: int = 0) -> List[LootRow]:
+        async with self._shard(guild_id) as shard:
+            return await shard.search_loots(guild_id, text, limit, offset)
+
+    # ===== RETENCIÓN Y ARCHIVO =====
+
+    async def archive_old_rows(self, loot_days: int = RETENTION_LOOT_DAYS,
+                               warning_days: int = RETENTION_WARNING_DAYS,
+                               batch_size: int = RETENTION_BATCH_SIZE) -> Dict[str, int]:
+        """Archiva cada shard por turnos y suma los resultados"""
+        totals = {'tibia_loots': 0, 'warnings': 0, 'pages': 0}
+        for key in self.shard_keys():
+            async with self._borrow(key) as shard:
+                moved = await shard.archive_old_rows(loot_days, warning_days, batch_size)
+            for name, count in moved.items():
+                totals[name] += count
+        return totals
+
+    async def incremental_vacuum(self, pages_per_step: int = VACUUM_PAGES_PER_STEP) -> int:
+        freed = 0
+        for key in self.shard_keys():
+            async with self._borrow(key) as shard:
+                freed += await shard.incremental_vacuum(pages_per_step)
+        return freed
+
+    async def maintenance(self, time_budget: float = MAINTENANCE_TIME_BUDGET,
+                          pages_per_step: int = VACUUM_PAGES_PER_STEP) -> MaintenanceReport:
+        """Mantiene los shards por turnos dentro del mismo presupuesto de tiempo"""
+        deadline = time.perf_counter() + time_budget
+        reports = []
+        for key in self.shard_keys():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                reports.append(EMPTY_REPORT._replace(completed=False))
+                break
+            async with self._borrow(key) as shard:
+                reports.append(await shard.maintenance(remaining, pages_per_step))
+        return merge_reports(reports)
+
+    # ===== RECORRIDOS POR BLOQUES =====
+
+    async def iter_levels(self, guild_id: int,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LevelRow]:
+        async with self._shard(guild_id) as shard:
+            async for row in shard.iter_levels(guild_id, chunk_size):
+                yield row
+
+    async def iter_loots(self, guild_id: int, since: Optional[datetime] = None,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LootRow]:
+        async with self._shard(guild_id) as shard:
+            async for row in shard.iter_loots(guild_id, since, chunk_size):
+                yield row
+
+    async def iter_economy(self, guild_id: int,
+                           chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[EconomyRow]:
+        async with self._shard(guild_id) as shard:
+            async for row in shard.iter_economy(guild_id, chunk_size):
+                yield row
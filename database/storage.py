@@ -0,0 +1,194 @@
+"""
+Interfaz común de almacenamiento que usan los cogs
+"""
+import re
+import time
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, Dict, Iterable, List, Optional, Protocol
+
+from database.backup import BackupResult
+from database.cache import ReadCache
+from database.export import ExportResult
+from database.importer import ImportRow
+from database.maintenance import MaintenanceReport
+from database.metrics import QueryMetrics
+from database.records import (
+    BossStatsRow,
+    EconomyRow,
+    EventRow,
+    LevelRow,
+    LootRow,
+    ProfileRow,
+    WarningRow
+)
+
+# Filas leídas por bloque en los recorridos iter_*
+STREAM_CHUNK_SIZE = 1000
+
+# Antelación (segundos) con la que se avisa de un evento
+EVENT_NOTIFY_AHEAD = 3600
+
+# Coincidencias más recientes que search_loots ordena por relevancia
+SEARCH_CANDIDATES = 1000
+
+
+def epoch_now() -> int:
+    """Segundos Unix actuales: el formato de todas las columnas de fecha"""
+    return int(time.time())
+
+
+def to_epoch(moment: datetime) -> int:
+    """Segundos Unix de una fecha (sin zona horaria se toma como hora local)"""
+    return int(moment.timestamp())
+
+
+def from_epoch(value: int) -> datetime:
+    """Fecha en hora local para mostrarla en los embeds"""
+    return datetime.fromtimestamp(value)
+
+
+def cooldown_remaining(last: Optional[int], cooldown: int) -> int:
+    """Segundos que faltan de un cooldown que empezó en `last` (0 si ya terminó)"""
+    if last is None:
+        return 0
+    return max(0, last + cooldown - epoch_now())
+
+
+def check_transfer(from_user_id: int, to_user_id: int, amount: int):
+    """Rechaza las transferencias que no mueven dinero entre dos usuarios distintos"""
+    if amount <= 0:
+        raise ValueError(f"La cantidad a transferir debe ser positiva (recibido {amount})")
+    if from_user_id == to_user_id:
+        raise ValueError("No se puede transferir dinero a uno mismo")
+
+
+def search_terms(text: str) -> List[str]:
+    """Palabras de una búsqueda de loots, en minúsculas y sin signos de puntuación"""
+    return re.findall(r'\w+', text.lower())
+
+
+class StorageBackend(Protocol):
+    """
+    Operaciones de datos del bot, independientes del motor
+
+    DatabaseManager (SQLite), ShardedStorage (un SQLite por servidor) y
+    MemoryStorage (diccionarios en memoria) la implementan;
+    config.settings.DATABASE_BACKEND elige cuál usa db_manager.
+    """
+
+    metrics: QueryMetrics
+    cache: Optional[ReadCache]
+    last_backup: Optional[BackupResult]
+
+    async def initialize(self): ...
+
+    async def close(self): ...
+
+    async def backup(self, directory: str = ..., keep: int = ...) -> Optional[BackupResult]: ...
+
+    async def export_columnar(self, directory: str = ..., fmt: str = ...) -> Optional[ExportResult]: ...
+
+    # Réplica de análisis (None si no hay): las lecturas con replica=True van a ella
+    async def refresh_replica(self) -> Optional[BackupResult]: ...
+
+    def replica_lag(self) -> Optional[float]: ...
+
+    # Varias llamadas de un comando en una sola transacción
+    def unit_of_work(self, guild_id: Optional[int] = None) -> AsyncContextManager['StorageBackend']: ...
+
+    # Advertencias
+    async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str): ...
+
+    async def get_warnings(self, user_id: int, guild_id: int,
+                           include_archive: bool = False) -> List[WarningRow]: ...
+
+    async def get_warning_count(self, user_id: int, guild_id: int, include_archive: bool = False) -> int: ...
+
+    # Perfiles
+    async def update_user_games(self, user_id: int, guild_id: int, games: str): ...
+
+    async def get_user_profile(self, user_id: int, guild_id: Optional[int] = None) -> Optional[ProfileRow]: ...
+
+    # Eventos
+    async def create_event(self, guild_id: int, creator_id: int, title: str,
+                           description: str, event_date: datetime): ...
+
+    async def get_upcoming_events(self, guild_id: int) -> List[EventRow]: ...
+
+    async def get_events_to_notify(self) -> List[EventRow]: ...
+
+    async def mark_event_notified(self, event_id: int, guild_id: Optional[int] = None): ...
+
+    # Niveles y XP
+    async def add_xp(self, user_id: int, guild_id: int, xp_amount: int): ...
+
+    async def flush_xp(self): ...
+
+    async def get_user_level_data(self, user_id: int, guild_id: int) -> Optional[LevelRow]: ...
+
+    async def update_level(self, user_id: int, guild_id: int, new_level: int): ...
+
+    async def import_levels(self, guild_id: int, rows: Iterable[ImportRow], add: bool = False,
+                            chunk_size: int = ...) -> int: ...
+
+    async def get_top_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[LevelRow]: ...
+
+    # Economía
+    async def get_balance(self, user_id: int, guild_id: int) -> int: ...
+
+    async def add_money(self, user_id: int, guild_id: int, amount: int): ...
+
+    async def remove_money(self, user_id: int, guild_id: int, amount: int) -> bool: ...
+
+    async def debit_money(self, user_id: int, guild_id: int, amount: int) -> Optional[int]: ...
+
+    async def adjust_balance(self, user_id: int, guild_id: int, delta: int,
+                             min_balance: int = 0) -> Optional[int]: ...
+
+    async def transfer(self, from_user_id: int, to_user_id: int, guild_id: int,
+                       amount: int) -> Optional[int]: ...
+
+    async def set_balance(self, user_id: int, guild_id: int, amount: int): ...
+
+    async def get_last_daily(self, user_id: int, guild_id: int) -> Optional[int]: ...
+
+    async def update_last_daily(self, user_id: int, guild_id: int): ...
+
+    async def get_last_work(self, user_id: int, guild_id: int) -> Optional[int]: ...
+
+    async def update_last_work(self, user_id: int, guild_id: int): ...
+
+    async def get_richest_users(self, guild_id: int, limit: int = 10, replica: bool = False) -> List[EconomyRow]: ...
+
+    # Loots de Tibia
+    async def add_tibia_loot(self, user_id: int, guild_id: int, boss_name: str,
+                             items: str, value: int): ...
+
+    async def get_user_loots(self, user_id: int, guild_id: int, limit: int = 10,
+                             include_archive: bool = False) -> List[LootRow]: ...
+
+    async def get_boss_stats(self, guild_id: int, boss_name: str = None,
+                             replica: bool = False) -> List[BossStatsRow]: ...
+
+    async def get_top_loots(self, guild_id: int, limit: int = 10,
+                            include_archive: bool = False, replica: bool = False) -> List[LootRow]: ...
+
+    async def get_total_loot_value(self, user_id: int, guild_id: int, include_archive: bool = False) -> int: ...
+
+    async def search_loots(self, guild_id: int, text: str, limit: int = 10, offset: int = 0) -> List[LootRow]: ...
+
+    # Retención y archivo
+    async def archive_old_rows(self, loot_days: int = ..., warning_days: int = ...,
+                               batch_size: int = ...) -> Dict[str, int]: ...
+
+    async def incremental_vacuum(self, pages_per_step: int = ...) -> int: ...
+
+    async def maintenance(self, time_budget: float = ..., pages_per_step: int = ...) -> MaintenanceReport: ...
+
+    # Recorridos por bloques (memoria constante sea cual sea el tamaño de la tabla)
+    def iter_levels(self, guild_id: int, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LevelRow]: ...
+
+    def iter_loots(self, guild_id: int, since: Optional[datetime] = None,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[LootRow]: ...
+
+    def iter_economy(self, guild_id: int, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[EconomyRow]: ...
@@ -0,0 +1,132 @@
+"""
+Acumulador de XP en memoria con escritura diferida por lotes
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from database.storage import epoch_now
+
+logger = logging.getLogger('discord_bot')
+
+XPKey = Tuple[int, int]
+
+
+class PendingXP:
+    """XP y mensajes acumulados de un usuario que aún no están en la base de datos"""
+
+    __slots__ = ('xp', 'messages', 'last_xp_time')
+
+    def __init__(self, xp: int = 0, messages: int = 0, last_xp_time: Optional[int] = None):
+        self.xp = xp
+        self.messages = messages
+        self.last_xp_time = last_xp_time
+
+    def merge(self, other: 'PendingXP'):
+        """Suma otra entrada pendiente sobre esta"""
+        self.xp += other.xp
+        self.messages += other.messages
+        if other.last_xp_time and (not self.last_xp_time or other.last_xp_time > self.last_xp_time):
+            self.last_xp_time = other.last_xp_time
+
+
+class XPAccumulator:
+    """
+    Agrupa las llamadas a add_xp por (user_id, guild_id) y las vuelca en una
+    sola transacción cada `interval` segundos o al llegar a `max_entries` claves
+    """
+
+    def __init__(self, flush_callback: Callable[[Dict[XPKey, PendingXP]], Awaitable[None]],
+                 interval: float, max_entries: int):
+        self._flush_callback = flush_callback
+        self.interval = interval
+        self.max_entries = max_entries
+        self._pending: Dict[XPKey, PendingXP] = {}
+        # Entradas que se están escribiendo: siguen visibles hasta el commit
+        self._in_flight: Dict[XPKey, PendingXP] = {}
+        # Se crean en start() para quedar ligados al event loop del bot
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: int, guild_id: int, xp_amount: int):
+        """Acumula XP y un mensaje para el usuario"""
+        key = (user_id, guild_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = PendingXP()
+        entry.xp += xp_amount
+        entry.messages += 1
+        entry.last_xp_time = epoch_now()
+
+        if len(self._pending) >= self.max_entries and self._wake is not None:
+            self._wake.set()
+
+    def get(self, user_id: int, guild_id: int) -> Optional[PendingXP]:
+        """Devuelve lo acumulado para un usuario (pendiente + en escritura)"""
+        key = (user_id, guild_id)
+        pending = self._pending.get(key)
+        in_flight = self._in_flight.get(key)
+        if pending is None and in_flight is None:
+            return None
+
+        total = PendingXP()
+        for entry in (in_flight, pending):
+            if entry is not None:
+                total.merge(entry)
+        return total
+
+    async def flush(self):
+        """Escribe todo lo acumulado en una única transacción"""
+        if not self._pending:
+            return
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            self._in_flight, self._pending = self._pending, {}
+            try:
+                await self._flush_callback(self._in_flight)
+            except Exception as e:
+                # Devolver las entradas para no perder XP en el siguiente intento
+                logger.error(f"Error al volcar XP acumulado ({len(self._in_flight)} usuarios): {e}")
+                for key, entry in self._in_flight.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        self._pending[key] = entry
+                    else:
+                        entry.merge(current)
+                        self._pending[key] = entry
+            finally:
+                self._in_flight = {}
+
+    def start(self):
+        """Inicia la tarea de volcado periódico"""
+        if self._task is None:
+            self._flush_lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detiene la tarea periódica y vuelca lo pendiente"""
+        # No se cancela la tarea para no interrumpir un volcado a medias
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
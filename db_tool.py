@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Herramienta de línea de comandos para los datos del bot
+Uso:
+    python db_tool.py dump copia.jsonl.gz [--db gaming_bot.db]
+    python db_tool.py restore copia.jsonl.gz [--db nueva.db] [--replace]
+    python db_tool.py vacuum [--db gaming_bot.db]
+    python db_tool.py rebuild-stats [--db gaming_bot.db]
+    python db_tool.py export exports/ [--db gaming_bot.db] [--format parquet|arrow]
+    python db_tool.py import-levels niveles.csv --guild 123 [--db gaming_bot.db] [--add]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import aiosqlite
+
+from config.settings import DATABASE_NAME, EXPORT_FORMAT
+from database.db_manager import DatabaseManager
+from database.export import EXPORT_FORMATS, export_database
+from database.importer import IMPORT_FORMATS, ImportResult, ImportValidator, detect_format, read_records
+from database.migrations import BOSS_STATS_REBUILD, LOOT_SEARCH_REBUILD, run_migrations
+
+# Tablas que se copian, en orden de restauración (tibia_boss_stats se recalcula al final)
+TABLES = ('warnings', 'warnings_archive', 'user_profiles', 'events', 'levels', 'economy',
+          'tibia_loots', 'tibia_loots_archive')
+
+# Filas por fetchmany/executemany y filas por transacción al restaurar
+BATCH_SIZE = 5000
+TRANSACTION_ROWS = 200_000
+
+# Nivel gzip: el 9 por defecto triplica el tiempo de volcado para ganar poco tamaño
+COMPRESS_LEVEL = 6
+
+
+class Throughput:
+    """Contador de filas por tabla para el informe final"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rows: Dict[str, int] = {}
+
+    def add(self, table: str, rows: int):
+        self.rows[table] = self.rows.get(table, 0) + rows
+
+    def report(self, action: str, path: Path):
+        elapsed = time.perf_counter() - self.start
+        total = sum(self.rows.values())
+        size = path.stat().st_size / 1024 / 1024
+        for table in TABLES:
+            print(f"   {table:<16} {self.rows.get(table, 0):>12,} filas")
+        print(f"✅ {action}: {total:,} filas en {elapsed:.2f}s "
+              f"({total / elapsed if elapsed else 0:,.0f} filas/s, {path.name} {size:.1f} MiB)")
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def dump(db_path: Path, out_path: Path):
+    """Vuelca todas las tablas a JSONL comprimido, una fila por línea"""
+    # Solo lectura: se puede ejecutar con el bot en marcha (modo WAL)
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    stats = Throughput()
+    try:
+        # Una sola transacción de lectura: todas las tablas del mismo instante
+        conn.execute('BEGIN')
+        with gzip.open(out_path, 'wt', compresslevel=COMPRESS_LEVEL, encoding='utf-8') as out:
+            for table in TABLES:
+                columns = table_columns(conn, table)
+                cursor = conn.execute(f'SELECT {", ".join(columns)} FROM {table}')
+                while True:
+                    rows = cursor.fetchmany(BATCH_SIZE)
+                    if not rows:
+                        break
+                    out.writelines(
+                        json.dumps({'table': table, 'row': dict(zip(columns, row))}, ensure_ascii=False) + '\n'
+                        for row in rows
+                    )
+                    stats.add(table, len(rows))
+        conn.rollback()
+    finally:
+        conn.close()
+    stats.report("Volcado completado", out_path)
+
+
+def read_dump(in_path: Path) -> Iterator[Tuple[str, dict]]:
+    """Lee el volcado línea a línea"""
+    with gzip.open(in_path, 'rt', encoding='utf-8') as source:
+        for number, line in enumerate(source, 1):
+            try:
+                record = json.loads(line)
+                yield record['table'], record['row']
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"Línea {number} inválida en {in_path.name}: {e}") from e
+
+
+async def prepare_schema(db_path: Path):
+    """Crea o actualiza el esquema con las mismas migraciones que el bot"""
+    async with aiosqlite.connect(db_path) as db:
+        # Igual que DatabaseManager._connect: solo tiene efecto si el fichero es nuevo
+        await db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        await run_migrations(db)
+
+
+def restore(in_path: Path, db_path: Path, replace: bool):
+    """Restaura un volcado con inserciones por lotes en transacciones grandes"""
+    asyncio.run(prepare_schema(db_path))
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    # Un fallo a mitad se repite desde el volcado: no hace falta fsync en cada commit
+    conn.execute('PRAGMA synchronous = OFF')
+
+    if not replace:
+        used = [t for t in TABLES if conn.execute(f'SELECT 1 FROM {t} LIMIT 1').fetchone()]
+        if used:
+            conn.close()
+            print(f"❌ La base de datos ya tiene datos en: {', '.join(used)}")
+            print("   Usa una base de datos nueva o --replace para sobrescribir filas")
+            sys.exit(1)
+
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+    stats = Throughput()
+    batch: List[tuple] = []
+    batch_table = batch_columns = None
+    pending = 0
+
+    def flush():
+        nonlocal pending
+        if batch:
+            placeholders = ', '.join('?' * len(batch_columns))
+            conn.executemany(
+                f'{verb} INTO {batch_table} ({", ".join(batch_columns)}) VALUES ({placeholders})',
+                batch
+            )
+            stats.add(batch_table, len(batch))
+            pending += len(batch)
+            batch.clear()
+        if pending >= TRANSACTION_ROWS:
+            conn.execute('COMMIT')
+            conn.execute('BEGIN')
+            pending = 0
+
+    try:
+        conn.execute('BEGIN')
+        for table, row in read_dump(in_path):
+            if table not in TABLES:
+                raise ValueError(f"Tabla desconocida en el volcado: {table}")
+            columns = tuple(row)
+            if table != batch_table or columns != batch_columns or len(batch) >= BATCH_SIZE:
+                flush()
+                batch_table, batch_columns = table, columns
+            batch.append(tuple(row.values()))
+        flush()
+        # El trigger no ve los loots archivados y --replace cuenta dos veces los reemplazados
+        for statement in BOSS_STATS_REBUILD:
+            conn.execute(statement)
+        # INSERT OR REPLACE no dispara el trigger de borrado: el índice de búsqueda se rehace
+        conn.execute(LOOT_SEARCH_REBUILD)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    stats.report("Restauración completada", in_path)
+
+
+def vacuum(db_path: Path):
+    """Activa auto_vacuum incremental y compacta el fichero (con el bot detenido)"""
+    before = db_path.stat().st_size
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # auto_vacuum solo cambia en una base existente al reconstruirla con VACUUM
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        conn.close()
+    after = db_path.stat().st_size
+    print(f"✅ VACUUM completado en {time.perf_counter() - start:.2f}s: "
+          f"{before / 1024 / 1024:.1f} MiB -> {after / 1024 / 1024:.1f} MiB (auto_vacuum incremental activado)")
+
+
+def rebuild_stats(db_path: Path):
+    """Recalcula tibia_boss_stats desde los loots (se puede ejecutar con el bot en marcha)"""
+    asyncio.run(prepare_schema(db_path))
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for statement in BOSS_STATS_REBUILD:
+            conn.execute(statement)
+        conn.execute('COMMIT')
+        bosses = conn.execute('SELECT COUNT(*) FROM tibia_boss_stats').fetchone()[0]
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    print(f"✅ Estadísticas por criatura recalculadas en {time.perf_counter() - start:.2f}s: {bosses:,} filas")
+
+
+def export(db_path: Path, out_dir: Path, fmt: str):
+    """Exporta a Parquet/Arrow por servidor y mes (solo lectura: con el bot en marcha)"""
+    try:
+        result = export_database(str(db_path), out_dir, fmt)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for dataset, rows in result.rows.items():
+        print(f"   {dataset:<16} {rows:>12,} filas")
+    rate = result.total_rows / result.duration if result.duration else 0
+    print(f"✅ Exportación completada: {result.total_rows:,} filas en {result.duration:.2f}s "
+          f"({rate:,.0f} filas/s, {result.files} ficheros, {result.size_bytes / 1024 / 1024:.1f} MiB)")
+
+
+def import_levels(in_path: Path, db_path: Path, guild_id: int, add: bool, fmt: str = None):
+    """Importa XP de otro bot a un servidor (se puede ejecutar con el bot en marcha)"""
+    fmt = fmt or detect_format(in_path.name)
+    validator = ImportValidator()
+    start = time.perf_counter()
+
+    async def run() -> int:
+        # Mismo camino que /importxp: escritor único con reintentos si el bot está escribiendo
+        manager = DatabaseManager(str(db_path), readers=1)
+        await manager.initialize()
+        try:
+            with in_path.open(encoding='utf-8-sig', newline='') as source:
+                return await manager.import_levels(guild_id, validator.rows(read_records(source, fmt)), add)
+        finally:
+            await manager.close()
+
+    imported = asyncio.run(run())
+    result = ImportResult(imported, validator.rejected, validator.errors, time.perf_counter() - start)
+    for error in result.errors:
+        print(f"   ⚠️ {error}")
+    print(f"✅ Importación completada: {result.imported:,} filas en {result.duration:.2f}s "
+          f"({result.rows_per_second:,.0f} filas/s, {result.rejected:,} descartadas)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herramientas de datos del bot")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    dump_parser = commands.add_parser('dump', help="Volcar la base de datos a JSONL comprimido")
+    dump_parser.add_argument('output', type=Path, help="Fichero de salida (.jsonl.gz)")
+    dump_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos de origen")
+
+    restore_parser = commands.add_parser('restore', help="Restaurar un volcado JSONL comprimido")
+    restore_parser.add_argument('input', type=Path, help="Fichero de volcado (.jsonl.gz)")
+    restore_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos de destino")
+    restore_parser.add_argument('--replace', action='store_true',
+                                help="Sobrescribir filas existentes con la misma clave")
+
+    vacuum_parser = commands.add_parser('vacuum', help="Activar el vacuum incremental y compactar (bot detenido)")
+    vacuum_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos a compactar")
+
+    stats_parser = commands.add_parser('rebuild-stats', help="Recalcular las estadísticas de loot por criatura")
+    stats_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos a recalcular")
+
+    export_parser = commands.add_parser('export', help="Exportar a Parquet/Arrow para análisis (necesita pyarrow)")
+    export_parser.add_argument('output', type=Path, help="Carpeta de salida")
+    export_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos de origen")
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, default=EXPORT_FORMAT, help="Formato de los ficheros")
+
+    import_parser = commands.add_parser('import-levels', help="Importar XP de otro bot (CSV, JSON o JSONL)")
+    import_parser.add_argument('input', type=Path, help="Fichero con user_id, xp y messages")
+    import_parser.add_argument('--guild', type=int, required=True, help="ID del servidor de destino")
+    import_parser.add_argument('--db', type=Path, default=Path(DATABASE_NAME), help="Base de datos de destino")
+    import_parser.add_argument('--add', action='store_true', help="Sumar al XP actual en lugar de sustituirlo")
+    import_parser.add_argument('--format', choices=IMPORT_FORMATS, help="Formato (por defecto, según la extensión)")
+
+    args = parser.parse_args()
+    if args.command == 'dump':
+        if not args.db.is_file():
+            print(f"❌ No existe la base de datos {args.db}")
+            sys.exit(1)
+        dump(args.db, args.output)
+    elif args.command == 'restore':
+        if not args.input.is_file():
+            print(f"❌ No existe el volcado {args.input}")
+            sys.exit(1)
+        restore(args.input, args.db, args.replace)
+    elif args.command == 'vacuum':
+        if not args.db.is_file():
+            print(f"❌ No existe la base de datos {args.db}")
+            sys.exit(1)
+        vacuum(args.db)
+    elif args.command == 'rebuild-stats':
+        if not args.db.is_file():
+            print(f"❌ No existe la base de datos {args.db}")
+            sys.exit(1)
+        rebuild_stats(args.db)
+    elif args.command == 'export':
+        if not args.db.is_file():
+            print(f"❌ No existe la base de datos {args.db}")
+            sys.exit(1)
+        export(args.db, args.output, args.format)
+    elif args.command == 'import-levels':
+        if not args.input.is_file():
+            print(f"❌ No existe el fichero {args.input}")
+            sys.exit(1)
+        try:
+            import_levels(args.input, args.db, args.guild, args.add, args.format)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""
+Configuración de pytest: permite importar los paquetes del bot desde la raíz
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,220 @@
+"""
+Caché de lecturas con escritores concurrentes
+
+Una lectura que empezó antes de una invalidación no debe quedar en la
+caché ni devolverse en lecturas posteriores.
+"""
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database.cache import MISSING, ReadCache
+from database.db_manager import DatabaseManager
+
+USER_ID = 10
+GUILD_ID = 1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@asynccontextmanager
+async def open_manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'cache.db'), readers=2, cache=ReadCache(100, 60))
+    await manager.initialize()
+    try:
+        yield manager
+    finally:
+        await manager.close()
+
+
+async def stale_read(manager: DatabaseManager, read, write):
+    """
+    Lanza `read`, la detiene con la consulta ya hecha (valor viejo) y antes
+    de fill(), ejecuta `write` y deja terminar la lectura
+    """
+    original = manager._read
+    queried = asyncio.Event()
+    release = asyncio.Event()
+
+    @asynccontextmanager
+    async def gated(*args, **kwargs):
+        async with original(*args, **kwargs) as db:
+            yield db
+        queried.set()
+        await release.wait()
+
+    manager._read = gated
+    reader = asyncio.create_task(read())
+    await queried.wait()
+    manager._read = original
+    await write()
+    release.set()
+    return await reader
+
+
+# ===== ReadCache =====
+
+def test_fill_after_invalidate_is_discarded():
+    cache = ReadCache(10, 60)
+    key = ('economy', USER_ID, GUILD_ID)
+    token = cache.begin_read(key)
+    cache.invalidate(key)
+    cache.fill(key, token, 100)
+    assert cache.get(key) is MISSING
+
+
+def test_fill_after_invalidate_table_is_discarded():
+    cache = ReadCache(10, 60)
+    key = ('levels', USER_ID, GUILD_ID)
+    token = cache.begin_read(key)
+    cache.invalidate_table('levels')
+    cache.fill(key, token, 100)
+    assert cache.get(key) is MISSING
+
+
+def test_read_started_after_invalidate_is_stored():
+    cache = ReadCache(10, 60)
+    key = ('economy', USER_ID, GUILD_ID)
+    cache.invalidate(key)
+    token = cache.begin_read(key)
+    cache.fill(key, token, 100)
+    assert cache.get(key) == 100
+
+
+# ===== DatabaseManager._cached con escritores =====
+
+def test_add_money_discards_stale_balance(tmp_path):
+    async def scenario():
+        async with open_manager(tmp_path) as manager:
+            await manager.add_money(USER_ID, GUILD_ID, 100)
+            stale = await stale_read(
+                manager,
+                lambda: manager.get_balance(USER_ID, GUILD_ID),
+                lambda: manager.add_money(USER_ID, GUILD_ID, 50)
+            )
+            assert stale == 100
+            assert manager.cache.get(('economy', USER_ID, GUILD_ID)) is MISSING
+            assert await manager.get_balance(USER_ID, GUILD_ID) == 150
+            # La lectura nueva sí queda en caché
+            assert manager.cache.get(('economy', USER_ID, GUILD_ID)).balance == 150
+
+    run(scenario())
+
+
+def test_xp_flush_discards_stale_level_row(tmp_path):
+    async def scenario():
+        async with open_manager(tmp_path) as manager:
+            await manager.add_xp(USER_ID, GUILD_ID, 20)
+            await manager.flush_xp()
+
+            async def write():
+                await manager.add_xp(USER_ID, GUILD_ID, 30)
+                await manager.flush_xp()
+
+            await stale_read(manager, lambda: manager.get_user_level_data(USER_ID, GUILD_ID), write)
+            assert manager.cache.get(('levels', USER_ID, GUILD_ID)) is MISSING
+            data = await manager.get_user_level_data(USER_ID, GUILD_ID)
+            assert data.xp == 50
+            assert data.total_messages == 2
+
+    run(scenario())
+
+
+def test_update_level_discards_stale_level_row(tmp_path):
+    async def scenario():
+        async with open_manager(tmp_path) as manager:
+            await manager.update_level(USER_ID, GUILD_ID, 2)
+            stale = await stale_read(
+                manager,
+                lambda: manager.get_user_level_data(USER_ID, GUILD_ID),
+                lambda: manager.update_level(USER_ID, GUILD_ID, 3)
+            )
+            assert stale.level == 2
+            assert manager.cache.get(('levels', USER_ID, GUILD_ID)) is MISSING
+            assert (await manager.get_user_level_data(USER_ID, GUILD_ID)).level == 3
+
+    run(scenario())
+
+
+def test_add_warning_discards_stale_count(tmp_path):
+    async def scenario():
+        async with open_manager(tmp_path) as manager:
+            await manager.add_warning(USER_ID, GUILD_ID, 1, "spam")
+            stale = await stale_read(
+                manager,
+                lambda: manager.get_warning_count(USER_ID, GUILD_ID),
+                lambda: manager.add_warning(USER_ID, GUILD_ID, 1, "flood")
+            )
+            assert stale == 1
+            assert manager.cache.get(('warnings', USER_ID, GUILD_ID)) is MISSING
+            assert await manager.get_warning_count(USER_ID, GUILD_ID) == 2
+
+    run(scenario())
+
+
+@pytest.mark.parametrize('group_window', [0.0, 0.002])
+def test_concurrent_readers_and_writers_end_consistent(tmp_path, group_window):
+    async def scenario():
+        async with open_manager(tmp_path) as manager:
+            manager.group_window = group_window
+            rng = random.Random(group_window)
+            users = range(1, 6)
+            expected = {user_id: 0 for user_id in users}
+
+            async def write(step: int):
+                user_id = rng.choice(users)
+                kind = step % 4
+                if kind == 0:
+                    expected[user_id] += 7
+                    await manager.add_money(user_id, GUILD_ID, 7)
+                elif kind == 1:
+                    await manager.add_xp(user_id, GUILD_ID, 5)
+                    if step % 3 == 0:
+                        await manager.flush_xp()
+                elif kind == 2:
+                    await manager.update_level(user_id, GUILD_ID, step)
+                else:
+                    await manager.add_warning(user_id, GUILD_ID, 1, "test")
+
+            async def read():
+                user_id = rng.choice(users)
+                await manager.get_balance(user_id, GUILD_ID)
+                await manager.get_user_level_data(user_id, GUILD_ID)
+                await manager.get_warning_count(user_id, GUILD_ID)
+
+            tasks = []
+            for step in range(400):
+                tasks.append(write(step))
+                tasks.extend(read() for _ in range(3))
+            rng.shuffle(tasks)
+            await asyncio.gather(*tasks)
+            await manager.flush_xp()
+
+            # Lo que quede en caché debe coincidir con lo confirmado en disco
+            async with manager._read() as db:
+                for user_id in users:
+                    for table, sql in (
+                        ('economy', 'SELECT balance FROM economy WHERE user_id = ? AND guild_id = ?'),
+                        ('levels', 'SELECT level FROM levels WHERE user_id = ? AND guild_id = ?'),
+                        ('warnings', 'SELECT COUNT(*) FROM warnings WHERE user_id = ? AND guild_id = ?'),
+                    ):
+                        async with db.execute(sql, (user_id, GUILD_ID)) as cursor:
+                            row = await cursor.fetchone()
+                        stored = row[0] if row else None
+                        cached = manager.cache.get((table, user_id, GUILD_ID))
+                        if cached is MISSING:
+                            continue
+                        if table == 'economy':
+                            cached = cached.balance if cached else None
+                        elif table == 'levels':
+                            cached = cached.level if cached else None
+                        assert cached == stored, (table, user_id)
+
+            for user_id in users:
+                assert await manager.get_balance(user_id, GUILD_ID) == expected[user_id]
+
+    run(scenario())
@@ -0,0 +1,89 @@
+"""
+Exportación columnar repetida sobre la misma carpeta
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database.db_manager import DatabaseManager
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+GUILD_ID = 10
+DAY = 86_400
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@asynccontextmanager
+async def open_manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'export.db'))
+    await manager.initialize()
+    try:
+        yield manager
+    finally:
+        await manager.close()
+
+
+def rows_on_disk(directory, dataset: str) -> int:
+    return sum(pq.read_metadata(path).num_rows for path in (directory / dataset).rglob('*.parquet'))
+
+
+async def rows_in_database(manager: DatabaseManager, *tables: str) -> int:
+    total = 0
+    async with manager._read() as db:
+        for table in tables:
+            async with db.execute(f'SELECT COUNT(*) FROM {table}') as cursor:
+                total += (await cursor.fetchone())[0]
+    return total
+
+
+def test_reexport_after_archive_does_not_duplicate_rows(tmp_path):
+    async def scenario():
+        out = tmp_path / 'exports'
+        async with open_manager(tmp_path) as manager:
+            for user_id in range(5):
+                await manager.add_tibia_loot(user_id, GUILD_ID, "Ferumbras", "gold", 100)
+            await manager.add_tibia_loot(9, GUILD_ID, "Orshabaal", "gold", 50)
+            async with manager._write() as db:
+                await db.execute('UPDATE tibia_loots SET timestamp = timestamp - ? WHERE user_id < 5', (400 * DAY,))
+            await manager.add_money(1, GUILD_ID, 100)
+
+            await manager.export_columnar(str(out))
+            assert rows_on_disk(out, 'tibia_loots') == 6
+
+            archived = await manager.archive_old_rows(loot_days=30)
+            assert archived['tibia_loots'] == 5
+            result = await manager.export_columnar(str(out))
+
+            expected = await rows_in_database(manager, 'tibia_loots', 'tibia_loots_archive')
+            assert expected == 6
+            assert result.rows['tibia_loots'] == expected
+            assert rows_on_disk(out, 'tibia_loots') == expected
+            assert rows_on_disk(out, 'economy') == 1
+            # Sin restos de la carpeta temporal
+            assert [path.name for path in out.iterdir() if path.name.startswith('.')] == []
+
+    run(scenario())
+
+
+def test_reexport_keeps_previous_snapshot_months(tmp_path):
+    async def scenario():
+        out = tmp_path / 'exports'
+        async with open_manager(tmp_path) as manager:
+            await manager.add_money(1, GUILD_ID, 100)
+            await manager.export_columnar(str(out))
+            # Foto de un mes anterior hecha por otra exportación
+            current = next((out / 'economy').rglob('month=*'))
+            previous = current.with_name('month=2000-01')
+            previous.mkdir()
+            (current / 'economy.parquet').rename(previous / 'economy.parquet')
+
+            await manager.export_columnar(str(out))
+            assert (previous / 'economy.parquet').exists()
+            assert rows_on_disk(out, 'economy') == 2
+
+    run(scenario())
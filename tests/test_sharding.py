@@ -0,0 +1,58 @@
+"""
+Recorridos globales de ShardedStorage sobre shards cerrados
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from database.sharding import ShardedStorage
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@asynccontextmanager
+async def open_storage(tmp_path):
+    # Un shard por servidor y uno solo abierto: el resto queda cerrado
+    storage = ShardedStorage(str(tmp_path), buckets=0, max_open=1)
+    await storage.initialize()
+    try:
+        yield storage
+    finally:
+        await storage.close()
+
+
+def test_events_to_notify_reads_closed_shards_without_opening_them(tmp_path):
+    async def scenario():
+        async with open_storage(tmp_path) as storage:
+            soon = datetime.now(timezone.utc) + timedelta(minutes=1)
+            await storage.create_event(1, 5, "a", "desc", soon)
+            await storage.create_event(2, 5, "b", "desc", soon)
+            assert list(storage._open) == [2]
+
+            events = await storage.get_events_to_notify()
+            assert sorted(event.guild_id for event in events) == [1, 2]
+            assert list(storage._open) == [2]
+            assert storage.metrics.snapshot()['read_closed_shard']['count'] == 1
+
+    run(scenario())
+
+
+def test_acquire_adopts_shard_borrowed_by_a_global_scan(tmp_path):
+    async def scenario():
+        async with open_storage(tmp_path) as storage:
+            soon = datetime.now(timezone.utc) + timedelta(minutes=1)
+            await storage.create_event(1, 5, "a", "desc", soon)
+            await storage.create_event(2, 5, "b", "desc", soon)
+
+            async with storage._borrow(1) as borrowed:
+                # Abrirlo en la LRU mientras tanto no debe crear otro DatabaseManager
+                assert await storage._acquire(1) is borrowed
+                storage._release(1)
+                assert storage._in_use == {1: 1}
+            assert storage._in_use == {}
+            assert storage._borrowed == {}
+            assert storage._open[1] is borrowed
+
+    run(scenario())
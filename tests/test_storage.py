@@ -0,0 +1,62 @@
+"""
+Los tres motores implementan StorageBackend con las mismas firmas y validaciones
+"""
+import asyncio
+import inspect
+
+import pytest
+
+from database.db_manager import DatabaseManager
+from database.memory_backend import MemoryStorage
+from database.sharding import ShardedStorage
+from database.storage import StorageBackend
+
+PROTOCOL_METHODS = [
+    name for name, member in vars(StorageBackend).items()
+    if callable(member) and not name.startswith('_')
+]
+
+
+def parameters(function):
+    return [
+        (param.name, param.kind, param.default is inspect.Parameter.empty)
+        for param in inspect.signature(function).parameters.values()
+    ]
+
+
+@pytest.mark.parametrize('backend', [DatabaseManager, ShardedStorage, MemoryStorage])
+@pytest.mark.parametrize('name', PROTOCOL_METHODS)
+def test_backend_matches_protocol(backend, name):
+    method = getattr(backend, name, None)
+    assert method is not None, f"{backend.__name__} no implementa {name}"
+    assert parameters(method) == parameters(getattr(StorageBackend, name))
+
+
+def open_backend(backend, tmp_path):
+    if backend is DatabaseManager:
+        return DatabaseManager(str(tmp_path / 'storage.db'))
+    if backend is ShardedStorage:
+        return ShardedStorage(str(tmp_path / 'shards'))
+    return MemoryStorage()
+
+
+@pytest.mark.parametrize('backend', [DatabaseManager, ShardedStorage, MemoryStorage])
+@pytest.mark.parametrize('from_user_id, to_user_id, amount', [(1, 2, 0), (1, 2, -50), (1, 1, 10)])
+def test_transfer_rejects_invalid_input(backend, tmp_path, from_user_id, to_user_id, amount):
+    async def scenario():
+        storage = open_backend(backend, tmp_path)
+        await storage.initialize()
+        try:
+            await storage.add_money(1, 5, 100)
+            await storage.add_money(2, 5, 100)
+            with pytest.raises(ValueError):
+                await storage.transfer(from_user_id, to_user_id, 5, amount)
+            assert await storage.get_balance(1, 5) == 100
+            assert await storage.get_balance(2, 5) == 100
+            # Una transferencia válida sigue funcionando
+            assert await storage.transfer(1, 2, 5, 30) == 70
+            assert await storage.get_balance(2, 5) == 130
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())